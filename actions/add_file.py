@@ -4,38 +4,15 @@
 from __future__ import annotations
 
 import os
-import re
-from typing import TYPE_CHECKING, Tuple
+from typing import TYPE_CHECKING
 
-from PySide6.QtWidgets import QFileDialog, QMessageBox, QTreeWidgetItem
-from PySide6.QtCore import Qt
+from PySide6.QtWidgets import QFileDialog, QMessageBox
+
+from core.paths import norm_iso_name as _norm_iso_name
 
 if TYPE_CHECKING:  # pragma: no cover
     from gui import CDGenPS2  # type‑hints only
 
-# --------------------------------------------------------------------------- #
-# Helpers
-# --------------------------------------------------------------------------- #
-
-_VALID_CHARS = re.compile(r"[^A-Z0-9_.$]")
-
-
-def _norm_iso_name(name: str) -> Tuple[str, bool]:
-    """Return a valid ISO‑9660 (level 2) file name, flagging if it changed."""
-    original = name
-    name = name.upper()
-    name = _VALID_CHARS.sub("_", name)
-
-    if len(name) <= 31:
-        return name, name != original.upper()
-
-    # Preserve extension, truncate base
-    base, dot, ext = name.partition(".")
-    trunc = (31 - len(dot) - len(ext)) if dot else 31
-    name = base[:trunc] + (dot + ext if dot else "")
-    return name, True
-
-
 # --------------------------------------------------------------------------- #
 # Public entry‑point
 # --------------------------------------------------------------------------- #
@@ -52,7 +29,7 @@ def add_file(gui: "CDGenPS2") -> None:
         file_name = os.path.basename(file_path)
         iso_name, changed = _norm_iso_name(file_name)
 
-        if any(entry[0] == iso_name for entry in gui.files):
+        if iso_name in gui.files or gui.files.is_dir(iso_name):
             continue  # skip duplicates silently
 
         if changed:
@@ -62,14 +39,10 @@ def add_file(gui: "CDGenPS2") -> None:
                 f"The file name was adapted for ISO‑9660:\n{file_name} → {iso_name}",
             )
 
-        node = QTreeWidgetItem([iso_name])
-        node.setData(0, Qt.UserRole, (iso_name, file_path, None))
-        gui.root_node.addChild(node)
-
-        gui.files.append((iso_name, file_path, None))
+        gui.tree_model.add(iso_name, file_path, size=os.path.getsize(file_path))
         added += 1
 
     if added:
-        gui.tree.setCurrentItem(node)
+        gui.select(iso_name)
     else:
         QMessageBox.information(gui, "No files added", "All selected files were duplicates.")
@@ -1,44 +1,155 @@
 # actions/add_folder.py
-"""Add an entire directory tree to the ISO layout, with ISO‑9660 name checks."""
+"""Add an entire directory tree to the ISO layout, with ISO‑9660 name checks.
+
+The tree is walked on a worker thread (see :func:`core.paths.scan_tree`)
+and reaches the GUI in batches, so the window stays responsive and the
+import can be cancelled.  Whatever was imported before a cancel is kept;
+adding the same folder again skips existing entries and resumes it.
+"""
 
 from __future__ import annotations
 
-import os
-import re
+import threading
+import traceback
 from pathlib import Path
-from typing import TYPE_CHECKING, Iterator, Tuple
+from typing import TYPE_CHECKING, Callable, Iterator, List, Optional
+
+from PySide6.QtCore import QObject, QThread, Signal, Slot, Qt
+from PySide6.QtWidgets import QFileDialog, QMessageBox, QProgressDialog
 
-from PySide6.QtWidgets import QFileDialog, QMessageBox, QTreeWidgetItem
-from PySide6.QtCore import Qt
+from core.paths import ScanEntry, scan_tree as _scan_tree
+from core.profiling import profiled
 
 if TYPE_CHECKING:  # pragma: no cover
     from gui import CDGenPS2  # type‑hints only
 
+# scan_tree and anything shaped like it (core.isoread.scan_image)
+Scan = Callable[[Path, Optional[threading.Event]], Iterator[List[ScanEntry]]]
+
 # --------------------------------------------------------------------------- #
-# Helpers
+# Worker
 # --------------------------------------------------------------------------- #
 
-_VALID_CHARS = re.compile(r"[^A-Z0-9_.$]")
-
+class _FolderScanWorker(QObject):
+    batch = Signal(object)          # List[ScanEntry]
+    progress = Signal(int, int)     # files, bytes
+    finished = Signal(bool)         # cancelled?
+    error = Signal(str)
+
+    def __init__(self, root: Path, scan: Scan = _scan_tree):
+        super().__init__()
+        self._root = root
+        self._scan = scan
+        self._cancel = threading.Event()
+
+    def cancel(self) -> None:
+        self._cancel.set()
+
+    @Slot()
+    def run(self):
+        files = size = 0
+        try:
+            for batch in self._scan(self._root, self._cancel):
+                files += len(batch)
+                size += sum(entry[2] for entry in batch)
+                self.batch.emit(batch)
+                self.progress.emit(files, size)
+        except Exception as exc:
+            self.error.emit(f"{exc}\n\n{traceback.format_exc()}")
+        else:
+            self.finished.emit(self._cancel.is_set())
 
-def _norm_iso_name(name: str) -> str:
-    name = name.upper()
-    name = _VALID_CHARS.sub("_", name)
-    if len(name) <= 31:
-        return name
-
-    base, dot, ext = name.partition(".")
-    trunc = (31 - len(dot) - len(ext)) if dot else 31
-    return base[:trunc] + (dot + ext if dot else "")
-
-
-def _iter_dir(root: Path) -> Iterator[Tuple[Path, str]]:
-    """Yield (absolute_path, iso_relative_path) for every file under *root*."""
-    for abs_path in root.rglob("*"):
-        if abs_path.is_file():
-            rel_parts = [ _norm_iso_name(p.name) for p in abs_path.relative_to(root).parts ]
-            yield abs_path, "/".join(rel_parts)
+# --------------------------------------------------------------------------- #
+# Helpers
+# --------------------------------------------------------------------------- #
 
+def _insert_batch(gui: "CDGenPS2", batch: List[ScanEntry]) -> List[str]:
+    """Add *batch* to the layout; the tree is notified once per directory."""
+    # Duplicates (and names already taken by a directory) are skipped
+    return gui.tree_model.add_many(
+        (iso_rel, abs_path, None, size) for abs_path, iso_rel, size in batch
+    )
+
+class _FolderImport(QObject):
+    """GUI‑thread side of one import: owns the thread, the dialog and the tally.
+
+    *scan* and *title* let other sources of files (an ISO image) reuse it.
+    """
+
+    def __init__(self, gui: "CDGenPS2", root: Path, scan: Scan = _scan_tree, title: str = "Add Folder"):
+        super().__init__(gui)
+        self._gui = gui
+        self._root = root
+        self._title = title
+        self._new_paths: List[str] = []
+
+        self._worker = _FolderScanWorker(root, scan)
+        self._thread = QThread()
+        self._worker.moveToThread(self._thread)
+
+        self._dialog = QProgressDialog(f"Scanning {root.name}…", "Cancel", 0, 0, gui)
+        self._dialog.setWindowTitle(title)
+        self._dialog.setMinimumDuration(500)
+        self._dialog.canceled.connect(self._worker.cancel, Qt.DirectConnection)
+
+        # Bound slots of a GUI‑thread object: Qt queues them across threads
+        self._worker.batch.connect(self.on_batch)
+        self._worker.progress.connect(self.on_progress)
+        self._worker.finished.connect(self.on_finished)
+        self._worker.error.connect(self.on_failure)
+        self._thread.started.connect(self._worker.run)
+
+    def start(self) -> None:
+        self._gui.btn_add_folder.setEnabled(False)
+        self._gui.btn_import_iso.setEnabled(False)
+        self._gui.btn_build_iso.setEnabled(False)
+        self._thread.start()
+
+    # --- Callbacks ---
+    @Slot(object)
+    def on_batch(self, batch):
+        with profiled(f"{self._title} batches"):
+            self._new_paths.extend(_insert_batch(self._gui, batch))
+
+    @Slot(int, int)
+    def on_progress(self, files: int, size: int):
+        self._dialog.setLabelText(f"Scanned {files} file(s), {size / 2**20:.1f} MB")
+
+    @Slot(bool)
+    def on_finished(self, cancelled: bool):
+        self.cleanup()
+        gui, paths = self._gui, self._new_paths
+        if not paths:
+            QMessageBox.information(gui, "Nothing added", "All items already exist in the ISO.")
+            return
+
+        gui.select(paths[0])
+        if cancelled:
+            QMessageBox.information(
+                gui, "Import cancelled",
+                f"Imported {len(paths)} file(s) from {self._root.name} before cancelling.\n"
+                f"Use {self._title} again to import the rest.",
+            )
+        else:
+            QMessageBox.information(gui, self._title, f"Imported {len(paths)} file(s) from {self._root.name}.")
+
+    @Slot(str)
+    def on_failure(self, msg: str):
+        self.cleanup()
+        QMessageBox.critical(self._gui, "Import error", msg)
+
+    def cleanup(self):
+        self._dialog.canceled.disconnect()
+        self._dialog.close()
+        self._thread.quit()
+        self._thread.wait()
+        self._worker.deleteLater()
+        self._thread.deleteLater()
+        self._gui.btn_add_folder.setEnabled(True)
+        self._gui.btn_import_iso.setEnabled(True)
+        self._gui.btn_build_iso.setEnabled(True)
+        self._gui.folder_import = None
+        self.deleteLater()
 
 # --------------------------------------------------------------------------- #
 # Public entry‑point
@@ -49,36 +160,5 @@ def add_folder(gui: "CDGenPS2") -> None:  # noqa: D401
     if not dir_path:
         return
 
-    root = Path(dir_path)
-    new_nodes = []
-
-    for abs_path, iso_rel in _iter_dir(root):
-        # Skip duplicates
-        if any(entry[0] == iso_rel for entry in gui.files):
-            continue
-
-        # Build tree hierarchy node‑by‑node
-        parent = gui.root_node
-        parts = iso_rel.split("/")
-        for depth, part in enumerate(parts):
-            child = next(
-                (parent.child(i) for i in range(parent.childCount()) if parent.child(i).text(0) == part),
-                None,
-            )
-            if child is None:
-                child = QTreeWidgetItem([part])
-                parent.addChild(child)
-            parent = child
-
-            if depth == len(parts) - 1:  # leaf → file node
-                parent.setData(0, Qt.UserRole, (iso_rel, str(abs_path), None))
-                new_nodes.append(parent)
-
-        gui.files.append((iso_rel, str(abs_path), None))
-
-    if not new_nodes:
-        QMessageBox.information(gui, "Nothing added", "All items already exist in the ISO.")
-        return
-
-    gui.tree.setCurrentItem(new_nodes[0])
-    QMessageBox.information(gui, "Folder added", f"Imported {len(new_nodes)} file(s) from {root.name}.")
+    gui.folder_import = _FolderImport(gui, Path(dir_path))
+    gui.folder_import.start()
@@ -4,11 +4,11 @@
 The action performs four steps:
 1. **Validate selection** – The user must have highlighted an ``*.ELF`` file
    in the ISO tree.
-2. **Generate `SYSTEM.CNF`** in a *temporary* directory to avoid cluttering
-   the working folder.
-3. **Update the GUI tree and `gui.files` list** – Any previous `SYSTEM.CNF`
-   entry is removed, then the fresh one (fixed at LBA 12231) is inserted
-   under the *RootISO* node and appended to ``gui.files``.
+2. **Generate `SYSTEM.CNF`** as an in‑memory source: nothing is written
+   to disk, the builder streams it straight into the image.
+3. **Update the GUI tree and the `gui.files` layout** – Any previous
+   `SYSTEM.CNF` entry is removed, then the fresh one (fixed at LBA 12231)
+   is inserted under the *RootISO* node and added to ``gui.files``.
 4. **Focus feedback** – Highlights the new node and shows a confirmation
    message.
 
@@ -23,47 +23,15 @@ value once *SYSTEM.CNF* has been created.
 from __future__ import annotations
 
 import os
-import tempfile
-from typing import TYPE_CHECKING, Tuple
+from typing import TYPE_CHECKING
 
-from PySide6.QtCore import Qt
-from PySide6.QtWidgets import QMessageBox, QTreeWidgetItem
+from PySide6.QtWidgets import QMessageBox
+
+from core.cnf import CNF_LBA, CNF_NAME, cnf_source
 
 if TYPE_CHECKING:  # pragma: no cover
     from gui import CDGenPS2
 
-# --------------------------------------------------------------------------- #
-# Constants
-# --------------------------------------------------------------------------- #
-
-CNF_NAME: str = "SYSTEM.CNF"
-CNF_LBA: int = 12231
-
-# --------------------------------------------------------------------------- #
-# Helpers
-# --------------------------------------------------------------------------- #
-
-def _make_cnf_content(iso_path: str) -> str:
-    """Return the text for SYSTEM.CNF given an ELF ISO path."""
-    elf_path_cnf = iso_path.replace("/", "\\")
-    if not elf_path_cnf.endswith(";1"):
-        elf_path_cnf += ";1"
-
-    return (
-        f"BOOT2=cdrom0:\\{elf_path_cnf}\n"
-        "VER=1.00\n"
-        "VMODE=NTSC\n"
-    )
-
-
-def _write_temp_cnf(content: str) -> str:
-    """Write *content* to a temporary file and return its absolute path."""
-    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".CNF", prefix="syscnf_")
-    with tmp:
-        tmp.write(content.encode("ascii"))
-    return tmp.name
-
-
 # --------------------------------------------------------------------------- #
 # Public entry‑point
 # --------------------------------------------------------------------------- #
@@ -74,47 +42,33 @@ def boot_elf(gui: "CDGenPS2") -> None:  # noqa: D401
     # ------------------------------------------------------------------
     # 1) Validate selection
     # ------------------------------------------------------------------
-    item = getattr(gui, "current_item", None)
-    if item is None:
+    elf_iso = getattr(gui, "current_path", None)
+    if elf_iso is None:
         QMessageBox.warning(gui, "No selection", "Please select an ELF file in the tree.")
         return
 
-    data: Tuple[str, str, int | None] | None = item.data(0, Qt.UserRole)
-    if not data or not data[0].upper().endswith(".ELF"):
+    if elf_iso not in gui.files or not elf_iso.upper().endswith(".ELF"):
         QMessageBox.warning(gui, "Invalid selection", "Selected node is not an ELF file.")
         return
 
-    elf_iso, _elf_abs, _elf_lba = data
-
     # ------------------------------------------------------------------
-    # 2) Generate SYSTEM.CNF in a temporary file
+    # 2) Generate SYSTEM.CNF in memory
     # ------------------------------------------------------------------
-    cnf_content = _make_cnf_content(elf_iso.upper())
-    cnf_path = _write_temp_cnf(cnf_content)
+    cnf = cnf_source(elf_iso.upper())
 
     # ------------------------------------------------------------------
     # 3) Remove any previous SYSTEM.CNF then insert the new one
     # ------------------------------------------------------------------
-    # ---- 3.a) purge gui.files and tree node --------------------------------
-    gui.files = [t for t in gui.files if t[0].upper() != CNF_NAME]
-
-    for i in range(gui.root_node.childCount()):
-        if gui.root_node.child(i).text(0).upper().startswith(CNF_NAME):
-            gui.root_node.removeChild(gui.root_node.child(i))
-            break
-
-    # ---- 3.b) create and insert fresh node --------------------------------
-    cnf_node = QTreeWidgetItem([f"{CNF_NAME} (LBA: {CNF_LBA})"])
-    cnf_node.setData(0, Qt.UserRole, (CNF_NAME, cnf_path, CNF_LBA))
-    gui.root_node.insertChild(0, cnf_node)
+    # ---- 3.a) purge the previous entry --------------------------------------
+    gui.tree_model.remove(CNF_NAME)
 
-    gui.files.append((CNF_NAME, cnf_path, CNF_LBA))
+    # ---- 3.b) insert the fresh one on top of RootISO ----------------------
+    gui.tree_model.add(CNF_NAME, cnf, CNF_LBA, size=cnf.size, first=True)
 
     # ------------------------------------------------------------------
     # 4) Final UI feedback
     # ------------------------------------------------------------------
-    gui.tree.setCurrentItem(cnf_node)
-    gui.refresh_info(cnf_node)
+    gui.select(CNF_NAME)
 
     QMessageBox.information(
         gui,
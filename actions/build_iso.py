@@ -1,73 +1,173 @@
 # actions/build_iso.py
-import subprocess, os, logging, threading, traceback
+import logging, threading, traceback
 from typing import List, Tuple, Optional
 from PySide6.QtCore import QObject, Signal, QThread, Slot, Qt
-from PySide6.QtWidgets import QFileDialog, QMessageBox
+from PySide6.QtWidgets import QFileDialog, QMessageBox, QProgressDialog
+
+from core.build import run_build
+from core.compress import format_for
+from core.profiling import profiled
+from core.progress import BuildCancelled, BuildProgress, report_path
+from core.statcache import StatCache
+from core.writer import VOLUME_ID
 
 logger = logging.getLogger("buildiso")
-VOLUME_ID = "PS2DISC"
+
+_PHASE_LABELS = {
+    "validation": "Checking files",
+    "dedup": "Looking for identical files",
+    "layout": "Planning the layout",
+    "diff": "Looking for changes",
+    "directories": "Writing directories",
+    "data": "Copying file data",
+    "padding": "Padding",
+    "verify": "Verifying the image",
+    "checksums": "Computing checksums",
+}
 
 # ------------------------------------------------------------------------------
 # Helpers
 # ------------------------------------------------------------------------------
 
-def _sanitise_and_sort(files: List[Tuple[str, str, Optional[int]]]):
-    seen = set()
-    ordered = []
-    for iso_rel, abs_path, lba in files:
-        if iso_rel in seen:
-            raise ValueError(f"Duplicate ISO path: {iso_rel}")
-        if not os.path.isfile(abs_path):
-            raise FileNotFoundError(abs_path)
-        seen.add(iso_rel)
-        ordered.append((iso_rel, abs_path))
-    return ordered
-
-def _build_iso(output_path: str, files: List[Tuple[str, str]]):
-    logger.debug("Thread %s – building ISO with genisoimage", threading.get_ident())
-
-    cmd = [
-        "genisoimage",
-        "-udf",
-        "-o", output_path,
-        "-iso-level", "1",
-        "-pad",
-        "-V", VOLUME_ID,
-        "-graft-points"
-    ]
-    for iso_rel, abs_path in files:
-        graft = f"/{iso_rel.upper()}={abs_path}"
-        cmd.append(graft)
-    
-    
-    logger.info("Running command: %s", " ".join(cmd))
-    result = subprocess.run(cmd)
-    if result.returncode != 0:
-        raise RuntimeError(f"genisoimage failed with code {result.returncode}")
-
-    logger.info("ISO written to %s", output_path)
+def _build_iso(output_path: str, files: List[Tuple[str, str, Optional[int]]], incremental: bool = False,
+               progress: Optional[BuildProgress] = None, cache: Optional[StatCache] = None,
+               verify: bool = False, checksums: bool = False):
+    logger.debug("Thread %s – building ISO in process", threading.get_ident())
+
+    plan, written = run_build(output_path, files, VOLUME_ID, incremental=incremental,
+                              progress=progress, report=report_path(output_path), cache=cache,
+                              compression=format_for(output_path), verify=verify,
+                              checksums=checksums)
+
+    if incremental:
+        logger.info("ISO updated at %s (%d of %d bytes written)", output_path, written, plan.size)
+    else:
+        logger.info("ISO written to %s (%d sectors)", output_path, plan.total_sectors)
+    return plan
+
+
+def _progress_text(phase: str, done: float, total: float, rate: float, eta: float) -> str:
+    text = f"{_PHASE_LABELS.get(phase, 'Preparing')}…\n{done / 2**20:.1f} of {total / 2**20:.1f} MB"
+    if rate > 0:
+        text += f" at {rate / 2**20:.1f} MB/s"
+    if eta >= 0:
+        text += f", {int(eta) // 60}:{int(eta) % 60:02d} left"
+    return text
 
 # ------------------------------------------------------------------------------
 # Worker
 # ------------------------------------------------------------------------------
 
 class _IsoBuildWorker(QObject):
-    finished = Signal(str)
+    finished = Signal(str, float)                        # path, bytes saved by deduplication
+    cancelled = Signal()
     error = Signal(str)
+    progress = Signal(str, float, float, float, float)   # phase, done, total, B/s, ETA
 
-    def __init__(self, out_path: str, files):
+    def __init__(self, out_path: str, files, incremental: bool = False, cache: Optional[StatCache] = None,
+                 verify: bool = False, checksums: bool = False):
         super().__init__()
         self._out = out_path
         self._files = files
+        self._incremental = incremental
+        self._verify = verify
+        self._checksums = checksums
+        self._cache = cache
+        self._progress = BuildProgress(callback=self.progress.emit)
+
+    def cancel(self) -> None:
+        self._progress.cancel.set()
 
     @Slot()
     def run(self):
         try:
-            _build_iso(self._out, self._files)
+            with profiled("build"):
+                plan = _build_iso(self._out, self._files, self._incremental, self._progress, self._cache,
+                                  self._verify, self._checksums)
+        except BuildCancelled:
+            self.cancelled.emit()
         except Exception as exc:
             self.error.emit(f"{exc}\n\n{traceback.format_exc()}")
         else:
-            self.finished.emit(self._out)
+            self.finished.emit(self._out, plan.shared_bytes)
+
+
+class _IsoBuild(QObject):
+    """GUI‑thread side of one build: owns the thread and the progress dialog.
+
+    A *quiet* build (watch mode) reports its outcome through :attr:`done`
+    only – ``""`` on success, else the message – instead of message boxes.
+    """
+
+    done = Signal(str)
+
+    def __init__(self, gui: "CDGenPS2", out_path: str, files, incremental: bool, verify: bool,
+                 quiet: bool = False, checksums: bool = False):
+        super().__init__(gui)
+        self._gui = gui
+        self._quiet = quiet
+
+        self._worker = _IsoBuildWorker(out_path, files, incremental, gui.stat_cache, verify, checksums)
+        self._thread = QThread()
+        self._worker.moveToThread(self._thread)
+
+        self._dialog = QProgressDialog("Preparing…", "Cancel", 0, 1000, gui)
+        self._dialog.setWindowTitle("Build ISO")
+        self._dialog.setMinimumDuration(500)
+        self._dialog.canceled.connect(self._worker.cancel, Qt.DirectConnection)
+
+        # Bound slots of a GUI‑thread object: Qt queues them across threads
+        self._worker.progress.connect(self.on_progress)
+        self._worker.finished.connect(self.on_success)
+        self._worker.cancelled.connect(self.on_cancelled)
+        self._worker.error.connect(self.on_failure)
+        self._thread.started.connect(self._worker.run)
+
+    def start(self) -> None:
+        self._gui.btn_build_iso.setEnabled(False)
+        self._thread.start()
+
+    # --- Callbacks ---
+    @Slot(str, float, float, float, float)
+    def on_progress(self, phase: str, done: float, total: float, rate: float, eta: float):
+        if self._dialog.wasCanceled():
+            return
+        self._dialog.setValue(int(1000 * done / total) if total else 0)
+        self._dialog.setLabelText(_progress_text(phase, done, total, rate, eta))
+
+    @Slot(str, float)
+    def on_success(self, path: str, saved: float):
+        self.cleanup("")
+        if self._quiet:
+            return
+        text = f"ISO created at:\n{path}"
+        if saved:
+            text += f"\n\nIdentical files stored once: {saved / 2**20:.1f} MB saved."
+        QMessageBox.information(self._gui, "Success", text)
+
+    @Slot()
+    def on_cancelled(self):
+        self.cleanup("Build cancelled")
+        if not self._quiet:
+            QMessageBox.information(self._gui, "Build cancelled", "The ISO was not written.")
+
+    @Slot(str)
+    def on_failure(self, msg: str):
+        self.cleanup(msg.split("\n", 1)[0])
+        if not self._quiet:
+            QMessageBox.critical(self._gui, "Build error", msg)
+
+    def cleanup(self, outcome: str = ""):
+        self._dialog.canceled.disconnect()
+        self._dialog.close()
+        self._thread.quit()
+        self._thread.wait()
+        self._worker.deleteLater()
+        self._thread.deleteLater()
+        self._gui.btn_build_iso.setEnabled(True)
+        self._gui.iso_build = None
+        self.done.emit(outcome)
+        self.deleteLater()
 
 # ------------------------------------------------------------------------------
 # GUI entry-point
@@ -78,36 +178,13 @@ def build_iso(gui: "CDGenPS2") -> None:
         QMessageBox.warning(gui, "No content", "Add at least one file before building the ISO.")
         return
 
-    try:
-        files = _sanitise_and_sort(gui.files)
-    except Exception as e:
-        QMessageBox.critical(gui, "Invalid layout", str(e))
-        return
-
-    save_path, _ = QFileDialog.getSaveFileName(gui, "Save ISO as…", "output.iso", "ISO (*.iso)")
+    save_path, _ = QFileDialog.getSaveFileName(
+        gui, "Save ISO as…", "output.iso", "ISO (*.iso);;Compressed CSO (*.cso);;Compressed ZSO (*.zso)"
+    )
     if not save_path:
         return
 
-    worker = _IsoBuildWorker(save_path, files)
-    thread = QThread()
-    worker.moveToThread(thread)
-
-    # --- Callbacks ---
-    def on_success(path: str):
-        QMessageBox.information(gui, "Success", f"ISO created at:\n{path}")
-        cleanup()
-
-    def on_failure(msg: str):
-        QMessageBox.critical(gui, "Build error", msg)
-        cleanup()
-
-    def cleanup():
-        thread.quit()
-        thread.wait()
-        worker.deleteLater()
-        thread.deleteLater()
-
-    worker.finished.connect(on_success)
-    worker.error.connect(on_failure)
-    thread.started.connect(worker.run)
-    thread.start()
+    # Validation happens on the worker (it stats every file); errors come back as "Build error"
+    gui.iso_build = _IsoBuild(gui, save_path, list(gui.files), gui.chk_incremental.isChecked(),
+                              gui.chk_verify.isChecked(), checksums=gui.chk_checksums.isChecked())
+    gui.iso_build.start()
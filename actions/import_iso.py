@@ -0,0 +1,34 @@
+# actions/import_iso.py
+"""Import the files of an existing ISO image into the layout, for remastering.
+
+Nothing is extracted: the directory records are read on a worker thread
+(see :func:`core.isoread.scan_image`) and every file enters the layout as
+its extent inside the image.  The next build copies them straight out of
+it – replace or add a few files and the rest of the disc is carried over,
+at its old LBAs wherever they are still free.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from PySide6.QtWidgets import QFileDialog
+
+from actions.add_folder import _FolderImport
+from core.isoread import scan_image
+
+if TYPE_CHECKING:  # pragma: no cover
+    from gui import CDGenPS2  # type‑hints only
+
+# --------------------------------------------------------------------------- #
+# Public entry‑point
+# --------------------------------------------------------------------------- #
+
+def import_iso(gui: "CDGenPS2") -> None:
+    image_path, _ = QFileDialog.getOpenFileName(gui, "Select ISO to import", "", "ISO (*.iso);;All files (*)")
+    if not image_path:
+        return
+
+    gui.folder_import = _FolderImport(gui, Path(image_path), scan_image, "Import ISO")
+    gui.folder_import.start()
@@ -4,50 +4,36 @@
 
 Key improvements over the previous implementation
 -------------------------------------------------
-* **Single pass filter → O(N)** – All ISO‑relative paths to delete are first
-  collected, then ``gui.files`` is filtered once.  This avoids repeatedly
-  rebuilding the list during deep recursions.
-* **Robust traversal** – Uses a DFS helper that does *not* rely on the
-  current child index after modifications, making the code future‑proof if
-  we later decide to prune the GUI tree inside the recursion.
+* **O(subtree) removal** – ``gui.files`` is an indexed layout model, so
+  dropping a file or a directory only visits the entries below it instead
+  of walking the tree and filtering the whole layout.
+* **Views kept in sync** – The removal goes through the tree model, which
+  drops the row from the view and the entries from the layout together.
 * **UX polish** – Clears the info panel, resets the current selection, and
   disables the *Boot ELF* button once the deletion is complete.
 """
 
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, Set
+from typing import TYPE_CHECKING
 
-from PySide6.QtCore import Qt
-from PySide6.QtWidgets import QMessageBox, QTreeWidgetItem, QTableWidgetItem
+from PySide6.QtCore import QModelIndex
+from PySide6.QtWidgets import QMessageBox, QTableWidgetItem
 
 if TYPE_CHECKING:  # pragma: no cover
     from gui import CDGenPS2  # type‑hints only
 
-# --------------------------------------------------------------------------- #
-# Helpers
-# --------------------------------------------------------------------------- #
-
-def _collect_iso_paths(item: QTreeWidgetItem, acc: Set[str]) -> None:
-    """Depth‑first search that stores every file ISO path found under *item*."""
-    data = item.data(0, Qt.UserRole)
-    if data:
-        acc.add(data[0])  # iso‑relative path
-
-    for idx in range(item.childCount()):
-        _collect_iso_paths(item.child(idx), acc)
-
 # --------------------------------------------------------------------------- #
 # Public entry‑point
 # --------------------------------------------------------------------------- #
 
 def remove_item(gui: "CDGenPS2") -> None:  # noqa: D401
-    item = getattr(gui, "current_item", None)
-    if item is None:
+    iso_path = getattr(gui, "current_path", None)
+    if iso_path is None:
         QMessageBox.warning(gui, "No selection", "Select an item to delete.")
         return
 
-    if item is gui.root_node:
+    if iso_path == "":
         QMessageBox.information(gui, "RootISO", "The RootISO node cannot be removed.")
         return
 
@@ -62,21 +48,14 @@ def remove_item(gui: "CDGenPS2") -> None:  # noqa: D401
     ):
         return
 
-    # 1) Gather all ISO paths to drop ------------------------------------------------
-    paths_to_remove: Set[str] = set()
-    _collect_iso_paths(item, paths_to_remove)
-
-    # 2) Filter gui.files in a single pass ------------------------------------------
-    gui.files = [f for f in gui.files if f[0] not in paths_to_remove]
-
-    # 3) Detach the node from the tree ---------------------------------------------
-    parent = item.parent()
-    if parent is not None:
-        parent.removeChild(item)
+    # 1) Drop the file or directory subtree from layout and tree ----------------------
+    gui.tree_model.remove(iso_path)
 
-    gui.current_item = None  # reset selection
+    # 2) Reset the selection (the view would otherwise move to a neighbour) --------
+    gui.tree.setCurrentIndex(QModelIndex())
+    gui.current_path = None
 
-    # 4) Clear the info panel -------------------------------------------------------
+    # 3) Clear the info panel -------------------------------------------------------
     for r in range(4):
         gui.info.setItem(r, 1, QTableWidgetItem(""))
 
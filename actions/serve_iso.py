@@ -0,0 +1,112 @@
+# actions/serve_iso.py
+"""Serve mode: the layout as an HTTP image that is never written to disk.
+
+Toggling *Serve* plans the image of ``gui.files`` in memory
+(:class:`core.serve.VirtualImage`) and serves it with byte ranges on
+``127.0.0.1`` – port 8080, or any free one when that is taken – for
+network‑boot tests and emulators.  Sectors are produced per request from
+the plan and the sources, so a saved source is served at once.  The
+layout is polled (``LayoutModel.revision``): files added, removed or
+pinned re‑plan the image once the tree has been quiet for
+:data:`SETTLE_MS`, keeping everything else at its LBA.  Tree signals are
+no use here – rows below a folder never expanded are not announced.
+"""
+
+from __future__ import annotations
+
+import errno
+from typing import TYPE_CHECKING
+
+from PySide6.QtCore import QObject, QTimer, Slot
+from PySide6.QtWidgets import QMessageBox
+
+from core.serve import DEFAULT_HOST, HTTP_PORT, VirtualImage, http_server
+from core.sources import is_virtual
+from core.writer import VOLUME_ID
+
+POLL_MS: int = 250
+SETTLE_MS: int = 500
+
+if TYPE_CHECKING:  # pragma: no cover
+    from gui import CDGenPS2  # type‑hints only
+
+# --------------------------------------------------------------------------- #
+# Server
+# --------------------------------------------------------------------------- #
+
+class _Serve(QObject):
+    """GUI‑thread side of serve mode: keeps the image in step with the tree."""
+
+    def __init__(self, gui: "CDGenPS2"):
+        super().__init__(gui)
+        self._gui = gui
+        self._image = VirtualImage(self._files(), VOLUME_ID, stats=self._stats())
+        try:
+            self._server = http_server(self._image, (DEFAULT_HOST, HTTP_PORT))
+        except OSError as exc:
+            if exc.errno != errno.EADDRINUSE:
+                raise
+            self._server = http_server(self._image, (DEFAULT_HOST, 0))
+
+        self._revision = gui.files.revision
+        self._settle = QTimer(self, singleShot=True, interval=SETTLE_MS)
+        self._settle.timeout.connect(self._update)
+        self._poll = QTimer(self, interval=POLL_MS)
+        self._poll.timeout.connect(self._check)
+
+    def _files(self):
+        return list(self._gui.files)
+
+    def _stats(self):
+        return self._gui.stat_cache.snapshot(f[1] for f in self._gui.files if not is_virtual(f[1]))
+
+    def start(self) -> None:
+        self._server.start()
+        self._poll.start()
+        self._status()
+
+    def stop(self) -> None:
+        self._poll.stop()
+        self._settle.stop()
+        self._server.close()
+        self._gui.lbl_serve.setText("")
+        self.deleteLater()
+
+    @Slot()
+    def _check(self) -> None:
+        revision = self._gui.files.revision
+        if revision != self._revision:
+            self._revision = revision
+            self._settle.start()                 # restart: wait for the batch to end
+
+    @Slot()
+    def _update(self) -> None:
+        try:
+            self._image.update(self._files(), stats=self._stats())
+        except (OSError, ValueError) as exc:
+            self._gui.lbl_serve.setText(f"Serving the previous layout – {exc}")
+            return
+        self._status()
+
+    def _status(self) -> None:
+        size = self._image.size
+        self._gui.lbl_serve.setText(f"{self._server.url} ({size / 2**20:,.1f} MB)")
+
+# --------------------------------------------------------------------------- #
+# GUI entry‑point
+# --------------------------------------------------------------------------- #
+
+def toggle_serve(gui: "CDGenPS2", on: bool) -> None:
+    if not on:
+        if gui.serve is not None:
+            gui.serve.stop()
+            gui.serve = None
+        return
+
+    try:
+        gui.serve = _Serve(gui)
+    except (OSError, ValueError) as exc:
+        QMessageBox.critical(gui, "Serve error", str(exc))
+        gui.btn_serve.setChecked(False)
+        return
+    gui.serve.start()
@@ -0,0 +1,167 @@
+# actions/watch.py
+"""Watch mode: rebuild the image whenever a source of the layout changes.
+
+Toggling *Watch* asks once for the image to keep up to date, builds it and
+then follows the sources in ``gui.files`` through
+:class:`core.watch.SourceWatcher`.  Its inotify descriptor is read on the
+GUI thread by a ``QSocketNotifier`` (a timer polls when inotify is
+unavailable); a burst of events restarts the debounce timer, and once the
+sources have been quiet for :data:`~core.watch.DEBOUNCE_SECONDS` the diff
+is applied to the tree – sources that disappeared are removed – and an
+incremental build patches the image.  Changes arriving during a build
+queue exactly one more build.
+
+Files added to or removed from the tree are picked up on the fly: every
+row insertion or removal resynchronises the watches.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from typing import TYPE_CHECKING, Optional
+
+from PySide6.QtCore import QObject, QSocketNotifier, QTimer, Slot
+from PySide6.QtWidgets import QFileDialog
+
+from actions.build_iso import _IsoBuild
+from core.sources import backing_path, is_virtual
+from core.watch import DEBOUNCE_SECONDS, MAX_DELAY_SECONDS, POLL_SECONDS, SourceWatcher
+
+if TYPE_CHECKING:  # pragma: no cover
+    from gui import CDGenPS2  # type‑hints only
+
+# --------------------------------------------------------------------------- #
+# Watcher
+# --------------------------------------------------------------------------- #
+
+class _Watch(QObject):
+    """GUI‑thread side of watch mode for one output image."""
+
+    def __init__(self, gui: "CDGenPS2", out_path: str):
+        super().__init__(gui)
+        self._gui = gui
+        self._out = out_path
+        self._watcher = SourceWatcher(ignore=[os.path.splitext(os.path.abspath(out_path))[0]])
+        self._first: Optional[float] = None      # first event of the current burst
+        self._pending = False
+
+        self._settle = QTimer(self, singleShot=True, interval=int(DEBOUNCE_SECONDS * 1000))
+        self._settle.timeout.connect(self._on_settled)
+        self._resync = QTimer(self, singleShot=True, interval=300)
+        self._resync.timeout.connect(self._subscribe)
+
+        fd = self._watcher.fileno()
+        if fd is None:
+            self._notifier = None
+            self._poll = QTimer(self, interval=int(POLL_SECONDS * 1000))
+            self._poll.timeout.connect(self._on_events)
+            self._poll.start()
+        else:
+            self._poll = None
+            self._notifier = QSocketNotifier(fd, QSocketNotifier.Read, self)
+            self._notifier.activated.connect(self._on_events)
+
+        model = gui.tree_model
+        for signal in (model.rowsInserted, model.rowsRemoved, model.modelReset):
+            signal.connect(self._resync.start)
+
+    def start(self) -> None:
+        self._subscribe()
+        self._status("Watching")
+        self._build()
+
+    def stop(self) -> None:
+        model = self._gui.tree_model
+        for signal in (model.rowsInserted, model.rowsRemoved, model.modelReset):
+            signal.disconnect(self._resync.start)
+        self._settle.stop()
+        self._resync.stop()
+        if self._notifier is not None:
+            self._notifier.setEnabled(False)
+        if self._poll is not None:
+            self._poll.stop()
+        self._watcher.close()
+        self._gui.lbl_watch.setText("")
+        self.deleteLater()
+
+    # --- Events ---
+    @Slot()
+    def _subscribe(self) -> None:
+        self._watcher.watch(entry[1] for entry in self._gui.files)
+        if self._pending:
+            self._build()
+
+    @Slot()
+    def _on_events(self) -> None:
+        if not self._watcher.drain():
+            return
+        now = time.monotonic()
+        if self._first is None:
+            self._first = now
+        if now - self._first >= MAX_DELAY_SECONDS:
+            self._settle.stop()
+            self._on_settled()
+        else:
+            self._settle.start()                 # restart: wait for the burst to end
+
+    @Slot()
+    def _on_settled(self) -> None:
+        self._first = None
+        changes = self._watcher.collect()
+        if not changes:
+            return
+        if changes.deleted:
+            gone = [iso for iso, source, _lba in self._gui.files
+                    if not is_virtual(source) and backing_path(source) in changes.deleted]
+            for iso in gone:
+                self._gui.tree_model.remove(iso)
+        for path in changes.modified:
+            self._gui.stat_cache.invalidate(path)
+        self._status(f"{changes.summary()} – rebuilding")
+        self._build()
+
+    # --- Builds ---
+    def _build(self) -> None:
+        gui = self._gui
+        if gui.iso_build is not None or gui.folder_import is not None:
+            self._pending = True
+            return
+        if not gui.files:
+            self._status("Watching – the layout is empty")
+            return
+        self._pending = False
+        gui.iso_build = _IsoBuild(gui, self._out, list(gui.files), True, gui.chk_verify.isChecked(),
+                                  quiet=True, checksums=gui.chk_checksums.isChecked())
+        gui.iso_build.done.connect(self._on_built)
+        gui.iso_build.start()
+
+    @Slot(str)
+    def _on_built(self, outcome: str) -> None:
+        if outcome:
+            self._status(f"Build failed: {outcome}")
+        else:
+            self._status(f"Up to date ({time.strftime('%H:%M:%S')})")
+        if self._pending:
+            QTimer.singleShot(0, self._build)
+
+    def _status(self, text: str) -> None:
+        self._gui.lbl_watch.setText(f"{os.path.basename(self._out)}: {text}")
+
+# --------------------------------------------------------------------------- #
+# GUI entry‑point
+# --------------------------------------------------------------------------- #
+
+def toggle_watch(gui: "CDGenPS2", on: bool) -> None:
+    if not on:
+        if gui.watch is not None:
+            gui.watch.stop()
+            gui.watch = None
+        return
+
+    save_path, _ = QFileDialog.getSaveFileName(gui, "Keep this ISO up to date…", "output.iso", "ISO (*.iso)")
+    if not save_path:
+        gui.btn_watch.setChecked(False)
+        return
+    gui.watch = _Watch(gui, save_path)
+    gui.watch.start()
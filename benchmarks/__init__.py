@@ -0,0 +1,5 @@
+"""Performance benchmarks on synthetic layouts, with a regression baseline.
+
+See :mod:`benchmarks.__main__` for the runner, :mod:`benchmarks.synth`
+for the generated trees and :mod:`benchmarks.cases` for what is measured.
+"""
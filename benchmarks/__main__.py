@@ -0,0 +1,173 @@
+"""Run the benchmarks: ``python -m benchmarks [-k PATTERN] [--save-baseline]``
+from the repository root.
+
+Every case runs ``--repeat`` times and keeps its fastest time, then once
+more under :mod:`tracemalloc` for its peak Python heap.  Results are
+compared with the stored baseline (``benchmarks/baseline.json`` by
+default): a case slower or hungrier than the baseline by more than the
+threshold is a regression and the run exits with status 1.
+``--save-baseline`` records the current results instead – on the machine
+that will run the comparisons, since timings do not travel.
+"""
+
+from __future__ import annotations
+
+import argparse
+import fnmatch
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from benchmarks.cases import CASES, Case
+
+BASELINE_VERSION: int = 1
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baseline.json"
+TIME_THRESHOLD: float = 0.25
+MEMORY_THRESHOLD: float = 0.25
+MIN_SECONDS: float = 0.02          # below this a difference is timer noise
+MIN_BYTES: int = 1 << 20
+
+
+def _host() -> Dict[str, Any]:
+    return {"machine": platform.machine(), "python": platform.python_version(),
+            "cpus": os.cpu_count(), "node": platform.node()}
+
+# --------------------------------------------------------------------------- #
+# Measuring
+# --------------------------------------------------------------------------- #
+
+def _measure(case: Case, workdir: Path, scale: float, repeat: int, memory: bool) -> Dict[str, Any]:
+    times: List[float] = []
+    peak: Optional[int] = None
+    for i in range(repeat + (1 if memory else 0)):
+        state = case.setup(workdir, scale)
+        traced = memory and i == repeat
+        gc.collect()
+        try:
+            if traced:
+                tracemalloc.start()
+            start = time.perf_counter()
+            case.run(state)
+            elapsed = time.perf_counter() - start
+            if traced:
+                peak = tracemalloc.get_traced_memory()[1]
+            else:
+                times.append(elapsed)
+        finally:
+            if traced:
+                tracemalloc.stop()
+            if case.teardown is not None:
+                case.teardown(state)
+    return {"seconds": round(min(times), 6), "median": round(sorted(times)[len(times) // 2], 6),
+            "peak_bytes": peak}
+
+
+def _compare(name: str, now: Dict[str, Any], base: Optional[Dict[str, Any]],
+             time_threshold: float, memory_threshold: float) -> List[str]:
+    """Regressions of *now* against *base* as human‑readable lines."""
+    if base is None:
+        return []
+    problems = []
+    slower = now["seconds"] - base["seconds"]
+    if slower > MIN_SECONDS and now["seconds"] > base["seconds"] * (1 + time_threshold):
+        problems.append(f"{name}: {now['seconds']:.3f} s, baseline {base['seconds']:.3f} s "
+                        f"(+{slower / base['seconds']:.0%})")
+    if now.get("peak_bytes") is not None and base.get("peak_bytes"):
+        grown = now["peak_bytes"] - base["peak_bytes"]
+        if grown > MIN_BYTES and now["peak_bytes"] > base["peak_bytes"] * (1 + memory_threshold):
+            problems.append(f"{name}: peak {now['peak_bytes'] / 2**20:.1f} MB, baseline "
+                            f"{base['peak_bytes'] / 2**20:.1f} MB (+{grown / base['peak_bytes']:.0%})")
+    return problems
+
+# --------------------------------------------------------------------------- #
+# Command line
+# --------------------------------------------------------------------------- #
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__.split("\n")[0])
+    parser.add_argument("-k", dest="patterns", action="append", metavar="PATTERN",
+                        help="run only cases whose name matches (glob or substring, repeatable)")
+    parser.add_argument("--list", action="store_true", help="list the cases and exit")
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help="multiply file counts (and sparse file sizes) of the synthetic trees")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per case (fastest is kept)")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc run")
+    parser.add_argument("--workdir", type=Path, default=Path(tempfile.gettempdir()) / "cdgenps2-bench",
+                        help="where synthetic trees and images go (trees are reused)")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="store these results as the baseline instead of comparing")
+    parser.add_argument("--threshold", type=float, default=TIME_THRESHOLD,
+                        help="tolerated slowdown, as a fraction (default %(default)s)")
+    parser.add_argument("--memory-threshold", type=float, default=MEMORY_THRESHOLD,
+                        help="tolerated peak memory growth, as a fraction (default %(default)s)")
+    parser.add_argument("-o", "--output", type=Path, help="also write the results as JSON")
+    args = parser.parse_args(argv)
+
+    cases = CASES
+    if args.patterns:
+        cases = [c for c in cases if any(fnmatch.fnmatch(c.name, p) or p in c.name for p in args.patterns)]
+    if args.list:
+        for case in cases:
+            print(case.name)
+        return 0
+
+    baseline: Dict[str, Any] = {}
+    if not args.save_baseline and args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text())
+        if baseline.get("version") != BASELINE_VERSION or baseline.get("scale") != args.scale:
+            print(f"{args.baseline} was recorded at scale {baseline.get('scale')}; not comparing",
+                  file=sys.stderr)
+            baseline = {}
+        elif baseline.get("host", {}).get("node") != _host()["node"]:
+            print(f"warning: {args.baseline} was recorded on {baseline['host'].get('node')}",
+                  file=sys.stderr)
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    args.workdir.mkdir(parents=True, exist_ok=True)
+    results: Dict[str, Dict[str, Any]] = {}
+    problems: List[str] = []
+    print(f"{'case':<28} {'best s':>9} {'median s':>9} {'peak MB':>9}  baseline")
+    for case in cases:
+        if case.qt:
+            try:
+                import PySide6  # noqa: F401
+            except ImportError:
+                print(f"{case.name:<28} skipped (PySide6 not installed)")
+                continue
+        result = _measure(case, args.workdir, args.scale, max(1, args.repeat), not args.no_memory)
+        results[case.name] = result
+        base = baseline.get("results", {}).get(case.name)
+        found = _compare(case.name, result, base, args.threshold, args.memory_threshold)
+        problems += found
+        peak = "-" if result["peak_bytes"] is None else f"{result['peak_bytes'] / 2**20:.1f}"
+        verdict = "-" if base is None else ("REGRESSION" if found else f"{base['seconds']:.3f} s ok")
+        print(f"{case.name:<28} {result['seconds']:>9.3f} {result['median']:>9.3f} {peak:>9}  {verdict}",
+              flush=True)
+
+    data = {"version": BASELINE_VERSION, "scale": args.scale, "host": _host(),
+            "recorded": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "results": results}
+    if args.output:
+        args.output.write_text(json.dumps(data, indent=2))
+    if args.save_baseline:
+        if args.baseline.exists():                     # keep cases that were not run this time
+            old = json.loads(args.baseline.read_text())
+            if old.get("scale") == args.scale:
+                data["results"] = {**old.get("results", {}), **results}
+        args.baseline.write_text(json.dumps(data, indent=2))
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+    for line in problems:
+        print(f"regression: {line}", file=sys.stderr)
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+"""The benchmarked hot paths.
+
+A :class:`Case` prepares its input in ``setup`` (outside the clock), runs
+the code under test in ``run`` and cleans up in ``teardown``.  Cases are
+named ``<path>/<tree>`` so ``-k build`` or ``-k tiny`` pick families.
+"""
+
+from __future__ import annotations
+
+import os
+import random
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from benchmarks.synth import ensure_tree
+
+
+@dataclass
+class Case:
+    name: str
+    setup: Callable[[Path, float], Any]         # (workdir, scale) → state
+    run: Callable[[Any], Any]
+    teardown: Optional[Callable[[Any], None]] = None
+    qt: bool = False                            # needs PySide6 (run offscreen)
+
+
+def _files(root: Path) -> List[tuple]:
+    from core.paths import iter_dir
+    return [(iso_rel, str(path), None) for path, iso_rel in iter_dir(root)]
+
+# --------------------------------------------------------------------------- #
+# Scanning and naming
+# --------------------------------------------------------------------------- #
+
+def _scan(tree: str) -> Case:
+    def run(root: Path) -> int:
+        from core.paths import iter_dir
+        return sum(1 for _ in iter_dir(root))
+    return Case(f"iter_dir/{tree}", lambda w, s: ensure_tree(w, tree, s), run)
+
+
+def _names_setup(_workdir: Path, scale: float) -> List[str]:
+    rng = random.Random(1)
+    words = ["Intro", "movie", "Level 1", "bgm-loop", "über", "data", "x" * 40]
+    return [f"{rng.choice(words)} {i} ({rng.choice(words)}).{rng.choice(['bin', 'pss', 'irx', 'tar.gz'])}"
+            for i in range(max(1, round(100_000 * scale)))]
+
+
+def _names_run(names: List[str]) -> int:
+    from core.paths import norm_iso_name
+    return sum(norm_iso_name(n)[1] for n in names)
+
+# --------------------------------------------------------------------------- #
+# Layout
+# --------------------------------------------------------------------------- #
+
+def _insert(tree: str) -> Case:
+    """What Add Folder does on the GUI thread, batch by batch, with a view attached."""
+    def setup(workdir: Path, scale: float) -> Dict[str, Any]:
+        from PySide6.QtWidgets import QApplication, QTreeView
+
+        from core.model import LayoutModel
+        from core.paths import scan_tree
+        from tree_model import LayoutTreeModel
+
+        app = QApplication.instance() or QApplication([])
+        batches = list(scan_tree(ensure_tree(workdir, tree, scale)))
+        model = LayoutTreeModel(LayoutModel())
+        view = QTreeView()
+        view.setModel(model)
+        view.expand(model.index_of(""))
+        return {"app": app, "batches": batches, "model": model, "view": view}
+
+    def run(state: Dict[str, Any]) -> int:
+        model, app = state["model"], state["app"]
+        added = 0
+        for batch in state["batches"]:
+            added += len(model.add_many((iso_rel, path, None, size) for path, iso_rel, size in batch))
+            app.processEvents()
+        return added
+
+    def teardown(state: Dict[str, Any]) -> None:
+        state["view"].deleteLater()
+        state["app"].processEvents()
+
+    return Case(f"tree_insert/{tree}", setup, run, teardown, qt=True)
+
+
+def _sanitise(tree: str) -> Case:
+    def setup(workdir: Path, scale: float):
+        from core.statcache import StatCache
+        files = _files(ensure_tree(workdir, tree, scale))
+        cache = StatCache(watch=False)
+        try:
+            return files, cache.snapshot([f[1] for f in files], max_age=0.0)
+        finally:
+            cache.close()
+
+    def run(state) -> int:
+        from core.layout import sanitise_and_sort
+        files, stats = state
+        return len(sanitise_and_sort(files, stats))
+
+    return Case(f"sanitise_and_sort/{tree}", setup, run)
+
+# --------------------------------------------------------------------------- #
+# Full build
+# --------------------------------------------------------------------------- #
+
+def _build(tree: str) -> Case:
+    def setup(workdir: Path, scale: float):
+        return _files(ensure_tree(workdir, tree, scale)), str(workdir / f"bench_{tree}.iso")
+
+    def run(state) -> int:
+        from core.build import run_build
+        files, output = state
+        plan, _written = run_build(output, files, "BENCH")
+        return plan.total_sectors
+
+    def teardown(state) -> None:
+        try:
+            os.unlink(state[1])
+        except FileNotFoundError:
+            pass
+
+    return Case(f"build/{tree}", setup, run, teardown)
+
+
+def _write(tree: str, readahead: bool) -> Case:
+    """Writing a planned image with kernel copies vs. the read‑ahead ring."""
+    def setup(workdir: Path, scale: float):
+        from core.writer import plan_image
+        plan = plan_image(_files(ensure_tree(workdir, tree, scale)), "BENCH")
+        return plan, str(workdir / f"bench_write_{tree}.iso")
+
+    def run(state) -> int:
+        from core.writer import write_image
+        plan, output = state
+        write_image(plan, output, readahead=readahead)
+        return plan.total_sectors
+
+    def teardown(state) -> None:
+        try:
+            os.unlink(state[1])
+        except FileNotFoundError:
+            pass
+
+    return Case(f"write_{'readahead' if readahead else 'copy'}/{tree}", setup, run, teardown)
+
+
+CASES: List[Case] = [
+    _scan("small"), _scan("tiny"), _scan("deep"),
+    Case("norm_iso_name/100k", _names_setup, _names_run),
+    _insert("small"), _insert("tiny"),
+    _sanitise("small"), _sanitise("tiny"), _sanitise("deep"),
+    _build("small"), _build("tiny"), _build("deep"), _build("huge"),
+    _write("small", False), _write("small", True), _write("huge", False), _write("huge", True),
+]
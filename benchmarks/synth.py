@@ -0,0 +1,98 @@
+"""Synthetic source trees for the benchmarks.
+
+Every tree is generated once into the work directory and reused while its
+spec (and the scale it was made at) matches the ``<name>.spec.json`` left
+next to it.  Contents are seeded pseudo‑random bytes, so a tree is
+identical from one run to the next; multi‑GB files are sparse and cost no
+disk until an image is built from them.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import random
+import shutil
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, Iterator, Tuple
+
+_CHUNK = random.Random(0).randbytes(1 << 16)
+
+
+@dataclass(frozen=True)
+class TreeSpec:
+    files: int                  # at scale 1
+    dirs: int                   # files are spread evenly over *dirs* folders
+    min_size: int
+    max_size: int
+    depth: int = 1              # nesting of every folder below the root
+    sparse: bool = False        # sizes are reached with truncate(), not written
+
+
+TREES: Dict[str, TreeSpec] = {
+    "small": TreeSpec(files=10_000, dirs=100, min_size=1024, max_size=32 * 1024),
+    "tiny": TreeSpec(files=100_000, dirs=1000, min_size=0, max_size=256),
+    "huge": TreeSpec(files=3, dirs=1, min_size=2 << 30, max_size=3 << 30, sparse=True),
+    "deep": TreeSpec(files=4_000, dirs=8, min_size=512, max_size=4096, depth=48),
+}
+
+
+def _scaled(spec: TreeSpec, scale: float) -> TreeSpec:
+    """*spec* with counts (and, for sparse trees, sizes) times *scale*."""
+    files = max(1, round(spec.files * scale))
+    if spec.sparse:
+        return TreeSpec(files, spec.dirs, max(1, round(spec.min_size * scale)),
+                        max(1, round(spec.max_size * scale)), spec.depth, True)
+    return TreeSpec(files, min(spec.dirs, files), spec.min_size, spec.max_size, spec.depth, False)
+
+
+def _layout(spec: TreeSpec, rng: random.Random) -> Iterator[Tuple[str, int]]:
+    """``(relative path, size)`` of every file of *spec*."""
+    for i in range(spec.files):
+        folder = i % spec.dirs
+        # a chain of *depth* folders per top‑level folder; files spread along it
+        level = (i // spec.dirs) % spec.depth + 1
+        parts = [f"dir{folder:04d}"] + [f"level{n:02d}" for n in range(1, level)]
+        size = rng.randint(spec.min_size, spec.max_size)
+        yield "/".join(parts + [f"file{i:06d}.bin"]), size
+
+
+def _write(path: str, size: int, sparse: bool) -> None:
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        if sparse:
+            os.ftruncate(fd, size)
+            os.pwrite(fd, _CHUNK[:min(size, len(_CHUNK))], 0)   # a few real bytes to copy
+            return
+        while size > 0:
+            size -= os.write(fd, _CHUNK[:min(size, len(_CHUNK))])
+    finally:
+        os.close(fd)
+
+
+def ensure_tree(workdir: Path, name: str, scale: float = 1.0) -> Path:
+    """Generate tree *name* under *workdir* unless an identical one is there."""
+    spec = _scaled(TREES[name], scale)
+    root = workdir / "trees" / name
+    marker = workdir / "trees" / f"{name}.spec.json"
+    wanted = dict(asdict(spec), scale=scale)
+    try:
+        if json.loads(marker.read_text()) == wanted:
+            return root
+    except (OSError, ValueError):
+        pass
+
+    if marker.exists():
+        marker.unlink()                      # a half‑made tree must never match
+    shutil.rmtree(root, ignore_errors=True)
+    rng = random.Random(name)
+    made = set()
+    for rel, size in _layout(spec, rng):
+        parent = os.path.join(root, os.path.dirname(rel))
+        if parent not in made:
+            os.makedirs(parent, exist_ok=True)
+            made.add(parent)
+        _write(os.path.join(root, rel), size, spec.sparse)
+    marker.write_text(json.dumps(wanted))
+    return root
@@ -0,0 +1,372 @@
+# cli.py
+"""Headless front end: ``cdgenps2 build LAYOUT -o IMAGE``, ``cdgenps2 verify IMAGE``,
+``cdgenps2 size LAYOUT``, ``cdgenps2 serve LAYOUT``.
+
+Only :mod:`core` is imported here – never PySide6 – so the command starts
+in a few tens of milliseconds and runs in display‑less CI containers.
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+from typing import List, Optional
+
+COMMANDS = ("build", "verify", "size", "serve")
+
+
+def _cancel_on_sigint(progress) -> None:
+    """First Ctrl‑C cancels the build cleanly, a second one interrupts."""
+    def handler(_signum, _frame):
+        progress.cancel.set()
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+    signal.signal(signal.SIGINT, handler)
+
+
+def _cmd_variants(args: argparse.Namespace, layout, compression: Optional[str], progress) -> int:
+    from core.variants import build_variants
+
+    def show(result) -> None:
+        if result.status == "ok":
+            notes = f", {result.shared_bytes} bytes saved by deduplication" if result.shared_bytes else ""
+            print(f"{result.output}: {result.sectors} sectors, {result.written} bytes written"
+                  f"{notes} ({result.seconds:.2f} s)")
+        else:
+            print(f"{result.output}: {result.status}" + (f" – {result.error}" if result.error else ""),
+                  file=sys.stderr)
+
+    results = build_variants(layout, args.output, args.variant, args.jobs, args.incremental,
+                             not args.no_dedup, compression, progress, args.report, show,
+                             args.verify, args.checksums, args.max_size)
+    return 0 if all(r.status == "ok" for r in results) else 1
+
+
+def _cmd_build(args: argparse.Namespace) -> int:
+    from core.layoutfile import load_layout
+    from core.progress import BuildProgress
+
+    layout = load_layout(args.layout)
+    if args.watch:
+        return _watch(args, layout)
+    progress = BuildProgress()
+    _cancel_on_sigint(progress)
+    return _build(args, layout, progress)
+
+
+def _build(args: argparse.Namespace, layout, progress, cache=None) -> int:
+    from core.build import run_build
+    from core.capacity import Breakdown
+    from core.cnf import with_boot_cnf
+    from core.compress import format_for
+    from core.sinks import STDOUT
+
+    volume_id = args.volume_id or layout.volume_id
+    if layout.variants:
+        # each image is compressed by its own extension unless -f says otherwise
+        layout.volume_id = volume_id
+        return _cmd_variants(args, layout, None if args.format == "iso" else args.format, progress)
+    if args.variant:
+        raise ValueError("The layout defines no variants")
+
+    compression = args.format or format_for(args.output)
+    if compression == "iso":
+        compression = None
+
+    files = layout.files
+    if layout.boot_elf:
+        files = with_boot_cnf(files, layout.boot_elf)
+    plan, written = run_build(args.output, files, volume_id, layout.hints,
+                              args.incremental, progress, args.report, cache,
+                              dedup=not args.no_dedup, compression=compression,
+                              verify=args.verify, checksums=args.checksums,
+                              max_sectors=args.max_size)
+
+    notes = f", {plan.shared_bytes} bytes saved by deduplication" if plan.shared_bytes else ""
+    if compression:
+        notes += f", {compression.upper()} of {os.path.getsize(args.output)} bytes"
+    # with ``-o -`` stdout carries the image itself
+    usage = Breakdown.of_plan(plan).usage(args.max_size)
+    print(f"{args.output}: {usage}, {len(plan.files)} files, "
+          f"{written} bytes written{notes}", file=sys.stderr if args.output == STDOUT else sys.stdout)
+    return 0
+
+
+def _watch(args: argparse.Namespace, layout) -> int:
+    """Build, then rebuild incrementally whenever a source settles after a change."""
+    from core.layoutfile import load_layout
+    from core.progress import BuildCancelled, BuildProgress
+    from core.sinks import is_stream
+    from core.statcache import StatCache
+    from core.watch import SourceWatcher, apply_changes
+
+    if is_stream(args.output):
+        raise ValueError("Watch mode needs an image file to patch, not a stream")
+    args.incremental = True
+    stop = threading.Event()
+    running: List = []
+
+    def handler(_signum, _frame):
+        stop.set()
+        for progress in running:
+            progress.cancel.set()
+    signal.signal(signal.SIGINT, handler)
+
+    layout_path = os.path.abspath(args.layout)
+    # the image, its manifest and report (and variant images) may sit in a watched folder
+    watcher = SourceWatcher(ignore=[os.path.splitext(os.path.abspath(args.output))[0]])
+    cache = StatCache()                            # kept warm across rebuilds by its own watches
+    try:
+        while True:
+            progress = BuildProgress()
+            running[:] = [progress]
+            started = time.perf_counter()
+            try:
+                _build(args, layout, progress, cache)
+                print(f"Done in {time.perf_counter() - started:.2f} s", file=sys.stderr)
+            except BuildCancelled:
+                break
+            except (OSError, ValueError, RuntimeError) as exc:
+                print(f"cdgenps2: {exc}", file=sys.stderr)
+            running.clear()
+            if stop.is_set():
+                break
+
+            everything = [layout] + layout.variants
+            watcher.watch((f[1] for part in everything for f in part.files),
+                          (root for part in everything for root, _prefix in part.folders), [layout_path])
+            print(f"Watching {args.layout} – Ctrl-C to stop", file=sys.stderr)
+            changes = watcher.wait(stop)
+            if not changes:
+                break
+            print(f"[{time.strftime('%H:%M:%S')}] {changes.summary()}", file=sys.stderr)
+            if changes.rescan or layout_path in changes.modified:
+                try:
+                    layout = load_layout(args.layout)
+                except (OSError, ValueError) as exc:
+                    print(f"cdgenps2: {exc} – keeping the previous layout", file=sys.stderr)
+            else:
+                for part in everything:
+                    part.files = apply_changes(part.files, changes, part.folders)
+    finally:
+        watcher.close()
+        cache.close()
+    return 0
+
+
+def _cmd_size(args: argparse.Namespace) -> int:
+    """Print what the layout's image (each variant's) would take, without
+    reading a byte of the sources."""
+    from core.capacity import CapacityPlanner
+    from core.cnf import with_boot_cnf
+    from core.layoutfile import load_layout
+    from core.variants import variant_files
+
+    layout = load_layout(args.layout)
+    parts = [(v.name, variant_files(layout, v)) for v in layout.variants if not args.variant
+             or v.name in args.variant] if layout.variants else [(None, layout.files)]
+    ok = True
+    for name, files in parts:
+        if name is None and layout.boot_elf:
+            files = with_boot_cnf(files, layout.boot_elf)
+        b = CapacityPlanner.from_files(files).breakdown()
+        title = f"{args.layout}" + (f" [{name}]" if name else "")
+        print(f"{title}: {b.usage(args.max_size)}, {b.files} files")
+        if args.verbose:
+            for label, sectors in b.rows():
+                print(f"  {label:<18} {sectors:>10,}")
+        for issue in b.issues:
+            print(f"{title}: {issue}", file=sys.stderr)
+        if b.unknown:
+            print(f"{title}: {b.unknown} source(s) missing, counted as empty", file=sys.stderr)
+        ok = ok and not b.issues and not b.unknown and (args.max_size is None or b.total <= args.max_size)
+    return 0 if ok else 1
+
+
+def _layout_files(layout, variant: Optional[str]):
+    """The files of *layout* – of its *variant* when it defines variants."""
+    from core.cnf import with_boot_cnf
+    from core.variants import variant_files
+
+    if layout.variants:
+        for v in layout.variants:
+            if v.name == variant:
+                return variant_files(layout, v)
+        names = ", ".join(v.name for v in layout.variants)
+        raise ValueError(f"Pick one of the layout's variants with --variant ({names})")
+    if variant:
+        raise ValueError("The layout defines no variants")
+    return with_boot_cnf(layout.files, layout.boot_elf) if layout.boot_elf else layout.files
+
+
+def _cmd_serve(args: argparse.Namespace) -> int:
+    """Serve the layout's image over HTTP and/or NBD until Ctrl‑C, following
+    changes of its sources and of the layout file."""
+    from core.layoutfile import load_layout
+    from core.serve import HTTP_PORT, NBD_PORT, VirtualImage, http_server, nbd_server, parse_address
+    from core.watch import SourceWatcher, apply_changes
+
+    layout = load_layout(args.layout)
+    image = VirtualImage(_layout_files(layout, args.variant), args.volume_id or layout.volume_id,
+                         layout.hints)
+    servers = []
+    try:
+        if args.http or not args.nbd:
+            servers.append(http_server(image, parse_address(args.http or str(HTTP_PORT), HTTP_PORT)).start())
+        if args.nbd:
+            servers.append(nbd_server(image, parse_address(args.nbd, NBD_PORT)).start())
+    except BaseException:
+        for server in servers:
+            server.close()
+        raise
+
+    stop = threading.Event()
+    signal.signal(signal.SIGINT, lambda _signum, _frame: stop.set())
+    layout_path = os.path.abspath(args.layout)
+    watcher = SourceWatcher()
+    try:
+        for server in servers:
+            print(f"Serving {args.layout} ({image.size} bytes) at {server.url}", file=sys.stderr)
+        print("Ctrl-C to stop", file=sys.stderr)
+        while not stop.is_set():
+            everything = [layout] + layout.variants
+            watcher.watch((f[1] for part in everything for f in part.files),
+                          (root for part in everything for root, _prefix in part.folders), [layout_path])
+            changes = watcher.wait(stop)
+            if not changes:
+                continue
+            print(f"[{time.strftime('%H:%M:%S')}] {changes.summary()}", file=sys.stderr)
+            try:
+                if changes.rescan or layout_path in changes.modified:
+                    layout = load_layout(args.layout)
+                else:
+                    for part in everything:
+                        part.files = apply_changes(part.files, changes, part.folders)
+                if changes.rescan or changes.created or changes.deleted or layout_path in changes.modified:
+                    image.update(_layout_files(layout, args.variant))
+                else:
+                    image.refresh()
+            except (OSError, ValueError, RuntimeError) as exc:
+                print(f"cdgenps2: {exc} – still serving the previous layout", file=sys.stderr)
+    finally:
+        watcher.close()
+        for server in servers:
+            server.close()
+    return 0
+
+
+def _cmd_verify(args: argparse.Namespace) -> int:
+    from core.cnf import with_boot_cnf
+    from core.compress import format_for
+    from core.layoutfile import load_layout
+    from core.verify import verify_image
+
+    if format_for(args.image):
+        raise ValueError("Only raw ISO images can be verified")
+    layout = load_layout(args.layout) if args.layout else None
+    files = layout.files if layout is not None else None
+    if layout is not None and layout.boot_elf:
+        files = with_boot_cnf(files, layout.boot_elf)
+    result = verify_image(args.image, files)
+
+    for warning in result.warnings:
+        print(f"{args.image}: warning: {warning}", file=sys.stderr)
+    print(result.summary(), file=sys.stdout if result.ok else sys.stderr)
+    if args.verbose:
+        print(f"{result.bytes_hashed} bytes hashed in {result.seconds:.2f} s", file=sys.stderr)
+    return 0 if result.ok else 1
+
+
+def _limit(value: str) -> int:
+    from core.capacity import parse_limit
+    try:
+        return parse_limit(value)
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(str(exc)) from None
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("-v", "--verbose", action="store_true", help="log progress to stderr")
+    common.add_argument("--profile", metavar="DIR",
+                        help="write cProfile data and a timing log to DIR (see core/profiling.py)")
+
+    parser = argparse.ArgumentParser(prog="cdgenps2", description="Build PS2 ISO images.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", parents=[common], help="build an image from a JSON layout file")
+    build.add_argument("layout", help="layout file (see core/layoutfile.py)")
+    build.add_argument("-o", "--output", required=True,
+                       help="image to write; '-' or a pipe streams a raw image")
+    build.add_argument("-V", "--volume-id", help="override the layout's volume identifier")
+    build.add_argument("-i", "--incremental", action="store_true",
+                       help="patch the previous image in place when possible")
+    build.add_argument("-r", "--report", metavar="PATH",
+                       help="write a JSON build report (phases, throughput, source disks)")
+    build.add_argument("-f", "--format", choices=("iso", "cso", "zso"),
+                       help="output format (default: from the image extension, else iso)")
+    build.add_argument("--variant", action="append", metavar="NAME",
+                       help="with a layout defining variants, build only NAME (repeatable)")
+    build.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                       help="variants built in parallel (default: one per CPU)")
+    build.add_argument("--no-dedup", action="store_true",
+                       help="write identical files separately instead of sharing one extent")
+    build.add_argument("--verify", action="store_true",
+                       help="re-read the finished image and check it against the layout")
+    build.add_argument("--checksums", action="store_true",
+                       help="write IMAGE.checksums.json: MD5/SHA-1/CRC32 of the image and every file")
+    build.add_argument("--max-size", type=_limit, metavar="SIZE",
+                       help="fail before writing when the image is larger: cd650, cd700, dvd5, dvd9 "
+                            "or bytes (e.g. 700M)")
+    build.add_argument("-w", "--watch", action="store_true",
+                       help="keep running and rebuild (incrementally) whenever a source changes")
+    build.set_defaults(func=_cmd_build)
+
+    size = sub.add_parser("size", parents=[common],
+                          help="print the image size a layout makes, before deduplication (-v: by use), "
+                               "without building it")
+    size.add_argument("layout", help="layout file (see core/layoutfile.py)")
+    size.add_argument("--max-size", type=_limit, metavar="SIZE",
+                      help="exit with 1 when the image is larger (see build --max-size)")
+    size.add_argument("--variant", action="append", metavar="NAME",
+                      help="with a layout defining variants, only NAME (repeatable)")
+    size.set_defaults(func=_cmd_size)
+
+    serve = sub.add_parser("serve", parents=[common],
+                           help="serve the layout's image over HTTP ranges and/or NBD without writing it")
+    serve.add_argument("layout", help="layout file (see core/layoutfile.py)")
+    serve.add_argument("--http", metavar="[HOST:]PORT",
+                       help="HTTP address (default: 127.0.0.1:8080 when --nbd is not given)")
+    serve.add_argument("--nbd", metavar="[HOST:]PORT|SOCKET",
+                       help="read-only NBD export on a TCP port (default port 10809) or a Unix socket path")
+    serve.add_argument("-V", "--volume-id", help="override the layout's volume identifier")
+    serve.add_argument("--variant", metavar="NAME",
+                       help="with a layout defining variants, the one to serve")
+    serve.set_defaults(func=_cmd_serve)
+
+    verify = sub.add_parser("verify", parents=[common],
+                            help="check an image's structure, boot chain and (with a layout) contents")
+    verify.add_argument("image", help="raw ISO image")
+    verify.add_argument("layout", nargs="?", help="layout file the image was built from")
+    verify.set_defaults(func=_cmd_verify)
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format="%(name)s: %(message)s")
+    if args.profile:
+        os.environ["CDGENPS2_PROFILE"] = args.profile
+    from core.profiling import profiled
+    try:
+        with profiled(args.command):
+            return args.func(args)
+    except (OSError, ValueError, RuntimeError) as exc:   # incl. BuildCancelled
+        print(f"cdgenps2: {exc}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
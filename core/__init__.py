@@ -0,0 +1 @@
+"""Logica di generazione dell'immagine ISO, indipendente dalla GUI."""
@@ -0,0 +1,191 @@
+"""One build from start to finish, shared by the GUI and the headless CLI.
+
+:func:`run_build` validates the layout, plans it, writes (or patches) the
+image and, when asked, leaves a JSON build report behind – also for
+failed and cancelled builds, which are the ones worth looking at – and a
+checksum sidecar (see :mod:`core.checksums`).
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import time
+from typing import List, Mapping, Optional, Tuple
+
+from core.capacity import CapacityPlanner
+from core.checksums import Checksums, read_back, save_checksums
+from core.incremental import build_incremental, discard_manifest, manifest_digests, save_manifest
+from core.layout import LayoutHints, sanitise_and_sort
+from core.progress import BuildCancelled, BuildProgress, write_report
+from core.sinks import is_stream
+from core.sources import source_extent
+from core.statcache import StatCache
+from core.verify import verify_image
+from core.writer import ImagePlan, build_image
+
+logger = logging.getLogger("buildiso")
+
+
+def _check_output(output_path: str, files: List[Tuple[str, str, Optional[int]]]) -> None:
+    """Refuse to overwrite an image the layout still reads files from."""
+    if not os.path.exists(output_path):
+        return
+    for image in {e.path for f in files if (e := source_extent(f[1])) is not None}:
+        if os.path.exists(image) and os.path.samefile(image, output_path):
+            raise ValueError(f"{output_path} is the image being remastered – write the new one to another file")
+
+
+def _check_estimate(plan: ImagePlan, hints: Optional[LayoutHints]) -> None:
+    """Warn when the live size estimate (see :mod:`core.capacity`) and the
+    writer disagree on an image the estimate covers: no extent shared and
+    no hint reordering the files that fill the gaps between pins."""
+    if plan.shared_bytes or (hints is not None and any(f.pinned for f in plan.files)):
+        return
+    estimate = CapacityPlanner.of_plan(plan).breakdown().total
+    if estimate != plan.total_sectors:
+        logger.warning("Size estimate of %d sectors differs from the %d written – please report it",
+                       estimate, plan.total_sectors)
+
+
+def run_build(
+    output_path: str,
+    files: List[Tuple[str, str, Optional[int]]],
+    volume_id: str,
+    hints: Optional[LayoutHints] = None,
+    incremental: bool = False,
+    progress: Optional[BuildProgress] = None,
+    report: Optional[str] = None,
+    cache: Optional[StatCache] = None,
+    dedup: bool = True,
+    compression: Optional[str] = None,
+    stats: Optional[Mapping[str, Optional[os.stat_result]]] = None,
+    content: Optional[Mapping[str, str]] = None,
+    verify: bool = False,
+    checksums: bool = False,
+    max_sectors: Optional[int] = None,
+) -> Tuple[ImagePlan, int]:
+    """Build *output_path*; returns the plan and the number of bytes written.
+
+    Raises :class:`~core.progress.BuildCancelled` when ``progress.cancel``
+    is set mid‑way.  *report* is the path of the JSON build report.  Every
+    source is stat'ed once, in parallel, through *cache* (a private one
+    when ``None``); validation and layout share the results.  *dedup*
+    stores identical files once (see :mod:`core.dedup`).  *compression*
+    (``"cso"``/``"zso"``) writes a compressed image; those are always
+    written in full, incremental patching needs a raw one.  Every raw
+    image gets the manifest an incremental build patches it from (see
+    :mod:`core.incremental`).
+
+    *stats* and *content* come from a scan shared by several builds (see
+    :mod:`core.variants`); they must cover every source of *files*.
+
+    *verify* re‑reads the finished image (see :mod:`core.verify`) and
+    fails the build with ``RuntimeError`` when it does not match the
+    layout; compressed images are not verified.
+
+    *output_path* may be ``-`` (stdout) or a pipe (see :mod:`core.sinks`):
+    the image is then streamed in full and neither patched nor verified.
+
+    *checksums* writes ``<image>.checksums.json`` with the MD5, SHA‑1 and
+    CRC32 of the image and of every file, hashed while the image is
+    written; a patched image is read back once instead.  Streams get
+    their image digests logged.
+
+    *max_sectors* (see :mod:`core.capacity`) fails the build right after
+    planning when the image would be larger – nothing is written.
+    """
+    progress = progress or BuildProgress()
+    stream = is_stream(output_path)
+    if incremental and (compression or stream):
+        logger.info("%s cannot be patched – writing it in full",
+                    f"{compression.upper()} image {output_path}" if compression else output_path)
+        incremental = False
+    own_cache = cache is None
+    cache = cache or StatCache(watch=False)
+    started = time.time()
+    status, error, plan, written = "failed", None, None, 0
+    checked = None
+    sums = Checksums() if checksums else None
+    checksum_file = None
+    try:
+        with progress.phase("validation"):
+            if stats is None:
+                stats = cache.snapshot([f[1] for f in files], max_age=0.0)
+            files = sanitise_and_sort(files, stats)
+            _check_output(output_path, files)
+
+        if incremental:
+            plan, written = build_incremental(output_path, files, volume_id, hints,
+                                              progress, stats, dedup, content, sums, max_sectors)
+        else:
+            raw = not compression and not stream     # what a later build can patch
+            digests = manifest_digests(sums) if raw else None
+            if raw:
+                discard_manifest(output_path)
+            plan = build_image(output_path, files, volume_id, hints, progress, stats, dedup,
+                               compression, content, sums, max_sectors, digests)
+            written = plan.size
+            if raw:
+                save_manifest(output_path, plan, digests or {})
+
+        _check_estimate(plan, hints)
+
+        if sums is not None:
+            if sums.image is None:
+                with progress.phase("checksums"):
+                    read_back(output_path, plan, sums, progress)
+            if stream:
+                logger.info("Image %s", "  ".join(f"{k} {v}" for k, v in sums.image.hexdigests().items()))
+            else:
+                checksum_file = save_checksums(output_path, plan, sums, compression)
+                logger.info("Checksums written to %s", checksum_file)
+
+        if verify and (compression or stream):
+            logger.info("%s is not verified", f"{compression.upper()} image {output_path}"
+                        if compression else output_path)
+        elif verify:
+            with progress.phase("verify"):
+                checked = verify_image(output_path, files, progress=progress)
+            for warning in checked.warnings:
+                logger.warning("%s", warning)
+            if not checked.ok:
+                raise RuntimeError(checked.summary())
+        status = "ok"
+        return plan, written
+    except BuildCancelled:
+        status = "cancelled"
+        raise
+    except Exception as exc:
+        error = str(exc)
+        raise
+    finally:
+        if own_cache:
+            cache.close()
+        if sums is not None:
+            sums.close()
+        for name, counter in progress.phases.items():
+            logger.info("%-11s %8.3f s  %12d bytes", name, counter.seconds, counter.bytes)
+        if plan is not None and plan.shared_bytes:
+            logger.info("Deduplication saved %d bytes", plan.shared_bytes)
+        if report:
+            write_report(report, progress.report(
+                status=status,
+                error=error,
+                output=output_path,
+                volume_id=volume_id,
+                incremental=incremental,
+                started=time.strftime("%Y-%m-%dT%H:%M:%S%z", time.localtime(started)),
+                files=len(files),
+                image_bytes=plan.size if plan is not None else None,
+                image_sectors=plan.total_sectors if plan is not None else None,
+                dedup_saved_bytes=plan.shared_bytes if plan is not None else None,
+                format=compression or "iso",
+                output_bytes=None if status != "ok" else plan.size if stream
+                else os.path.getsize(output_path),
+                checksums=checksum_file,
+                verify=None if checked is None else {
+                    "errors": checked.errors, "warnings": checked.warnings,
+                    "files_compared": checked.files_compared, "bytes_hashed": checked.bytes_hashed,
+                },
+            ))
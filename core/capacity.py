@@ -0,0 +1,388 @@
+"""Image size and media capacity, known before anything is written.
+
+:class:`Breakdown` splits an image into what takes its sectors: the fixed
+system area and volume descriptors, both path tables, the ISO‑9660
+directory extents, the UDF file entries and identifiers, the file data,
+the sectors left free below pinned extents (``SYSTEM.CNF`` at 12231
+reserves everything before it) and the tail pad.  :meth:`Breakdown.of_plan`
+reads it off a real :class:`~core.writer.ImagePlan`.
+
+:class:`CapacityPlanner` keeps the same numbers up to date while a layout
+is edited, from the sizes the layout already knows: adding or removing a
+file touches its directory and a few counters, and only the directories
+that changed have their extents re‑measured on the next
+:meth:`~CapacityPlanner.breakdown`.  The result is what
+:func:`~core.writer.plan_image` would produce without deduplication and
+ordering hints (both can only shrink the image or move the fill of a
+pinned gap); every build compares the two (see
+:func:`core.build.run_build`) and warns when they part.
+"""
+
+from __future__ import annotations
+
+import itertools
+import os
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Set, Tuple
+
+from core import iso9660, udf
+from core.iso9660 import SECTOR_SIZE, sectors_for
+from core.sources import Source, source_stat
+from core.writer import PAD_SECTORS
+
+SYSTEM_SECTORS: int = udf.PARTITION_START + 2   # descriptors, UDF anchor and file set
+
+# Usable sectors of the common targets, smallest first
+MEDIA: Dict[str, Tuple[str, int]] = {
+    "cd650": ("CD 650 MB", 333_000),
+    "cd700": ("CD 700 MB", 360_000),
+    "dvd5": ("DVD‑5", 2_295_104),
+    "dvd9": ("DVD‑9", 4_173_824),
+}
+
+
+def parse_limit(value: str) -> int:
+    """Sectors allowed by ``--max-size``: a :data:`MEDIA` name or a number
+    of bytes with an optional ``K``/``M``/``G`` suffix."""
+    key = value.lower()
+    if key in MEDIA:
+        return MEDIA[key][1]
+    units = {"k": 1 << 10, "m": 1 << 20, "g": 1 << 30}
+    scale = units.get(key[-1:], 1)
+    try:
+        size = float(key[:-1] if scale > 1 else key) * scale
+    except ValueError:
+        raise ValueError(f"Unknown size {value!r}: use {', '.join(MEDIA)} or bytes (e.g. 700M)") from None
+    return int(size) // SECTOR_SIZE
+
+
+def smallest_media(sectors: int) -> Optional[str]:
+    """Key of the smallest :data:`MEDIA` the image fits on, or ``None``."""
+    for key, (_label, capacity) in MEDIA.items():
+        if sectors <= capacity:
+            return key
+    return None
+
+
+def _mb(sectors: int) -> str:
+    return f"{sectors * SECTOR_SIZE / 2**20:,.1f} MB"
+
+# --------------------------------------------------------------------------- #
+# Breakdown
+# --------------------------------------------------------------------------- #
+
+@dataclass
+class Breakdown:
+    """Sectors of an image by what uses them."""
+
+    system: int = SYSTEM_SECTORS
+    path_tables: int = 0
+    directories: int = 0
+    udf: int = 0
+    data: int = 0
+    reserved: int = 0                  # free sectors below pinned extents
+    padding: int = PAD_SECTORS + 1     # tail pad and trailing anchor
+    files: int = 0
+    unknown: int = 0                   # files counted as empty: size not known yet
+    issues: List[str] = field(default_factory=list)
+
+    @property
+    def total(self) -> int:
+        return (self.system + self.path_tables + self.directories + self.udf + self.data
+                + self.reserved + self.padding)
+
+    @property
+    def size(self) -> int:
+        return self.total * SECTOR_SIZE
+
+    @classmethod
+    def of_plan(cls, plan) -> "Breakdown":
+        out = cls(
+            path_tables=2 * sectors_for(plan.path_table_size),
+            directories=sum(n.size // SECTOR_SIZE for n in plan.directories),
+            udf=sum(1 + sectors_for(n.fid_size) for n in plan.directories) + len(plan.files),
+            data=sum(f.sectors for f in plan.files if f.shares is None),
+            files=len(plan.files),
+        )
+        out.reserved = plan.total_sectors - out.total
+        return out
+
+    def usage(self, limit: Optional[int] = None) -> str:
+        """One line: the size and how full the target (or the smallest
+        medium it fits on) gets."""
+        text = f"{self.total:,} sectors ({_mb(self.total)})"
+        if limit is None:
+            media = smallest_media(self.total)
+            if media is None:
+                return f"{text}, larger than a {MEDIA['dvd9'][0]}"
+            label, limit = MEDIA[media]
+            return f"{text}, {self.total / limit:.0%} of a {label}"
+        if self.total > limit:
+            return f"{text}, {_mb(self.total - limit)} over the {_mb(limit)} limit"
+        return f"{text}, {_mb(limit - self.total)} left of {_mb(limit)}"
+
+    def rows(self) -> List[Tuple[str, int]]:
+        return [
+            ("System area", self.system),
+            ("Path tables", self.path_tables),
+            ("Directories", self.directories),
+            ("UDF entries", self.udf),
+            ("File data", self.data),
+            ("Reserved (pinned)", self.reserved),
+            ("Padding", self.padding),
+        ]
+
+
+# --------------------------------------------------------------------------- #
+# Live planner
+# --------------------------------------------------------------------------- #
+
+class _Dir:
+    __slots__ = ("name", "parent", "kids", "sections", "sectors", "fid_sectors", "dirty")
+
+    def __init__(self, name: str, parent: Optional["_Dir"]) -> None:
+        self.name = name
+        self.parent = parent
+        self.kids: Dict[str, Optional["_Dir"]] = {}    # name → sub‑directory, None for files
+        self.sections: Dict[str, int] = {}             # files of 4 GiB and more → records
+        self.sectors = 0
+        self.fid_sectors = 0
+        self.dirty = True
+
+    def measure(self) -> None:
+        idents = [(iso9660.dir_identifier(n) if d is not None else iso9660.file_identifier(n),
+                   self.sections.get(n, 1)) for n, d in self.kids.items()]
+        idents.sort(key=lambda item: iso9660.record_sort_key(item[0]))
+        lengths = [iso9660.dir_record_length(b"\x00")] * 2
+        for ident, count in idents:
+            lengths += [iso9660.dir_record_length(ident)] * count
+        self.sectors = iso9660.directory_extent_size(lengths) // SECTOR_SIZE
+        self.fid_sectors = sectors_for(udf.fid_length("") + sum(udf.fid_length(n) for n in self.kids))
+        self.dirty = False
+
+
+class CapacityPlanner:
+    """Running size of a layout (see the module doc).
+
+    Paths are ISO paths as the layout holds them; like the writer, the
+    planner upper‑cases them.  Directories exist while they hold a file.
+    """
+
+    def __init__(self) -> None:
+        self._root = _Dir("", None)
+        self._dirs: Dict[str, _Dir] = {"": self._root}
+        self._files: Dict[str, Tuple[int, Optional[int]]] = {}    # path → (size, pinned LBA)
+        self._data = 0                       # sectors of the unpinned files
+        self._path_table = iso9660.path_table_entry_length(b"\x00")
+        self._unknown = 0
+        self._cached: Optional[Breakdown] = None
+        # the writer's placement order, needed once a file is pinned: sort
+        # keys ("/" → "\0" sorts like the path split in parts), kept sorted
+        # lazily – new paths are merged in, gone ones filtered out
+        self._order: Optional[List[str]] = None
+        self._fresh: List[str] = []
+        self._ordered: Set[str] = set()
+        self._stale = False
+
+    @classmethod
+    def from_files(cls, files: Iterable[Tuple[str, Source, Optional[int]]],
+                   stats: Optional[Mapping[Source, Optional[os.stat_result]]] = None) -> "CapacityPlanner":
+        """Planner over ``(iso_rel, source, lba)`` entries; sources are
+        stat'ed unless *stats* covers them."""
+        planner = cls()
+        for iso_rel, source, lba in files:
+            st = stats.get(source) if stats is not None and source in stats else None
+            if st is None:
+                try:
+                    st = source_stat(source)
+                except OSError:
+                    st = None
+            planner.add(iso_rel, -1 if st is None else st.st_size, lba)
+        return planner
+
+    @classmethod
+    def of_plan(cls, plan) -> "CapacityPlanner":
+        """Planner over the files of a real plan, pinned where the plan
+        pinned them – by the layout, a previous build or an imported image."""
+        planner = cls()
+        for fnode in plan.files:
+            planner.add(fnode.iso_path, fnode.size, fnode.lba if fnode.pinned else None)
+        return planner
+
+    def __len__(self) -> int:
+        return len(self._files)
+
+    # ------------------------------------------------------------------ #
+    def add(self, iso_path: str, size: int, lba: Optional[int] = None) -> None:
+        """Count a file of *size* bytes (negative: not known yet)."""
+        path = iso_path.upper()
+        if path in self._files:
+            return                           # duplicate: the build refuses it anyway
+        dir_path, _, name = path.rpartition("/")
+        parent = self._dir(dir_path)
+        if parent is None:
+            return
+        parent.kids[name] = None
+        if size > iso9660.MAX_EXTENT_SIZE:
+            parent.sections[name] = len(iso9660.file_sections(size))
+        parent.dirty = True
+        self._files[path] = (size, lba)
+        if self._order is not None and path not in self._ordered:
+            self._ordered.add(path)
+            self._fresh.append(path.replace("/", "\0"))
+        if size < 0:
+            self._unknown += 1
+        elif lba is None:
+            self._data += sectors_for(size)
+        self._cached = None
+
+    def remove(self, iso_path: str) -> None:
+        """Forget a file, or a directory with everything below it."""
+        path = iso_path.upper()
+        node = self._dirs.get(path)
+        if node is not None:
+            for name in list(node.kids):
+                self.remove(f"{path}/{name}" if path else name)
+            return
+        entry = self._files.pop(path, None)
+        if entry is None:
+            return
+        size, lba = entry
+        self._stale = True
+        if size < 0:
+            self._unknown -= 1
+        elif lba is None:
+            self._data -= sectors_for(size)
+        dir_path, _, name = path.rpartition("/")
+        parent = self._dirs[dir_path]
+        del parent.kids[name]
+        parent.sections.pop(name, None)
+        parent.dirty = True
+        self._prune(parent, dir_path)
+        self._cached = None
+
+    def update(self, iso_path: str, size: int, lba: Optional[int] = None) -> None:
+        """New size or pinned LBA of a file already counted."""
+        self.remove(iso_path)
+        self.add(iso_path, size, lba)
+
+    def _dir(self, dir_path: str) -> Optional[_Dir]:
+        node = self._dirs.get(dir_path)
+        if node is not None:
+            return node
+        parent_path, _, name = dir_path.rpartition("/")
+        parent = self._dir(parent_path)
+        if parent is None or name in parent.kids:
+            return None                      # a file holds the name
+        node = self._dirs[dir_path] = _Dir(name, parent)
+        parent.kids[name] = node
+        parent.dirty = True
+        self._path_table += iso9660.path_table_entry_length(iso9660.dir_identifier(name))
+        return node
+
+    def _prune(self, node: _Dir, path: str) -> None:
+        while node.parent is not None and not node.kids:
+            del self._dirs[path]
+            del node.parent.kids[node.name]
+            node.parent.dirty = True
+            self._path_table -= iso9660.path_table_entry_length(iso9660.dir_identifier(node.name))
+            node = node.parent
+            path = path.rpartition("/")[0]
+
+    # ------------------------------------------------------------------ #
+    def breakdown(self) -> Breakdown:
+        """Current sectors by use; cached until the layout changes."""
+        if self._cached is not None:
+            return self._cached
+        for node in self._dirs.values():
+            if node.dirty:
+                node.measure()
+        out = Breakdown(
+            path_tables=2 * sectors_for(self._path_table),
+            directories=sum(n.sectors for n in self._dirs.values()),
+            udf=sum(1 + n.fid_sectors for n in self._dirs.values()) + len(self._files),
+            files=len(self._files),
+            unknown=self._unknown,
+        )
+        start = out.system + out.path_tables + out.directories
+        pinned = [(lba, sectors_for(size)) for size, lba in self._files.values()
+                  if lba is not None and size > 0]
+        data = sum(sectors for _lba, sectors in pinned)
+        end = start + out.udf + self._data
+        if pinned:
+            end = self._allocate(start, pinned, out)
+        out.data = self._data + data
+        out.reserved = max(0, end - start - out.udf - out.data)
+        self._cached = out
+        return out
+
+    def _data_order(self) -> Iterator[int]:
+        """Sectors of every unpinned file, in the writer's placement order."""
+        if self._order is None:
+            self._order = sorted(p.replace("/", "\0") for p in self._files)
+            self._ordered = set(self._files)
+        if self._fresh:
+            self._fresh.sort()
+            self._order += self._fresh       # two sorted runs: the sort merges them
+            self._order.sort()
+            self._fresh = []
+        if self._stale:
+            self._order = [k for k in self._order if k.replace("\0", "/") in self._files]
+            self._ordered = {k.replace("\0", "/") for k in self._order}
+            self._stale = False
+        files = self._files
+        for key in self._order:
+            size, lba = files[key.replace("\0", "/")]
+            if lba is None and size >= 0:
+                yield sectors_for(size)
+
+    def _allocate(self, start: int, pinned: List[Tuple[int, int]], out: Breakdown) -> int:
+        """First free sector once everything is packed around the pins.
+
+        Mirrors :func:`core.layout.allocate` over the writer's order (see
+        :func:`core.writer.plan_image`) without placing each run: only what
+        fills the gaps below the last pin matters, and a gap stops taking
+        new runs once it is full.
+        """
+        below = [lba for lba, _n in pinned if lba < start]
+        if below:
+            out.issues.append(f"{len(below)} pinned file(s) inside the filesystem metadata "
+                              f"(first free sector is {start})")
+            pinned = [p for p in pinned if p[0] >= start]
+        pinned.sort()
+        gaps, prev_end = [], start
+        for lba, sectors in pinned:
+            if lba < prev_end:
+                out.issues.append(f"Pinned extent at LBA {lba} overlaps sector {prev_end - 1}")
+            gaps.append(max(0, lba - prev_end))
+            prev_end = max(prev_end, lba + sectors)
+
+        order: List[_Dir] = [self._root]
+        for node in order:                   # breadth first, like the path table
+            order += [node.kids[n] for n in sorted(
+                (n for n, d in node.kids.items() if d is not None),
+                key=lambda n: iso9660.record_sort_key(n.encode()))]
+        fresh = itertools.chain((1 + n.fid_sectors for n in order), itertools.repeat(1, len(self._files)),
+                                self._data_order())
+        total = sum(1 + n.fid_sectors for n in order) + len(self._files) + self._data
+        placed = 0
+        waiting: List[int] = []              # runs that did not fit an earlier gap, in order
+        for room in gaps:
+            rest = []
+            for sectors in waiting:
+                if sectors <= room:
+                    room -= sectors
+                    placed += sectors
+                else:
+                    rest.append(sectors)
+            waiting = rest
+            while room:
+                sectors = next(fresh, None)
+                if sectors is None:
+                    break
+                if sectors <= room:
+                    room -= sectors
+                    placed += sectors
+                else:
+                    waiting.append(sectors)
+        return prev_end + total - placed
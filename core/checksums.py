@@ -0,0 +1,185 @@
+"""Release checksums: MD5, SHA‑1 and CRC32 of the image and of every file.
+
+The writer hashes the data as it streams it (see ``write_image(checksums=…)``)
+so a release costs no second read of a multi‑GB image.  Every algorithm of
+every stream is updated on a small thread pool – ``hashlib`` and ``zlib``
+release the GIL on large buffers – with at most one pending chunk per
+digest, so hashing overlaps the writes instead of adding to them.
+
+An incremental build only rewrites a few sectors, so its checksums come
+from one sequential read of the finished image (:func:`read_back`).  The
+results land in ``<image>.checksums.json``; for CSO/ZSO images the image
+digests are those of the ISO data inside.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+from core.iso9660 import SECTOR_SIZE
+from core.progress import BuildProgress
+
+CHECKSUMS_VERSION: int = 1
+CHECKSUMS_SUFFIX: str = ".checksums.json"
+ALGORITHMS = ("md5", "sha1", "crc32")
+HASH_WORKERS: int = min(len(ALGORITHMS) * 2, os.cpu_count() or 1)
+READ_CHUNK: int = 4 << 20
+
+
+def checksums_path(output_path: str) -> str:
+    return output_path + CHECKSUMS_SUFFIX
+
+
+class _Crc32:
+    def __init__(self) -> None:
+        self.value = 0
+
+    def update(self, data) -> None:
+        self.value = zlib.crc32(data, self.value)
+
+    def hexdigest(self) -> str:
+        return f"{self.value:08x}"
+
+
+class _Digest:
+    """One algorithm over one stream, updated on the pool in order."""
+
+    def __init__(self, name: str, pool: Optional[ThreadPoolExecutor]) -> None:
+        self._hash = _Crc32() if name == "crc32" else hashlib.new(name)
+        self._pool = pool
+        self._pending: Optional[Future] = None
+
+    def update(self, data) -> None:
+        if self._pool is None:
+            self._hash.update(data)
+            return
+        if self._pending is not None:
+            self._pending.result()          # keeps chunks in order and memory bounded
+        self._pending = self._pool.submit(self._hash.update, data)
+
+    def hexdigest(self) -> str:
+        if self._pending is not None:
+            self._pending.result()
+            self._pending = None
+        return self._hash.hexdigest()
+
+
+class MultiDigest:
+    """Every algorithm of :data:`ALGORITHMS` over one stream.
+
+    Stands in for a ``hashlib.sha1()``: :meth:`hexdigest` is the SHA‑1.
+    *data* handed to :meth:`update` must not change afterwards (``bytes``).
+    """
+
+    def __init__(self, pool: Optional[ThreadPoolExecutor] = None) -> None:
+        self._digests = [_Digest(name, pool) for name in ALGORITHMS]
+
+    def update(self, data) -> None:
+        for digest in self._digests:
+            digest.update(data)
+
+    def hexdigests(self) -> Dict[str, str]:
+        return {name: d.hexdigest() for name, d in zip(ALGORITHMS, self._digests)}
+
+    def hexdigest(self) -> str:
+        return self._digests[ALGORITHMS.index("sha1")].hexdigest()
+
+
+class Checksums:
+    """What one build collects: the image digest and one per file.
+
+    *image* is ``None`` until the whole image went through it; a patched
+    image leaves it to :func:`read_back`.
+    """
+
+    def __init__(self, workers: int = HASH_WORKERS) -> None:
+        self._pool = ThreadPoolExecutor(workers, thread_name_prefix="checksum") if workers > 1 else None
+        self.image: Optional[MultiDigest] = None
+        self.files: Dict[str, Dict[str, str]] = {}
+
+    def new(self) -> MultiDigest:
+        return MultiDigest(self._pool)
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown()
+
+# --------------------------------------------------------------------------- #
+# Read back
+# --------------------------------------------------------------------------- #
+
+def read_back(output_path: str, plan, checksums: Checksums,
+              progress: Optional[BuildProgress] = None) -> None:
+    """Hash the image at *output_path* and every file extent of *plan* in
+    one sequential read."""
+    extents = sorted((f for f in plan.files if f.size and f.shares is None), key=lambda f: f.lba)
+    image = checksums.new()
+    digests = {f.iso_path: checksums.new() for f in extents}
+    fd = os.open(output_path, os.O_RDONLY)
+    try:
+        if hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        pos, first = 0, 0
+        while pos < plan.size:
+            data = os.pread(fd, min(READ_CHUNK, plan.size - pos), pos)
+            if not data:
+                raise RuntimeError(f"{output_path} is shorter than planned")
+            image.update(data)
+            end = pos + len(data)
+            view = memoryview(data)
+            while first < len(extents) and extents[first].lba * SECTOR_SIZE + extents[first].size <= pos:
+                first += 1
+            for f in extents[first:]:
+                start = f.lba * SECTOR_SIZE
+                if start >= end:
+                    break
+                lo, hi = max(start, pos), min(start + f.size, end)
+                if lo < hi:
+                    digests[f.iso_path].update(view[lo - pos:hi - pos])
+            pos = end
+            if progress is not None:
+                progress.check()
+                progress.count(len(data))
+    finally:
+        os.close(fd)
+    checksums.image = image
+    checksums.files = {iso: d.hexdigests() for iso, d in digests.items()}
+
+# --------------------------------------------------------------------------- #
+# Sidecar
+# --------------------------------------------------------------------------- #
+
+def save_checksums(output_path: str, plan, checksums: Checksums, compression: Optional[str] = None) -> str:
+    """Write ``<image>.checksums.json`` atomically; returns its path.
+
+    Deduplicated copies share their owner's extent and digests; empty
+    files get the digests of no data.
+    """
+    empty = MultiDigest().hexdigests()
+    files: Dict[str, Any] = {}
+    for f in plan.files:
+        owner = f.shares or f
+        sums = checksums.files.get(owner.iso_path, empty if not f.size else None)
+        files[f.iso_path] = {"lba": owner.lba, "size": f.size, **(sums or {})}
+    data = {
+        "version": CHECKSUMS_VERSION,
+        "image": os.path.basename(output_path),
+        "format": compression or "iso",
+        "volume_id": plan.volume_id,
+        "size": plan.size,
+        "sectors": plan.total_sectors,
+        "digests": checksums.image.hexdigests() if checksums.image is not None else None,
+        "files": files,
+    }
+    path = checksums_path(output_path)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(data, fh, indent=1)
+    os.replace(tmp, path)
+    return path
+
@@ -0,0 +1,62 @@
+"""``SYSTEM.CNF`` generation – the file the PS2 ROM reads to find the ELF."""
+
+from __future__ import annotations
+
+import re
+from typing import Dict, List, Mapping, Optional, Tuple
+
+from core.sources import Source, memory_source, source_stat
+
+CNF_NAME: str = "SYSTEM.CNF"
+CNF_LBA: int = 12231
+CNF_DEFAULTS: Dict[str, str] = {"VER": "1.00", "VMODE": "NTSC"}
+
+_KEY = re.compile(r"[A-Z][A-Z0-9_]*\Z")
+
+
+def make_cnf_content(iso_path: str, fields: Optional[Mapping[str, str]] = None) -> str:
+    """Return the text for SYSTEM.CNF given an ELF ISO path.
+
+    *fields* override or extend :data:`CNF_DEFAULTS` (``VMODE=PAL``,
+    ``VER=1.01``…); ``BOOT2`` always comes first.
+    """
+    elf_path_cnf = iso_path.replace("/", "\\")
+    if not elf_path_cnf.endswith(";1"):
+        elf_path_cnf += ";1"
+
+    lines = [f"BOOT2=cdrom0:\\{elf_path_cnf}"]
+    for key, value in {**CNF_DEFAULTS, **(fields or {})}.items():
+        if not _KEY.match(key) or key == "BOOT2":
+            raise ValueError(f"Invalid SYSTEM.CNF key: {key}")
+        if "\n" in str(value) or "\r" in str(value):
+            raise ValueError(f"Invalid SYSTEM.CNF value for {key}")
+        lines.append(f"{key}={value}")
+    return "\n".join(lines) + "\n"
+
+
+def cnf_source(iso_path: str, fields: Optional[Mapping[str, str]] = None,
+               mtime: Optional[float] = None) -> Source:
+    """SYSTEM.CNF booting *iso_path*, as an in‑memory source."""
+    return memory_source(CNF_NAME, make_cnf_content(iso_path, fields).encode("ascii"), mtime)
+
+
+def with_boot_cnf(
+    files: List[Tuple[str, Source, Optional[int]]],
+    boot_elf: str,
+    fields: Optional[Mapping[str, str]] = None,
+) -> List[Tuple[str, Source, Optional[int]]]:
+    """Return *files* with a fresh SYSTEM.CNF booting *boot_elf*.
+
+    The file is dated like the ELF, so an unchanged one leaves an
+    incremental rebuild nothing to patch.
+    """
+    elf = next((f[1] for f in files if f[0] == boot_elf), None)
+    if not boot_elf.upper().endswith(".ELF") or elf is None:
+        raise ValueError(f"boot_elf {boot_elf} is not an ELF file of the layout")
+
+    try:
+        mtime: Optional[float] = source_stat(elf).st_mtime
+    except OSError:
+        mtime = None                             # the build reports the missing ELF
+    cnf = cnf_source(boot_elf, fields, mtime)
+    return [f for f in files if f[0].upper() != CNF_NAME] + [(CNF_NAME, cnf, CNF_LBA)]
@@ -0,0 +1,184 @@
+"""Compressed block images: CSO (deflate) and ZSO (LZ4), written on the fly.
+
+Both formats share the CISO layout: a 24‑byte header, an index of
+``blocks + 1`` little‑endian 32‑bit offsets (shifted right by *align*, top
+bit set for a block stored as is) and the blocks themselves.  Emulators
+and loaders (PCSX2, OPL…) read them directly.
+
+The writer streams the image into a :class:`BlockCompressor` instead of a
+raw file: blocks are compressed in batches on a process pool with a
+bounded number of batches in flight, written in order as they come back,
+and their index entries are patched in behind them – no raw intermediate
+image is ever written or read back.
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+import os
+import struct
+import zlib
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Deque, List, Optional, Tuple
+
+FORMATS = {".cso": "cso", ".zso": "zso"}
+BLOCK_SIZE: int = 2048
+BATCH_BLOCKS: int = 512                 # 1 MiB of image per pool task
+COMPRESS_WORKERS: int = os.cpu_count() or 1
+PENDING_PER_WORKER: int = 2             # batches in flight: bounds memory
+CSO_LEVEL: int = 9                      # zlib
+ZSO_LEVEL: int = 9                      # LZ4 HC
+
+_MAGIC = {"cso": b"CISO", "zso": b"ZISO"}
+_HEADER = struct.Struct("<4sIQIBB2x")
+_PLAIN = 0x80000000
+
+Block = Tuple[bytes, bool]              # payload, stored uncompressed
+
+
+def format_for(path: str) -> Optional[str]:
+    """``"cso"``/``"zso"`` from the extension of *path*, ``None`` for raw."""
+    return FORMATS.get(os.path.splitext(path)[1].lower())
+
+
+def _lz4():
+    try:
+        import lz4.block
+    except ImportError:
+        raise ValueError("ZSO output needs the 'lz4' package (pip install lz4)") from None
+    return lz4.block
+
+
+def check_codec(codec: str) -> None:
+    """Raise ``ValueError`` unless *codec* can be written here."""
+    if codec not in _MAGIC:
+        raise ValueError(f"Unknown compressed format: {codec}")
+    if codec == "zso":
+        _lz4()
+
+
+def _compress_batch(codec: str, level: int, block_size: int, data: bytes) -> List[Block]:
+    """Runs in a pool process: compress every block of *data*."""
+    lz4 = _lz4() if codec == "zso" else None
+    out: List[Block] = []
+    for pos in range(0, len(data), block_size):
+        raw = data[pos:pos + block_size]
+        if lz4 is not None:
+            packed = lz4.compress(raw, mode="high_compression", compression=level, store_size=False)
+        else:
+            deflate = zlib.compressobj(level, zlib.DEFLATED, -15)
+            packed = deflate.compress(raw) + deflate.flush()
+        out.append((raw, True) if len(packed) >= len(raw) else (packed, False))
+    return out
+
+
+def pool_context():
+    """Start method for the builder's process pools.
+
+    Never fork the GUI process: its Qt threads would be copied half‑way.
+    """
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+class BlockCompressor:
+    """Sequential sink turning *total_bytes* of image into a CSO/ZSO file.
+
+    Call :meth:`write` with the image bytes in order, then :meth:`close`
+    (or :meth:`abort` on failure).  *fd* must be empty and seekable.
+    """
+
+    def __init__(self, fd: int, total_bytes: int, codec: str, level: Optional[int] = None,
+                 workers: Optional[int] = None, block_size: int = BLOCK_SIZE) -> None:
+        check_codec(codec)
+        workers = workers or COMPRESS_WORKERS
+        self.fd = fd
+        self.codec = codec
+        self.level = level if level is not None else (ZSO_LEVEL if codec == "zso" else CSO_LEVEL)
+        self.total_bytes = total_bytes
+        self.block_size = block_size
+        self.blocks = -(-total_bytes // block_size)
+
+        index_end = _HEADER.size + 4 * (self.blocks + 1)
+        # Offsets are 31‑bit after the shift: grow the alignment for huge images
+        self.align = 0
+        while (index_end + total_bytes + self.blocks * ((1 << self.align) - 1)) >> self.align >= _PLAIN:
+            self.align += 1
+        self.pos = self._aligned(index_end)
+        os.pwrite(fd, bytes(self.pos), 0)
+        os.lseek(fd, self.pos, os.SEEK_SET)
+
+        self.written_blocks = 0
+        self._buf = bytearray()
+        self._batch = BATCH_BLOCKS * block_size
+        self._pending: Deque[Future] = deque()
+        self._max_pending = max(1, workers) * PENDING_PER_WORKER
+        self._pool = ProcessPoolExecutor(workers, mp_context=pool_context())
+
+    def _aligned(self, pos: int) -> int:
+        mask = (1 << self.align) - 1
+        return (pos + mask) & ~mask
+
+    # ------------------------------------------------------------------ #
+    def write(self, data: bytes) -> None:
+        view = memoryview(data)
+        if self._buf:
+            take = min(len(view), self._batch - len(self._buf))
+            self._buf += view[:take]
+            view = view[take:]
+            if len(self._buf) < self._batch:
+                return
+            self._submit(bytes(self._buf))
+            self._buf.clear()
+        while len(view) >= self._batch:
+            self._submit(bytes(view[:self._batch]))
+            view = view[self._batch:]
+        self._buf += view
+
+    def _submit(self, data: bytes) -> None:
+        self._pending.append(
+            self._pool.submit(_compress_batch, self.codec, self.level, self.block_size, data)
+        )
+        while len(self._pending) > self._max_pending:
+            self._store(self._pending.popleft().result())
+
+    def _store(self, blocks: List[Block]) -> None:
+        """Append compressed *blocks* and patch their index entries."""
+        index = bytearray()
+        out = bytearray()
+        for payload, plain in blocks:
+            index += struct.pack("<I", (self.pos >> self.align) | (_PLAIN if plain else 0))
+            out += payload
+            end = self._aligned(self.pos + len(payload))
+            out += bytes(end - self.pos - len(payload))
+            self.pos = end
+        view = memoryview(out)
+        while view:
+            view = view[os.write(self.fd, view):]
+        os.pwrite(self.fd, bytes(index), _HEADER.size + 4 * self.written_blocks)
+        self.written_blocks += len(blocks)
+
+    def close(self) -> int:
+        """Flush, finish index and header; returns the compressed file size."""
+        try:
+            if self._buf:
+                self._submit(bytes(self._buf))
+                self._buf.clear()
+            while self._pending:
+                self._store(self._pending.popleft().result())
+        finally:
+            self._pool.shutdown()
+        if self.written_blocks != self.blocks:
+            raise RuntimeError(f"Compressed {self.written_blocks} blocks, expected {self.blocks}")
+        os.pwrite(self.fd, struct.pack("<I", self.pos >> self.align), _HEADER.size + 4 * self.blocks)
+        header = _HEADER.pack(_MAGIC[self.codec], _HEADER.size, self.total_bytes,
+                              self.block_size, 1, self.align)
+        os.pwrite(self.fd, header, 0)
+        return self.pos
+
+    def abort(self) -> None:
+        # Waiting costs at most the batches in flight; leaving the workers
+        # behind would block the exit of a process that owns this pool.
+        self._pending.clear()
+        self._pool.shutdown(wait=True, cancel_futures=True)
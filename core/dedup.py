@@ -0,0 +1,119 @@
+"""Content‑addressed deduplication of identical sources.
+
+Disc layouts often carry many byte‑identical files – the same IRX module
+in every overlay folder, dummy padding files, duplicated language packs.
+:func:`content_digests` finds them: files are first grouped by size (from
+the ``stat`` the build already took), and only sizes shared by two or more
+sources are hashed, streamed and in parallel.  :func:`core.writer.plan_image`
+then points the directory records of every copy at one shared extent.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+from core.progress import BuildProgress
+from core.sources import Source, is_virtual, source_extent, source_stat
+
+logger = logging.getLogger("dedup")
+
+HASH_CHUNK: int = 8 * 1024 * 1024
+HASH_WORKERS: int = min(8, os.cpu_count() or 1)     # hashlib drops the GIL on large buffers
+
+# source → (size, mtime, sha1) of a previous build, e.g. from the incremental manifest
+KnownDigests = Mapping[str, Tuple[int, float, str]]
+
+
+def sha1_file(path: Source, cancel: Optional[threading.Event] = None) -> str:
+    """SHA‑1 of the source *path*, read in :data:`HASH_CHUNK` pieces."""
+    digest = hashlib.sha1()
+    if is_virtual(path):
+        for chunk in path.chunks():
+            if cancel is not None and cancel.is_set():
+                break
+            digest.update(chunk)
+        return digest.hexdigest()
+    extent = source_extent(path)
+    if extent is None:
+        with open(path, "rb") as fh:
+            while chunk := fh.read(HASH_CHUNK):
+                if cancel is not None and cancel.is_set():
+                    break
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    fd = os.open(extent.path, os.O_RDONLY)
+    try:
+        offset, end = extent.offset, extent.offset + extent.size
+        while offset < end and (chunk := os.pread(fd, min(HASH_CHUNK, end - offset), offset)):
+            if cancel is not None and cancel.is_set():
+                break
+            digest.update(chunk)
+            offset += len(chunk)
+    finally:
+        os.close(fd)
+    return digest.hexdigest()
+
+
+def content_digests(
+    files: Sequence[Tuple[str, str, Optional[int]]],
+    stats: Optional[Mapping[str, Optional[os.stat_result]]] = None,
+    known: Optional[KnownDigests] = None,
+    progress: Optional[BuildProgress] = None,
+    workers: int = HASH_WORKERS,
+) -> Dict[str, str]:
+    """SHA‑1 of every source that may have an identical twin in *files*.
+
+    Sources with a unique size cannot be duplicates and are never read;
+    *known* digests are reused while a source's size and mtime match.
+    Returns ``{source path: sha1}``.
+    """
+    sizes: Dict[str, os.stat_result] = {}
+    for _iso, source, _lba in files:
+        if source not in sizes:
+            st = stats.get(source) if stats is not None else None
+            sizes[source] = st if st is not None else source_stat(source)
+
+    by_size: Dict[int, List[str]] = {}
+    for source, st in sizes.items():
+        # padding and other non‑shareable virtual sources must keep their own extents
+        if st.st_size and (not is_virtual(source) or source.shareable):
+            by_size.setdefault(st.st_size, []).append(source)
+    candidates = [s for group in by_size.values() if len(group) > 1 for s in group]
+    # The same source listed under several ISO paths is a duplicate of itself
+    listed = [f[1] for f in files]
+    if len(listed) != len(sizes):
+        seen: Dict[str, int] = {}
+        for source in listed:
+            seen[source] = seen.get(source, 0) + 1
+        candidates += [s for s, n in seen.items() if n > 1
+                       and by_size.get(sizes[s].st_size, ()) == [s]]
+
+    digests: Dict[str, str] = {}
+    pending: List[str] = []
+    for source in candidates:
+        st = sizes[source]
+        entry = known.get(source) if known is not None else None
+        if entry is not None and entry[0] == st.st_size and entry[1] == st.st_mtime and entry[2]:
+            digests[source] = entry[2]
+        else:
+            pending.append(source)
+    if not pending:
+        return digests
+
+    cancel = progress.cancel if progress is not None else None
+    with ThreadPoolExecutor(workers, thread_name_prefix="dedup") as pool:
+        futures = {pool.submit(sha1_file, s, cancel): s for s in pending}
+        for future in as_completed(futures):
+            source = futures[future]
+            digests[source] = future.result()
+            if progress is not None:
+                progress.check()
+                progress.count(sizes[source].st_size)
+    logger.debug("Hashed %d of %d sources for deduplication", len(pending), len(sizes))
+    return digests
@@ -0,0 +1,269 @@
+"""Incremental rebuilds: patch an existing image instead of rewriting it.
+
+Every successful build of a raw image – patched or written in full, see
+:func:`core.build.run_build` – leaves ``<image>.manifest.json`` next to
+it, recording for every file its source, size, mtime and extent (and its
+SHA‑1 once the data has been hashed), plus the position of every
+directory.  The next build plans the layout with the old extents as
+preferences (see ``plan_image(previous=…)``) and then:
+
+* if any directory, path table or UDF entry would move, falls back to a
+  full rebuild.  Directories and UDF entries are packed without slack, so
+  this includes adding, removing or renaming any file;
+* otherwise rewrites only the files whose content changed (size/mtime as
+  a cheap filter, SHA‑1 as the verdict when known), their UDF file
+  entries and parent directories, the volume descriptors, and – when the
+  image grew or shrank – the tail past the old end of data.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+from contextlib import nullcontext
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from core.checksums import Checksums
+from core.dedup import content_digests, sha1_file
+from core.iso9660 import SECTOR_SIZE
+from core.layout import LayoutHints
+from core.progress import BuildProgress
+from core.sources import Source, extent_source, source_extent, source_name
+from core.writer import (
+    PAD_SECTORS, DirNode, ImagePlan, Region, check_size, descriptor_regions,
+    directory_regions, file_regions, patch_image, plan_image, write_image,
+)
+
+logger = logging.getLogger("buildiso")
+
+MANIFEST_VERSION: int = 2
+MANIFEST_SUFFIX: str = ".manifest.json"
+
+# --------------------------------------------------------------------------- #
+# Manifest
+# --------------------------------------------------------------------------- #
+
+def manifest_path(output_path: str) -> str:
+    return output_path + MANIFEST_SUFFIX
+
+
+def _dir_path(node: DirNode) -> str:
+    parts = []
+    while node.parent is not None:
+        parts.append(node.name); node = node.parent
+    return "/".join(reversed(parts))
+
+
+def _dir_record(node: DirNode) -> List[int]:
+    return [node.lba, node.size, node.udf_fe, node.fid_size]
+
+
+def manifest_digests(checksums: Optional[Checksums]) -> Optional[Dict[str, str]]:
+    """What a full build collects for its manifest: the SHA‑1 of every file
+    when *checksums* reads the data anyway, nothing otherwise – hashing
+    would keep the data from being copied inside the kernel."""
+    return {} if checksums is not None else None
+
+
+def save_manifest(output_path: str, plan: ImagePlan, digests: Dict[str, str]) -> None:
+    """Write the manifest atomically, after the image is complete.
+
+    Deduplicated copies are never written, so they inherit their owner's digest.
+    """
+    st = os.stat(output_path)
+    for f in plan.files:
+        if f.shares is not None and f.shares.iso_path in digests:
+            digests[f.iso_path] = digests[f.shares.iso_path]
+    data = {
+        "version": MANIFEST_VERSION,
+        "volume_id": plan.volume_id,
+        "timestamp": plan.timestamp,
+        "total_sectors": plan.total_sectors,
+        "image_size": st.st_size,
+        "image_mtime_ns": st.st_mtime_ns,
+        "path_tables": [plan.l_path_table, plan.m_path_table, plan.path_table_size],
+        "directories": {_dir_path(n): _dir_record(n) for n in plan.directories},
+        "files": {
+            f.iso_path: {
+                "source": _source_record(f.source),
+                "size": f.size,
+                "mtime": f.mtime,
+                "sha1": digests.get(f.iso_path),
+                "lba": f.lba,
+                "udf_fe": f.udf_fe,
+            }
+            for f in plan.files
+        },
+    }
+    path = manifest_path(output_path)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(data, fh, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def load_manifest(output_path: str) -> Optional[Dict[str, Any]]:
+    """Return the manifest if it still describes the image on disk."""
+    try:
+        with open(manifest_path(output_path), encoding="utf-8") as fh:
+            data = json.load(fh)
+        st = os.stat(output_path)
+    except (OSError, ValueError):
+        return None
+    if (data.get("version") != MANIFEST_VERSION
+            or data.get("image_size") != st.st_size
+            or data.get("image_mtime_ns") != st.st_mtime_ns):
+        return None
+    return data
+
+
+def discard_manifest(output_path: str) -> None:
+    try:
+        os.remove(manifest_path(output_path))
+    except FileNotFoundError:
+        pass
+
+# --------------------------------------------------------------------------- #
+# Helpers
+# --------------------------------------------------------------------------- #
+
+def _source_record(source: Source) -> Any:
+    """*source* as the manifest records it: extents as ``[path, offset, size]``."""
+    extent = source_extent(source)
+    return source_name(source) if extent is None else list(extent)
+
+
+def _recorded_source(record: Any) -> Source:
+    return extent_source(*record) if isinstance(record, list) else record
+
+
+def _metadata_moved(plan: ImagePlan, old: Dict[str, Any]) -> bool:
+    if old["path_tables"] != [plan.l_path_table, plan.m_path_table, plan.path_table_size]:
+        return True
+    if {_dir_path(n): _dir_record(n) for n in plan.directories} != old["directories"]:
+        return True
+    files = old["files"]
+    if len(files) != len(plan.files):
+        return True
+    return any(
+        f.iso_path not in files or files[f.iso_path]["udf_fe"] != f.udf_fe
+        for f in plan.files
+    )
+
+
+def _full_build(output_path: str, plan: ImagePlan, progress: Optional[BuildProgress],
+                checksums: Optional[Checksums] = None) -> int:
+    discard_manifest(output_path)
+    digests = manifest_digests(checksums)
+    write_image(plan, output_path, digests, progress, checksums=checksums)
+    save_manifest(output_path, plan, digests or {})
+    return plan.size
+
+
+def _diff(
+    plan: ImagePlan, old: Dict[str, Any], progress: Optional[BuildProgress]
+) -> Tuple[List[Region], Optional[int], Dict[str, str]]:
+    """Regions to rewrite, tail LBA and known digests for patching *plan* over *old*."""
+    old_files: Dict[str, Dict[str, Any]] = old["files"]
+    digests = {p: e["sha1"] for p, e in old_files.items() if e.get("sha1")}
+    patches: List[Region] = list(descriptor_regions(plan))
+    parents = {id(f): n for n in plan.directories for f in n.files.values()}
+    dirty: Dict[int, DirNode] = {}
+
+    for fnode in plan.files:
+        entry = old_files[fnode.iso_path]
+        same_stat = (entry["source"] == _source_record(fnode.source) and entry["size"] == fnode.size
+                     and entry["mtime"] == fnode.mtime)
+        if same_stat and entry["lba"] == fnode.lba:
+            continue
+
+        rewrite = True
+        if entry["lba"] == fnode.lba and entry["size"] == fnode.size and entry.get("sha1"):
+            if progress is not None:
+                progress.check()
+            sha1 = sha1_file(fnode.source)
+            rewrite = sha1 != entry["sha1"]
+            digests[fnode.iso_path] = sha1
+        patches += file_regions(plan, fnode, data=rewrite)
+        parent = parents[id(fnode)]
+        dirty[id(parent)] = parent
+
+    for node in dirty.values():
+        patches += directory_regions(plan, node)
+
+    tail = None
+    if plan.total_sectors != old["total_sectors"]:
+        tail = min(plan.total_sectors, old["total_sectors"]) - PAD_SECTORS - 1
+
+    return patches, tail, digests
+
+# --------------------------------------------------------------------------- #
+# Public entry‑point
+# --------------------------------------------------------------------------- #
+
+def build_incremental(
+    output_path: str,
+    files: List[Tuple[str, str, Optional[int]]],
+    volume_id: str,
+    hints: Optional[LayoutHints] = None,
+    progress: Optional[BuildProgress] = None,
+    stats: Optional[Mapping[str, Optional[os.stat_result]]] = None,
+    dedup: bool = True,
+    content: Optional[Mapping[str, str]] = None,
+    checksums: Optional[Checksums] = None,
+    max_sectors: Optional[int] = None,
+) -> Tuple[ImagePlan, int]:
+    """Build or patch *output_path*; returns the plan and bytes written.
+
+    *stats* is handed to :func:`plan_image`.  With *dedup*, identical
+    sources share one extent; digests come from *content* when given, else
+    from the manifest for sources whose size and mtime did not change.
+    *checksums* is filled by full builds only – a patched image leaves
+    ``checksums.image`` unset (see :func:`core.checksums.read_back`).
+    A plan larger than *max_sectors* raises ``ValueError`` and leaves the
+    previous image alone.
+    """
+    phase = progress.phase if progress is not None else lambda _name: nullcontext()
+
+    old = load_manifest(output_path)
+    usable = old is not None and old["volume_id"] == volume_id
+    if not dedup:
+        content = None
+    elif content is None:
+        known = {_recorded_source(e["source"]): (e["size"], e["mtime"], e.get("sha1"))
+                 for e in old["files"].values()} if usable else None
+        with phase("dedup"):
+            content = content_digests(files, stats, known, progress)
+
+    if not usable:
+        logger.info("No usable manifest for %s – full build", output_path)
+        with phase("layout"):
+            plan = plan_image(files, volume_id, hints, stats=stats, content=content)
+        check_size(plan, max_sectors, output_path)
+        return plan, _full_build(output_path, plan, progress, checksums)
+
+    old_files: Dict[str, Dict[str, Any]] = old["files"]
+    previous = {p: (e["lba"], -(-e["size"] // SECTOR_SIZE)) for p, e in old_files.items()}
+    with phase("layout"):
+        plan = plan_image(files, volume_id, hints, timestamp=old["timestamp"],
+                          previous=previous, stats=stats, content=content)
+        moved = _metadata_moved(plan, old)
+        if moved:
+            plan = plan_image(files, volume_id, hints, stats=stats, content=content)
+    check_size(plan, max_sectors, output_path)
+
+    if moved:
+        logger.info("Directory layout changed – full rebuild of %s", output_path)
+        return plan, _full_build(output_path, plan, progress, checksums)
+
+    with phase("diff"):
+        patches, tail, digests = _diff(plan, old, progress)
+
+    discard_manifest(output_path)
+    written = patch_image(plan, output_path, patches, tail, digests, progress)
+    save_manifest(output_path, plan, digests)
+    logger.info("Incremental build of %s: %d of %d bytes rewritten",
+                output_path, written, plan.size)
+    return plan, written
+
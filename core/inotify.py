@@ -0,0 +1,116 @@
+"""Minimal non‑blocking inotify binding (Linux, via ctypes).
+
+Only what the stat cache and watch mode need: add/remove directory
+watches and drain pending events without blocking.  :func:`available`
+is ``False`` on other platforms, where callers fall back to polling.
+"""
+
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import struct
+import sys
+from typing import Dict, List, NamedTuple, Optional
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+# Everything that can change a directory entry or the metadata of a file in it
+DIR_EVENTS = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+              | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+
+_HEADER = struct.Struct("iIII")
+_libc: Optional[ctypes.CDLL] = None
+
+
+class Event(NamedTuple):
+    wd: int
+    mask: int
+    cookie: int
+    name: str               # entry inside the watched directory, "" for the directory itself
+    path: str               # watched directory ("" after an overflow)
+
+
+def _lib() -> Optional[ctypes.CDLL]:
+    global _libc
+    if _libc is None and sys.platform.startswith("linux"):
+        try:
+            _libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+            _libc.inotify_init1                                   # noqa: B018
+        except (OSError, AttributeError):
+            _libc = None
+    return _libc
+
+
+def available() -> bool:
+    return _lib() is not None
+
+
+def _check(ret: int) -> int:
+    if ret < 0:
+        err = ctypes.get_errno()
+        raise OSError(err, os.strerror(err))
+    return ret
+
+
+class Inotify:
+    def __init__(self) -> None:
+        lib = _lib()
+        if lib is None:
+            raise OSError(errno.ENOSYS, "inotify is not available")
+        self._lib = lib
+        self.fd = _check(lib.inotify_init1(IN_NONBLOCK | IN_CLOEXEC))
+        self.paths: Dict[int, str] = {}          # wd → watched path
+
+    def fileno(self) -> int:
+        return self.fd
+
+    def add_watch(self, path: str, mask: int = DIR_EVENTS) -> int:
+        wd = _check(self._lib.inotify_add_watch(self.fd, os.fsencode(path), ctypes.c_uint32(mask)))
+        self.paths[wd] = path
+        return wd
+
+    def rm_watch(self, wd: int) -> None:
+        self.paths.pop(wd, None)
+        self._lib.inotify_rm_watch(self.fd, wd)
+
+    def read(self) -> List[Event]:
+        """Every pending event; ``[]`` when there is none."""
+        events: List[Event] = []
+        while True:
+            try:
+                buf = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return events
+            pos = 0
+            while pos < len(buf):
+                wd, mask, cookie, length = _HEADER.unpack_from(buf, pos)
+                pos += _HEADER.size
+                name = os.fsdecode(buf[pos:pos + length].rstrip(b"\0"))
+                pos += length
+                path = self.paths.get(wd, "")
+                if mask & IN_IGNORED:
+                    self.paths.pop(wd, None)
+                events.append(Event(wd, mask, cookie, name, path))
+
+    def close(self) -> None:
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
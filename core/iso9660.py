@@ -0,0 +1,252 @@
+"""ISO‑9660 on‑disc structures: volume descriptors, directory records and
+path tables.
+
+Every helper here is a pure function returning ``bytes``; the sector
+allocation and the actual writing live in :mod:`core.writer`.
+"""
+
+from __future__ import annotations
+
+import re
+import struct
+import time
+from typing import List, Tuple
+
+# --------------------------------------------------------------------------- #
+# Constants
+# --------------------------------------------------------------------------- #
+
+SECTOR_SIZE: int = 2048
+SYSTEM_AREA_SECTORS: int = 16        # sectors 0‑15 are reserved by the standard
+PVD_LBA: int = 16
+TERMINATOR_LBA: int = 17
+
+FLAG_DIRECTORY: int = 0x02
+FLAG_MULTI_EXTENT: int = 0x80        # another section of the same file follows
+
+MAX_EXTENT_SIZE: int = 0xFFFFFFFF    # data length of one directory record
+SECTION_SIZE: int = 0xFFFFF800       # every section but the last: 4 GiB – 1 sector
+
+_D_CHARS = re.compile(r"[A-Z0-9_]*")    # d‑characters, the only ones identifiers may use
+_DIR_RECORD_FMT = "<BB8s8s7sBBB4sB"  # without the identifier and its padding
+_DIR_RECORD_BASE = struct.calcsize(_DIR_RECORD_FMT)  # 33
+
+# --------------------------------------------------------------------------- #
+# Numeric / date encodings
+# --------------------------------------------------------------------------- #
+
+def both16(value: int) -> bytes:
+    """Encode *value* as a both‑byte‑order 16‑bit field (ISO‑9660 7.2.3)."""
+    return struct.pack("<H", value) + struct.pack(">H", value)
+
+
+def both32(value: int) -> bytes:
+    """Encode *value* as a both‑byte‑order 32‑bit field (ISO‑9660 7.3.3)."""
+    return struct.pack("<I", value) + struct.pack(">I", value)
+
+
+def sectors_for(size: int) -> int:
+    """Number of 2048‑byte sectors needed to hold *size* bytes."""
+    return (size + SECTOR_SIZE - 1) // SECTOR_SIZE
+
+
+def file_sections(size: int) -> List[int]:
+    """Data lengths of the directory records of a *size* byte file.
+
+    Up to 4 GiB – 1 byte a file is one extent.  Beyond that it is recorded
+    as ISO‑9660 level 3 *file sections* (9.1.6, 10.3): consecutive records
+    with the same identifier, all but the last flagged
+    :data:`FLAG_MULTI_EXTENT`, describing adjacent extents.
+    """
+    out = []
+    while size > MAX_EXTENT_SIZE:
+        out.append(SECTION_SIZE)
+        size -= SECTION_SIZE
+    out.append(size)
+    return out
+
+
+def dir_date(ts: float) -> bytes:
+    """7‑byte recording date used inside directory records (UTC)."""
+    t = time.gmtime(ts)
+    return bytes((t.tm_year - 1900, t.tm_mon, t.tm_mday, t.tm_hour, t.tm_min, t.tm_sec, 0))
+
+
+def volume_date(ts: float | None) -> bytes:
+    """17‑byte volume descriptor date; ``None`` means *not specified*."""
+    if ts is None:
+        return b"0" * 16 + b"\x00"
+    t = time.gmtime(ts)
+    return time.strftime("%Y%m%d%H%M%S", t).encode("ascii") + b"00" + b"\x00"
+
+
+def _a_string(text: str, length: int) -> bytes:
+    """Upper‑case, space‑padded ASCII field of exactly *length* bytes."""
+    return text.upper().encode("ascii", "replace")[:length].ljust(length, b" ")
+
+# --------------------------------------------------------------------------- #
+# Identifiers
+# --------------------------------------------------------------------------- #
+
+def check_name(name: str, directory: bool = False) -> None:
+    """Raise ``ValueError`` unless *name* is a level 2 identifier: at most
+    31 d‑characters, plus – for a file only – the dot before the extension
+    (see :func:`core.paths.norm_iso_name`)."""
+    base, _dot, ext = ("", "", name) if directory else name.rpartition(".")
+    if not base + ext or len(name) > 31 or not (_D_CHARS.fullmatch(base) and _D_CHARS.fullmatch(ext)):
+        raise ValueError(f"{name!r} is not an ISO‑9660 {'directory' if directory else 'file'} name")
+
+
+def file_identifier(name: str) -> bytes:
+    """Return the on‑disc identifier for a file: ``NAME.EXT;1``.
+
+    The separator dot is mandatory in ISO‑9660, so an extension‑less name
+    becomes ``NAME.;1`` exactly like *genisoimage* records it.
+    """
+    if "." not in name:
+        name += "."
+    return (name + ";1").encode("ascii")
+
+
+def dir_identifier(name: str) -> bytes:
+    return name.encode("ascii")
+
+
+def record_sort_key(identifier: bytes) -> Tuple[bytes, bytes]:
+    """Sort key implementing ISO‑9660 9.3 ordering for directory records.
+
+    Names and extensions are compared separately; shorter parts are padded
+    with spaces (0x20) so ``A.B`` sorts before ``A_.B``.
+    """
+    ident = identifier.split(b";", 1)[0]
+    base, _, ext = ident.partition(b".")
+    return base.ljust(31, b" "), ext.ljust(31, b" ")
+
+# --------------------------------------------------------------------------- #
+# Directory records
+# --------------------------------------------------------------------------- #
+
+def dir_record_length(identifier: bytes) -> int:
+    """Size in bytes of a directory record carrying *identifier*."""
+    length = _DIR_RECORD_BASE + len(identifier)
+    return length + (length & 1)
+
+
+def dir_record(identifier: bytes, lba: int, size: int, flags: int, ts: float) -> bytes:
+    """Build one directory record (ISO‑9660 9.1)."""
+    length = dir_record_length(identifier)
+    rec = struct.pack(
+        _DIR_RECORD_FMT,
+        length,
+        0,                     # extended attribute record length
+        both32(lba),
+        both32(size),
+        dir_date(ts),
+        flags,
+        0,                     # file unit size (interleave)
+        0,                     # interleave gap size
+        both16(1),             # volume sequence number
+        len(identifier),
+    ) + identifier
+    return rec.ljust(length, b"\x00")
+
+
+def directory_extent_size(record_lengths: List[int]) -> int:
+    """Bytes occupied by a directory whose records have *record_lengths*.
+
+    Records never straddle a sector boundary: when one does not fit, the
+    rest of the sector is zero filled and the record starts on the next one.
+    """
+    used = 0
+    for length in record_lengths:
+        room = SECTOR_SIZE - (used % SECTOR_SIZE)
+        if length > room:
+            used += room
+        used += length
+    return sectors_for(used) * SECTOR_SIZE
+
+
+def pack_directory(records: List[bytes]) -> bytes:
+    """Concatenate *records* honouring the sector boundary rule."""
+    out = bytearray()
+    for rec in records:
+        room = SECTOR_SIZE - (len(out) % SECTOR_SIZE)
+        if len(rec) > room:
+            out += b"\x00" * room
+        out += rec
+    pad = (-len(out)) % SECTOR_SIZE
+    return bytes(out) + b"\x00" * pad
+
+# --------------------------------------------------------------------------- #
+# Path tables
+# --------------------------------------------------------------------------- #
+
+def path_table_entry_length(identifier: bytes) -> int:
+    length = 8 + len(identifier)
+    return length + (length & 1)
+
+
+def path_table(entries: List[Tuple[bytes, int, int]], big_endian: bool) -> bytes:
+    """Serialise a path table from ``(identifier, lba, parent_number)`` tuples.
+
+    *entries* must already be in path‑table order (level, parent, name).
+    """
+    order = ">" if big_endian else "<"
+    out = bytearray()
+    for ident, lba, parent in entries:
+        out += struct.pack(order + "BBIH", len(ident), 0, lba, parent) + ident
+        if len(ident) & 1:
+            out += b"\x00"
+    return bytes(out)
+
+# --------------------------------------------------------------------------- #
+# Volume descriptors
+# --------------------------------------------------------------------------- #
+
+def primary_volume_descriptor(
+    *,
+    system_id: str,
+    volume_id: str,
+    application_id: str,
+    volume_sectors: int,
+    path_table_size: int,
+    l_path_table_lba: int,
+    m_path_table_lba: int,
+    root_record: bytes,
+    ts: float,
+) -> bytes:
+    """Build the Primary Volume Descriptor (ISO‑9660 8.4)."""
+    pvd = b"".join((
+        b"\x01CD001\x01\x00",
+        _a_string(system_id, 32),
+        _a_string(volume_id, 32),
+        b"\x00" * 8,
+        both32(volume_sectors),
+        b"\x00" * 32,
+        both16(1),                               # volume set size
+        both16(1),                               # volume sequence number
+        both16(SECTOR_SIZE),
+        both32(path_table_size),
+        struct.pack("<I", l_path_table_lba),
+        struct.pack("<I", 0),                    # optional L path table
+        struct.pack(">I", m_path_table_lba),
+        struct.pack(">I", 0),                    # optional M path table
+        root_record,
+        _a_string("", 128),                      # volume set identifier
+        _a_string("", 128),                      # publisher
+        _a_string("", 128),                      # data preparer
+        _a_string(application_id, 128),
+        _a_string("", 37),                       # copyright file
+        _a_string("", 37),                       # abstract file
+        _a_string("", 37),                       # bibliographic file
+        volume_date(ts),                         # creation
+        volume_date(ts),                         # modification
+        volume_date(None),                       # expiration
+        volume_date(ts),                         # effective
+        b"\x01\x00",                             # file structure version + reserved
+    ))
+    return pvd.ljust(SECTOR_SIZE, b"\x00")
+
+
+def volume_descriptor_terminator() -> bytes:
+    return b"\xffCD001\x01".ljust(SECTOR_SIZE, b"\x00")
@@ -0,0 +1,174 @@
+"""Reading existing ISO‑9660 images: volume descriptor and directory records.
+
+Everything works on a memory map of the image through ``memoryview`` and
+``struct.unpack_from``; no sector is copied.  :mod:`core.verify` checks
+the builder's output with it, and :func:`scan_image` imports an image for
+remastering: every file becomes a byte‑range source (see
+:mod:`core.sources`) pointing at its extent, so nothing is extracted and
+a rebuild copies unchanged files straight out of the old image.
+"""
+
+from __future__ import annotations
+
+import mmap
+import os
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from core.iso9660 import FLAG_DIRECTORY, FLAG_MULTI_EXTENT, PVD_LBA, SECTOR_SIZE, sectors_for
+from core.paths import SCAN_BATCH, SCAN_BATCH_SECONDS, ScanEntry, norm_iso_path
+from core.sources import image_file_source
+
+Entry = Tuple[int, int, bool]           # lba, size, is directory
+
+
+def both32(view: memoryview, offset: int) -> Optional[int]:
+    """A both‑endian 32‑bit field, ``None`` when its halves disagree."""
+    le, = struct.unpack_from("<I", view, offset)
+    be, = struct.unpack_from(">I", view, offset + 4)
+    return le if le == be else None
+
+
+def iso_name(identifier: bytes) -> str:
+    """``NAME.EXT;1`` → ``NAME.EXT``, ``NAME.;1`` → ``NAME``."""
+    name = identifier.split(b";", 1)[0].decode("ascii", "replace")
+    return name[:-1] if name.endswith(".") else name
+
+
+def volume_root(view: memoryview) -> Tuple[int, int, int]:
+    """``(volume sectors, root LBA, root size)`` from the primary volume
+    descriptor; raises ``ValueError`` when there is none."""
+    pvd = PVD_LBA * SECTOR_SIZE
+    if len(view) < pvd + SECTOR_SIZE or view[pvd] != 1 or bytes(view[pvd + 1:pvd + 6]) != b"CD001":
+        raise ValueError(f"No primary volume descriptor at LBA {PVD_LBA}")
+    volume_sectors = both32(view, pvd + 80)
+    block_size, = struct.unpack_from("<H", view, pvd + 128)
+    if volume_sectors is None or block_size != SECTOR_SIZE:
+        raise ValueError("Primary volume descriptor is corrupt")
+    root_lba, root_size = both32(view, pvd + 156 + 2), both32(view, pvd + 156 + 10)
+    if root_lba is None or root_size is None:
+        raise ValueError("Root directory record is corrupt")
+    return volume_sectors, root_lba, root_size
+
+
+def iter_tree(view: memoryview, volume_sectors: int, root: Tuple[int, int],
+              errors: List[str]) -> Iterator[Tuple[str, Entry]]:
+    """Every entry below *root* as ``(iso path, (lba, size, is_dir))``,
+    one directory at a time; structural problems are appended to *errors*
+    and the offending record or directory is skipped.  The sections of a
+    multi‑extent file come out as one entry; they must be adjacent."""
+    visited = set()
+    stack = [("", root[0], root[1])]
+    while stack:
+        path, lba, size = stack.pop()
+        if lba in visited:
+            errors.append(f"Directory loop at {path or '/'} (LBA {lba})")
+            continue
+        visited.add(lba)
+        if lba + sectors_for(size) > volume_sectors:
+            errors.append(f"Directory {path or '/'} lies outside the volume")
+            continue
+        pos, end = lba * SECTOR_SIZE, lba * SECTOR_SIZE + size
+        first = True
+        section: Optional[Tuple[str, int, int]] = None   # file whose sections go on: path, LBA, bytes
+        while pos < end:
+            length = view[pos]
+            if length == 0:                           # records never cross sectors
+                pos = (pos // SECTOR_SIZE + 1) * SECTOR_SIZE
+                continue
+            if length < 34 or pos + length > end:
+                errors.append(f"Corrupt directory record in {path or '/'} at byte {pos}")
+                break
+            ext, data_len = both32(view, pos + 2), both32(view, pos + 10)
+            flags, id_len = view[pos + 25], view[pos + 32]
+            identifier = bytes(view[pos + 33:pos + 33 + id_len])
+            pos += length
+            if identifier in (b"\x00", b"\x01"):
+                if first and identifier == b"\x00" and (ext, data_len) != (lba, size):
+                    errors.append(f"'.' record of {path or '/'} does not match its parent")
+                first = False
+                continue
+            child = f"{path}/{iso_name(identifier)}" if path else iso_name(identifier)
+            if ext is None or data_len is None:
+                errors.append(f"{child}: little/big‑endian fields disagree")
+                continue
+            is_dir = bool(flags & FLAG_DIRECTORY)
+            if section is not None:
+                if section[0] == child and ext == section[1] + section[2] // SECTOR_SIZE:
+                    ext, data_len = section[1], section[2] + data_len
+                else:
+                    errors.append(f"{section[0]}: file sections are incomplete or not adjacent")
+                section = None
+            if flags & FLAG_MULTI_EXTENT and not is_dir:
+                if data_len % SECTOR_SIZE:
+                    errors.append(f"{child}: file section is not a whole number of sectors")
+                else:
+                    section = (child, ext, data_len)
+                continue
+            if not is_dir and data_len and ext + sectors_for(data_len) > volume_sectors:
+                errors.append(f"{child}: extent past the end of the volume")
+            yield child, (ext, data_len, is_dir)
+            if is_dir:
+                stack.append((child, ext, data_len))
+        if section is not None:
+            errors.append(f"{section[0]}: file sections are incomplete or not adjacent")
+
+
+def read_tree(view: memoryview, volume_sectors: int, root: Tuple[int, int],
+              errors: List[str]) -> Dict[str, Entry]:
+    """:func:`iter_tree` as a dict; ``""`` is the root."""
+    entries: Dict[str, Entry] = {"": (root[0], root[1], True)}
+    entries.update(iter_tree(view, volume_sectors, root, errors))
+    return entries
+
+# --------------------------------------------------------------------------- #
+# Import
+# --------------------------------------------------------------------------- #
+
+def scan_image(image: Path, cancel: Optional[threading.Event] = None) -> Iterator[List[ScanEntry]]:
+    """Walk the directories of the ISO image *image*, yielding batches.
+
+    A drop‑in for :func:`core.paths.scan_tree`: entries are ``(source,
+    iso_rel, size)`` where *source* is the file's extent inside *image*.
+    Raises ``ValueError`` on the first structural problem of the image.
+    """
+    path = os.path.abspath(image)
+    batch: List[ScanEntry] = []
+    last = time.monotonic()
+    with open(path, "rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        view = memoryview(mm)
+        try:
+            volume_sectors, root_lba, root_size = volume_root(view)
+            if volume_sectors * SECTOR_SIZE > len(view):
+                raise ValueError(f"{path} is truncated")
+            errors: List[str] = []
+            for iso_path, (lba, size, is_dir) in iter_tree(view, volume_sectors, (root_lba, root_size), errors):
+                if errors:
+                    raise ValueError(f"{path}: {errors[0]}")
+                if cancel is not None and cancel.is_set():
+                    return
+                if is_dir:
+                    continue
+                iso_rel = norm_iso_path(iso_path)
+                # empty files carry arbitrary LBAs
+                batch.append((image_file_source(path, lba * SECTOR_SIZE if size else 0, size), iso_rel, size))
+                now = time.monotonic()
+                if len(batch) >= SCAN_BATCH or now - last >= SCAN_BATCH_SECONDS:
+                    yield batch
+                    batch, last = [], now
+            if errors:
+                raise ValueError(f"{path}: {errors[0]}")
+        finally:
+            view.release()
+    if batch:
+        yield batch
+
+
+def import_image(image: str, prefix: str = "") -> List[Tuple[str, str, None]]:
+    """Every file of *image* as layout entries ``(iso_rel, source, None)``,
+    under the ISO directory *prefix*."""
+    return [(f"{prefix}/{iso_rel}" if prefix else iso_rel, source, None)
+            for batch in scan_image(Path(image)) for source, iso_rel, _size in batch]
@@ -0,0 +1,161 @@
+"""Sector layout planner: pinned LBAs, gap‑free packing and ordering hints.
+
+On real hardware the optical seek dominates load times, so where a file
+lands matters more than how fast it is written.  The planner works on
+*units* – one or more files that must sit back to back – and packs them
+around the extents whose LBA the user pinned (``SYSTEM.CNF`` at 12231 is
+the usual one), first‑fit in priority order so every gap is filled with
+the most important data that still fits.
+"""
+
+from __future__ import annotations
+
+import os
+import stat
+from dataclasses import dataclass, field
+from typing import Dict, List, Mapping, Optional, Protocol, Sequence, Tuple, TypeVar
+
+from core.sources import source_stat
+
+# --------------------------------------------------------------------------- #
+# Hints
+# --------------------------------------------------------------------------- #
+
+@dataclass
+class LayoutHints:
+    """User ordering hints, keyed by upper‑case ISO path.
+
+    *weights*  – "hot" files: higher weight is placed earlier on the disc.
+    *groups*   – files loaded together; each group is kept contiguous in
+                 the listed order and placed with the weight of its
+                 hottest member.
+    """
+
+    weights: Dict[str, int] = field(default_factory=dict)
+    groups: List[List[str]] = field(default_factory=list)
+
+
+class _Placeable(Protocol):
+    iso_path: str
+
+    @property
+    def sectors(self) -> int: ...
+
+
+T = TypeVar("T", bound=_Placeable)
+
+# --------------------------------------------------------------------------- #
+# Validation
+# --------------------------------------------------------------------------- #
+
+def sanitise_and_sort(
+    files: Sequence[Tuple[str, str, Optional[int]]],
+    stats: Optional[Mapping[str, Optional[os.stat_result]]] = None,
+) -> List[Tuple[str, str, Optional[int]]]:
+    """Validate the layout and return it sorted by ISO path, LBAs preserved.
+
+    Placement itself is left to :func:`allocate`; here we only reject what
+    can be detected without sizes: duplicates, missing files, bad LBAs.
+    *stats* (see :meth:`core.statcache.StatCache.snapshot`) saves the
+    per‑file ``stat`` when it covers the layout.
+    """
+    seen = set()
+    pinned = {}
+    ordered = []
+    for iso_rel, abs_path, lba in files:
+        if iso_rel in seen:
+            raise ValueError(f"Duplicate ISO path: {iso_rel}")
+        if stats is not None and abs_path in stats:
+            st = stats[abs_path]
+            is_file = st is not None and stat.S_ISREG(st.st_mode)
+        else:
+            try:
+                is_file = stat.S_ISREG(source_stat(abs_path).st_mode)
+            except OSError:
+                is_file = False
+        if not is_file:
+            raise FileNotFoundError(abs_path)
+        if lba is not None:
+            if lba < 0:
+                raise ValueError(f"Invalid LBA {lba} for {iso_rel}")
+            if lba in pinned:
+                raise ValueError(f"{iso_rel} and {pinned[lba]} are both pinned at LBA {lba}")
+            pinned[lba] = iso_rel
+        seen.add(iso_rel)
+        ordered.append((iso_rel, abs_path, lba))
+    ordered.sort(key=lambda t: t[0].split("/"))
+    return ordered
+
+# --------------------------------------------------------------------------- #
+# Ordering
+# --------------------------------------------------------------------------- #
+
+def _default_key(iso_path: str) -> Tuple[str, ...]:
+    # Depth first by directory: siblings stay adjacent, like a game reads them.
+    return tuple(iso_path.split("/"))
+
+
+def order_units(files: Sequence[T], hints: Optional[LayoutHints] = None) -> List[List[T]]:
+    """Group and sort *files* into placement units, most important first."""
+    ordered = sorted(files, key=lambda f: _default_key(f.iso_path))
+    if hints is None:
+        return [[f] for f in ordered]
+
+    rank = {f.iso_path: i for i, f in enumerate(ordered)}
+    by_path = {f.iso_path: f for f in ordered}
+    weights = {p.upper(): w for p, w in hints.weights.items()}
+
+    grouped: Dict[str, List[T]] = {}
+    units: List[List[T]] = []
+    for group in hints.groups:
+        unit = [by_path[p] for p in (g.upper() for g in group)
+                if p in by_path and p not in grouped]
+        if unit:
+            for f in unit:
+                grouped[f.iso_path] = unit
+            units.append(unit)
+    units += [[f] for f in ordered if f.iso_path not in grouped]
+
+    def key(unit: List[T]) -> Tuple[int, int]:
+        weight = max(weights.get(f.iso_path, 0) for f in unit)
+        return -weight, min(rank[f.iso_path] for f in unit)
+
+    units.sort(key=key)
+    return units
+
+# --------------------------------------------------------------------------- #
+# Allocation
+# --------------------------------------------------------------------------- #
+
+def allocate(start: int, reserved: Sequence[Tuple[int, int]], sizes: Sequence[int]) -> Tuple[List[int], int]:
+    """Place runs of *sizes* sectors from *start*, skipping *reserved* ranges.
+
+    *reserved* holds ``(lba, sectors)`` pairs that must not overlap each
+    other nor begin before *start*.  Runs are taken in order; a run that
+    does not fit the current gap waits for the next one while later runs
+    that do fit fill the hole.  Returns the LBA of every run and the first
+    free sector after everything placed.
+    """
+    gaps: List[Tuple[int, Optional[int]]] = []
+    prev_end = start
+    for lba, sectors in sorted(r for r in reserved if r[1] > 0):
+        if lba < prev_end:
+            raise ValueError(f"Reserved extent at LBA {lba} overlaps sector {prev_end - 1}")
+        gaps.append((prev_end, lba))
+        prev_end = lba + sectors
+    gaps.append((prev_end, None))
+
+    result = [0] * len(sizes)
+    pending = list(range(len(sizes)))
+    cursor = start
+    for gap_start, gap_end in gaps:
+        cursor = gap_start
+        rest = []
+        for i in pending:
+            if gap_end is None or cursor + sizes[i] <= gap_end:
+                result[i] = cursor
+                cursor += sizes[i]
+            else:
+                rest.append(i)
+        pending = rest
+    return result, cursor
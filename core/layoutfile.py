@@ -0,0 +1,199 @@
+"""Layout files: the JSON description of an image used by headless builds.
+
+Example::
+
+    {
+      "volume_id": "PS2DISC",
+      "boot_elf": "MAIN.ELF",
+      "files":   [{"source": "build/main.elf", "iso": "MAIN.ELF"},
+                  {"source": "assets/intro.pss", "iso": "MOVIE/INTRO.PSS", "lba": 20000},
+                  {"source": "assets/pack.bin", "offset": 4096, "size": 65536, "iso": "PART.BIN"},
+                  {"content": "v1.02\\n", "iso": "VERSION.TXT"},
+                  {"zeros": 104857600, "iso": "DUMMY.DAT"}],
+      "folders": [{"source": "assets/data", "iso": "DATA"}],
+      "images":  [{"source": "original.iso"}],
+      "hints":   {"weights": {"MAIN.ELF": 10}, "groups": [["DATA/A.BIN", "DATA/B.BIN"]]},
+      "variants": [
+        {"name": "pal", "cnf": {"VMODE": "PAL", "VER": "1.01"}},
+        {"name": "debug", "boot_elf": "MAIN_DBG.ELF", "output": "game_debug.iso",
+         "files": [{"source": "build/main_dbg.elf", "iso": "MAIN_DBG.ELF"}],
+         "remove": ["MOVIE/INTRO.PSS"]}
+      ]
+    }
+
+Relative ``source`` paths are resolved against the layout file.  ``iso``
+paths are normalised like the GUI does; a file without ``iso`` keeps its
+base name, a folder without ``iso`` is merged into the root exactly as
+*Add Folder* does.  ``boot_elf`` makes the build generate ``SYSTEM.CNF``.
+
+A file with ``size`` (and ``offset``, default 0) is that byte range of
+its ``source``.  Instead of a ``source``, a file may give its text as
+``content`` or be ``zeros`` bytes of padding; both are produced in memory
+while the image is written (see :mod:`core.sources`), carry the date of
+the layout file and need an ``iso`` path.
+
+``images`` import the files of existing ISO images (under ``iso``, the
+root by default) without extracting them: the build copies each one out
+of the image, at its old LBA when it is still free.  ``files`` and
+``folders`` replace imported files with the same ISO path, which is how
+an image is remastered with a patched ELF.
+
+``variants`` describe further images built from the same content (see
+:mod:`core.variants`): each may override ``boot_elf``, ``volume_id`` and
+``SYSTEM.CNF`` fields (``cnf``), overlay ``files``/``folders`` on top of
+the base layout and ``remove`` ISO paths (whole directories too).
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.isoread import import_image
+from core.layout import LayoutHints
+from core.paths import iter_dir, norm_dir_path, norm_iso_name, norm_iso_path
+from core.sources import Source, extent_source, memory_source, padding_source
+from core.writer import VOLUME_ID
+
+
+Folder = Tuple[str, str]                  # (absolute host root, ISO prefix)
+
+
+@dataclass
+class Layout:
+    files: List[Tuple[str, Source, Optional[int]]] = field(default_factory=list)
+    volume_id: str = VOLUME_ID
+    boot_elf: Optional[str] = None
+    hints: Optional[LayoutHints] = None
+    variants: List["Variant"] = field(default_factory=list)
+    folders: List[Folder] = field(default_factory=list)       # where ``files`` came from (watch mode)
+
+
+@dataclass
+class Variant:
+    """One more image of the same layout; ``None`` keeps the base value."""
+
+    name: str
+    output: Optional[str] = None          # default: ``<image>_<name>.<ext>``
+    boot_elf: Optional[str] = None
+    volume_id: Optional[str] = None
+    cnf: Dict[str, str] = field(default_factory=dict)
+    files: List[Tuple[str, Source, Optional[int]]] = field(default_factory=list)
+    remove: List[str] = field(default_factory=list)
+    folders: List[Folder] = field(default_factory=list)
+
+
+def _entries(data: Any, key: str, kinds: Tuple[str, ...] = ("source",)) -> List[dict]:
+    value = data.get(key, [])
+    if not isinstance(value, list) or not all(
+            isinstance(e, dict) and sum(k in e for k in kinds) == 1 for e in value):
+        raise ValueError(f"'{key}' must be a list of objects with one of {', '.join(map(repr, kinds))}")
+    return value
+
+
+def _file_source(entry: dict, base: str, mtime: float) -> Tuple[Optional[str], Source]:
+    """``(default iso name, source)`` of one ``files`` entry."""
+    if "source" in entry:
+        source = os.path.join(base, entry["source"])
+        default = norm_iso_name(os.path.basename(source))[0]
+        if "size" not in entry:
+            return default, source
+        offset, size = entry.get("offset", 0), entry["size"]
+        if not all(isinstance(v, int) and not isinstance(v, bool) and v >= 0 for v in (offset, size)):
+            raise ValueError(f"'offset' and 'size' of {entry['source']} must be byte counts")
+        return default, extent_source(source, offset, size)
+    if "content" in entry:
+        if not isinstance(entry["content"], str):
+            raise ValueError("'content' must be a string")
+        return None, memory_source(entry.get("iso", ""), entry["content"].encode("utf-8"), mtime)
+    size = entry["zeros"]
+    if not isinstance(size, int) or isinstance(size, bool) or size < 0:
+        raise ValueError("'zeros' must be a byte count")
+    return None, padding_source(size, mtime)
+
+
+def load_layout(path: str) -> Layout:
+    """Parse the layout file at *path*; raises ``ValueError`` when malformed."""
+    with open(path, encoding="utf-8") as fh:
+        try:
+            data = json.load(fh)
+        except json.JSONDecodeError as exc:
+            raise ValueError(f"{path}: {exc}") from None
+    if not isinstance(data, dict):
+        raise ValueError(f"{path}: expected a JSON object")
+
+    base = os.path.dirname(os.path.abspath(path))
+    layout = Layout(volume_id=data.get("volume_id", VOLUME_ID))
+    mtime = os.path.getmtime(path)
+    layout.files, layout.folders = _sources(data, base, mtime)
+
+    if data.get("boot_elf"):
+        layout.boot_elf = norm_iso_path(data["boot_elf"])
+
+    hints = data.get("hints")
+    if hints:
+        layout.hints = LayoutHints(
+            weights={norm_iso_path(p): int(w) for p, w in hints.get("weights", {}).items()},
+            groups=[[norm_iso_path(p) for p in g] for g in hints.get("groups", [])],
+        )
+
+    variants = data.get("variants", [])
+    if not isinstance(variants, list) or not all(isinstance(v, dict) and v.get("name") for v in variants):
+        raise ValueError("'variants' must be a list of objects with a 'name'")
+    for entry in variants:
+        cnf = entry.get("cnf", {})
+        if not isinstance(cnf, dict):
+            raise ValueError(f"'cnf' of variant {entry['name']} must be an object")
+        files, folders = _sources(entry, base, mtime)
+        layout.variants.append(Variant(
+            name=str(entry["name"]),
+            output=entry.get("output"),
+            boot_elf=norm_iso_path(entry["boot_elf"]) if entry.get("boot_elf") else None,
+            volume_id=entry.get("volume_id"),
+            cnf={str(k).upper(): str(v) for k, v in cnf.items()},
+            files=files,
+            remove=[norm_iso_path(p) for p in entry.get("remove", [])],
+            folders=folders,
+        ))
+    if len({v.name for v in layout.variants}) != len(layout.variants):
+        raise ValueError("Variant names must be unique")
+    return layout
+
+
+def _sources(data: Any, base: str, mtime: float) -> Tuple[List[Tuple[str, Source, Optional[int]]], List[Folder]]:
+    """The ``images``, ``files`` and ``folders`` of *data* as ``(iso_rel, source, lba)``,
+    and the folders scanned."""
+    files: List[Tuple[str, Source, Optional[int]]] = []
+    for entry in _entries(data, "files", ("source", "content", "zeros")):
+        default, source = _file_source(entry, base, mtime)
+        iso = entry.get("iso") or default
+        if not iso:
+            raise ValueError("Files without a 'source' need an 'iso' path")
+        lba = entry.get("lba")
+        if lba is not None and not isinstance(lba, int):
+            raise ValueError(f"LBA of {iso} must be an integer")
+        files.append((norm_iso_path(iso), source, lba))
+
+    folders: List[Folder] = []
+    for entry in _entries(data, "folders"):
+        root = Path(base, entry["source"])
+        if not root.is_dir():
+            raise ValueError(f"Folder not found: {root}")
+        prefix = norm_dir_path(entry.get("iso", ""))
+        folders.append((str(root), prefix))
+        for abs_path, iso_rel in iter_dir(root):
+            files.append((f"{prefix}/{iso_rel}" if prefix else iso_rel, str(abs_path), None))
+
+    imported: List[Tuple[str, Source, Optional[int]]] = []
+    for entry in _entries(data, "images"):
+        image = os.path.join(base, entry["source"])
+        if not os.path.isfile(image):
+            raise ValueError(f"Image not found: {image}")
+        imported += import_image(image, norm_dir_path(entry.get("iso", "")))
+    if imported:
+        replaced = {f[0] for f in files}
+        files = [f for f in imported if f[0] not in replaced] + files
+    return files, folders
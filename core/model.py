@@ -0,0 +1,297 @@
+"""Indexed ISO layout: the single source of truth for GUI and builder.
+
+Every file and directory is a *node*: an integer slot in a set of
+parallel arrays (interned name, parent, row among its siblings, size,
+LBA, source).  Directories additionally keep an ordered child list and a
+name → node map, so lookups walk one dict per path segment, subtree
+removal costs O(subtree) and a 200k‑entry layout costs tens of bytes per
+entry rather than a Python object graph.  Freed slots are recycled.
+
+Iterating the model yields the ``(iso_rel, abs_path, lba)`` tuples the
+builder has always consumed.  Sources that are more than a path (see
+:mod:`core.sources`) – virtual ones such as ``SYSTEM.CNF`` and padding,
+extents of an imported image – are kept as they are in a side table.
+
+Every change is also handed to :attr:`LayoutModel.capacity`, a
+:class:`~core.capacity.CapacityPlanner`, so the size of the image the
+layout makes is known at any time without a scan.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+from array import array
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from core.capacity import CapacityPlanner
+from core.sources import ExtentSource, Source, is_virtual
+
+Entry = Tuple[str, Source, Optional[int]]
+
+ROOT = 0
+NO_LBA = -1
+UNKNOWN_SIZE = -1
+_FREE = -2                                   # parent of a recycled slot
+
+
+class LayoutModel:
+    def __init__(self) -> None:
+        self._name: List[str] = [""]
+        self._parent = array("i", [-1])
+        self._row = array("i", [0])
+        self._size = array("q", [UNKNOWN_SIZE])
+        self._lba = array("q", [NO_LBA])
+        self._src_dir = array("i", [-1])        # index into _src_dirs, -1 for directories
+        self._src_name: List[str] = [""]
+
+        self._src_dirs: List[str] = []
+        self._src_dir_ids: Dict[str, int] = {}
+        self._objects: Dict[int, Source] = {}     # virtual and extent sources, as given
+
+        self._kids: Dict[int, List[int]] = {ROOT: []}        # dir → children in row order
+        self._lookup: Dict[int, Dict[str, int]] = {ROOT: {}}  # dir → {name: node}
+        self._free: List[int] = []
+        self._nfiles = 0
+        self.capacity = CapacityPlanner()
+        self.revision = 0                        # bumped by every change, for pollers
+
+    # ------------------------------------------------------------------ #
+    # Mapping interface
+    # ------------------------------------------------------------------ #
+    def __len__(self) -> int:
+        return self._nfiles
+
+    def __iter__(self) -> Iterator[Entry]:
+        stack = [iter(self._kids[ROOT])]
+        while stack:
+            for node in stack[-1]:
+                if node in self._kids:
+                    stack.append(iter(self._kids[node]))
+                    break
+                yield self.entry(node)
+            else:
+                stack.pop()
+
+    def __contains__(self, iso_path: object) -> bool:
+        node = self.node(iso_path) if isinstance(iso_path, str) else None
+        return node is not None and node not in self._kids
+
+    def get(self, iso_path: str) -> Optional[Entry]:
+        node = self.node(iso_path)
+        return None if node is None or node in self._kids else self.entry(node)
+
+    def is_dir(self, iso_path: str) -> bool:
+        return self.node(iso_path) in self._kids
+
+    def children(self, dir_path: str = "") -> Dict[str, bool]:
+        """Child names of *dir_path* mapped to ``True`` for sub‑directories."""
+        return {self._name[n]: n in self._kids for n in self._kids[self.node(dir_path)]}
+
+    # ------------------------------------------------------------------ #
+    # Node interface (used by the tree view)
+    # ------------------------------------------------------------------ #
+    def node(self, iso_path: str) -> Optional[int]:
+        """Node of *iso_path* (``""`` is the root), or ``None``."""
+        node = ROOT
+        if iso_path:
+            for part in iso_path.split("/"):
+                lookup = self._lookup.get(node)
+                node = lookup.get(part) if lookup is not None else None
+                if node is None:
+                    return None
+        return node
+
+    def nearest_dir(self, iso_path: str) -> Optional[int]:
+        """Deepest existing directory on the way to *iso_path*, ``None`` if a
+        file is in the way."""
+        node = ROOT
+        for part in iso_path.split("/")[:-1]:
+            child = self._lookup[node].get(part)
+            if child is None:
+                break
+            if child not in self._lookup:
+                return None
+            node = child
+        return node
+
+    def path(self, node: int) -> str:
+        parts = []
+        while node != ROOT:
+            parts.append(self._name[node])
+            node = self._parent[node]
+        return "/".join(reversed(parts))
+
+    def name(self, node: int) -> str:
+        return self._name[node]
+
+    def parent(self, node: int) -> int:
+        return self._parent[node]
+
+    def row(self, node: int) -> int:
+        return self._row[node]
+
+    def child(self, node: int, row: int) -> int:
+        return self._kids[node][row]
+
+    def child_count(self, node: int) -> int:
+        kids = self._kids.get(node)
+        return 0 if kids is None else len(kids)
+
+    def node_is_dir(self, node: int) -> bool:
+        return node in self._kids
+
+    def size(self, node: int) -> int:
+        """Size recorded when the file was added, or ``UNKNOWN_SIZE``."""
+        return self._size[node]
+
+    def lba(self, node: int) -> Optional[int]:
+        lba = self._lba[node]
+        return None if lba == NO_LBA else lba
+
+    def source(self, node: int) -> Source:
+        obj = self._objects.get(node)
+        if obj is not None:
+            return obj
+        return os.path.join(self._src_dirs[self._src_dir[node]], self._src_name[node])
+
+    def entry(self, node: int) -> Entry:
+        return self.path(node), self.source(node), self.lba(node)
+
+    # ------------------------------------------------------------------ #
+    # Mutation
+    # ------------------------------------------------------------------ #
+    def add(self, iso_path: str, abs_path: Source, lba: Optional[int] = None,
+            size: int = UNKNOWN_SIZE, first: bool = False) -> bool:
+        """Insert a file; returns ``False`` if the path is already taken.
+
+        The file becomes the last child of its directory, or the first one
+        with *first*.
+        """
+        parent_path, _, name = iso_path.rpartition("/")
+        parent = self._make_dirs(parent_path)
+        if parent is None or name in self._lookup[parent]:
+            return False
+
+        node = self._new_node(parent, name, first)
+        self._size[node] = size
+        self._lba[node] = NO_LBA if lba is None else lba
+        if is_virtual(abs_path) or isinstance(abs_path, ExtentSource):
+            self._objects[node] = abs_path
+        else:
+            src_dir, src_name = os.path.split(abs_path)
+            dir_id = self._src_dir_ids.get(src_dir)
+            if dir_id is None:
+                dir_id = self._src_dir_ids[src_dir] = len(self._src_dirs)
+                self._src_dirs.append(src_dir)
+            self._src_dir[node] = dir_id
+            self._src_name[node] = src_name
+        self._nfiles += 1
+        self.capacity.add(iso_path, size, lba)
+        self.revision += 1
+        return True
+
+    def _make_dirs(self, dir_path: str) -> Optional[int]:
+        node = ROOT
+        if dir_path:
+            for part in dir_path.split("/"):
+                lookup = self._lookup.get(node)
+                if lookup is None:
+                    return None                  # a file already owns this name
+                child = lookup.get(part)
+                if child is None:
+                    child = self._new_node(node, part)
+                    self._kids[child] = []
+                    self._lookup[child] = {}
+                node = child
+        return node if node in self._kids else None
+
+    def _new_node(self, parent: int, name: str, first: bool = False) -> int:
+        name = sys.intern(name)
+        if self._free:                           # a recycled slot: reset every column
+            node = self._free.pop()
+            self._name[node] = name
+            self._parent[node] = parent
+            self._row[node] = 0
+            self._size[node] = UNKNOWN_SIZE
+            self._lba[node] = NO_LBA
+            self._src_dir[node] = -1
+            self._src_name[node] = ""
+            self._objects.pop(node, None)
+        else:
+            node = len(self._name)
+            self._name.append(name)
+            self._parent.append(parent)
+            self._row.append(0)
+            self._size.append(UNKNOWN_SIZE)
+            self._lba.append(NO_LBA)
+            self._src_dir.append(-1)
+            self._src_name.append("")
+
+        kids = self._kids[parent]
+        if first:
+            kids.insert(0, node)
+            self._renumber(kids, 0)
+        else:
+            self._row[node] = len(kids)
+            kids.append(node)
+        self._lookup[parent][name] = node
+        return node
+
+    def _renumber(self, kids: List[int], start: int) -> None:
+        for row in range(start, len(kids)):
+            self._row[kids[row]] = row
+
+    def set_lba(self, iso_path: str, lba: Optional[int]) -> None:
+        node = self.node(iso_path)
+        if node is None or node in self._kids:
+            raise KeyError(iso_path)
+        self._lba[node] = NO_LBA if lba is None else lba
+        self.capacity.update(iso_path, self._size[node], lba)
+        self.revision += 1
+
+    def remove(self, iso_path: str) -> List[str]:
+        """Drop a file or a whole directory; returns every path removed.
+
+        ``""`` clears the layout but keeps the root.
+        """
+        node = self.node(iso_path)
+        if node is None:
+            return []
+        self.capacity.remove(iso_path)
+        self.revision += 1
+
+        parent, row = self._parent[node], self._row[node]
+        removed: List[str] = []
+        stack = [(node, iso_path)]
+        while stack:
+            cur, path = stack.pop()
+            for child in self._kids.get(cur, ()):
+                name = self._name[child]
+                stack.append((child, f"{path}/{name}" if path else name))
+            if cur == ROOT:
+                continue
+            removed.append(path)
+            self._free_node(cur)
+
+        if node == ROOT:
+            self._kids[ROOT], self._lookup[ROOT] = [], {}
+        else:
+            kids = self._kids[parent]
+            del kids[row]
+            self._renumber(kids, row)
+            del self._lookup[parent][self._name[node]]
+        return removed
+
+    def _free_node(self, node: int) -> None:
+        if self._kids.pop(node, None) is None:
+            self._nfiles -= 1
+        self._lookup.pop(node, None)
+        self._parent[node] = _FREE
+        self._src_dir[node] = -1
+        self._src_name[node] = ""
+        self._objects.pop(node, None)
+        self._free.append(node)
+
+    def alive(self, node: int) -> bool:
+        return node < len(self._parent) and self._parent[node] != _FREE
@@ -0,0 +1,143 @@
+"""Mapping host files to ISO‑9660 names and paths."""
+
+from __future__ import annotations
+
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+logger = logging.getLogger("scan")
+
+_VALID_CHARS = re.compile(r"[^A-Z0-9_.]")
+
+
+def norm_iso_name(name: str) -> Tuple[str, bool]:
+    """Return a valid ISO‑9660 (level 2) file name, flagging if it changed.
+
+    Only d‑characters are kept, and only the last dot – the one before the
+    extension; anything else becomes ``_``, as *genisoimage* mapped it.
+    """
+    original = name
+    name = name.upper()
+    name = _VALID_CHARS.sub("_", name)
+    base, dot, ext = name.rpartition(".")
+    if dot:
+        name = base.replace(".", "_") + dot + ext
+
+    if len(name) <= 31:
+        return name, name != original.upper()
+
+    # Preserve extension, truncate base
+    base, dot, ext = name.partition(".")
+    trunc = (31 - len(dot) - len(ext)) if dot else 31
+    name = base[:trunc] + (dot + ext if dot else "")
+    return name, True
+
+
+def norm_dir_name(name: str) -> Tuple[str, bool]:
+    """Like :func:`norm_iso_name` for a directory, whose identifier has no dot."""
+    iso_name, changed = norm_iso_name(name)
+    dir_name = iso_name.replace(".", "_")
+    return dir_name, changed or dir_name != iso_name
+
+
+def norm_iso_path(path: str) -> str:
+    """Normalise every component of a ``/``‑separated ISO path to a file."""
+    *dirs, name = path.strip("/").split("/")
+    parts = [norm_dir_name(p)[0] for p in dirs if p]
+    if name:
+        parts.append(norm_iso_name(name)[0])
+    return "/".join(parts)
+
+
+def norm_dir_path(path: str) -> str:
+    """Normalise every component of a ``/``‑separated ISO directory path."""
+    return "/".join(norm_dir_name(p)[0] for p in path.strip("/").split("/") if p)
+
+
+ScanEntry = Tuple[str, str, int]            # (abs_path, iso_rel, size)
+
+SCAN_WORKERS: int = min(32, (os.cpu_count() or 1) * 4)   # I/O bound: NFS, USB
+SCAN_BATCH: int = 2000
+SCAN_BATCH_SECONDS: float = 0.2
+
+
+def _scan_one(path: str, prefix: str) -> Tuple[List[ScanEntry], List[Tuple[str, str, Tuple[int, int]]]]:
+    """List one directory: its files and its sub‑directories (with identity)."""
+    files: List[ScanEntry] = []
+    dirs: List[Tuple[str, str, Tuple[int, int]]] = []
+    try:
+        with os.scandir(path) as it:
+            entries = sorted(it, key=lambda e: e.name)
+    except OSError as exc:
+        logger.warning("Skipping unreadable directory %s: %s", path, exc)
+        return files, dirs
+
+    for entry in entries:
+        try:
+            if entry.is_dir():
+                st = entry.stat()
+                dirs.append((entry.path, prefix + norm_dir_name(entry.name)[0] + "/", (st.st_dev, st.st_ino)))
+            elif entry.is_file():
+                files.append((entry.path, prefix + norm_iso_name(entry.name)[0], entry.stat().st_size))
+        except OSError as exc:                # dangling symlink, vanished file…
+            logger.warning("Skipping %s: %s", entry.path, exc)
+    return files, dirs
+
+
+def scan_tree(
+    root: Path,
+    cancel: Optional[threading.Event] = None,
+    workers: int = SCAN_WORKERS,
+) -> Iterator[List[ScanEntry]]:
+    """Walk *root* with ``os.scandir`` on a thread pool, yielding batches.
+
+    Every directory is listed by its own task so slow storage is queried
+    in parallel.  Batches are yielded every :data:`SCAN_BATCH` files or
+    :data:`SCAN_BATCH_SECONDS`, whichever comes first, and the walk stops
+    early once *cancel* is set.  Symlinked directories are followed once.
+    """
+    st = os.stat(root)
+    seen = {(st.st_dev, st.st_ino)}
+    batch: List[ScanEntry] = []
+    last = time.monotonic()
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scan") as pool:
+        pending = {pool.submit(_scan_one, str(root), "")}
+        while pending:
+            done, pending = wait(pending, timeout=SCAN_BATCH_SECONDS, return_when=FIRST_COMPLETED)
+            if cancel is not None and cancel.is_set():
+                for fut in pending:
+                    fut.cancel()
+                return
+            for fut in done:
+                files, dirs = fut.result()
+                batch += files
+                for path, prefix, ident in dirs:
+                    if ident not in seen:
+                        seen.add(ident)
+                        pending.add(pool.submit(_scan_one, path, prefix))
+
+            now = time.monotonic()
+            if batch and (len(batch) >= SCAN_BATCH or now - last >= SCAN_BATCH_SECONDS):
+                yield batch
+                batch, last = [], now
+    if batch:
+        yield batch
+
+
+def iso_rel_path(path: str, root: str) -> str:
+    """ISO path of the host file *path* below *root*, named as :func:`scan_tree` does."""
+    return norm_iso_path(os.path.relpath(path, root).replace(os.sep, "/"))
+
+
+def iter_dir(root: Path) -> Iterator[Tuple[Path, str]]:
+    """Yield (absolute_path, iso_relative_path) for every file under *root*."""
+    for batch in scan_tree(root):
+        for abs_path, iso_rel, _size in batch:
+            yield Path(abs_path), iso_rel
@@ -0,0 +1,205 @@
+"""Opt‑in instrumentation: per‑action profiles and an event‑loop stall log.
+
+Off unless ``CDGENPS2_PROFILE`` names a directory (``1`` picks
+``$TMPDIR/cdgenps2-profiles``).  Every run then gets its own session
+folder there, holding:
+
+* ``<action>.prof`` – a ``cProfile`` of every :func:`profiled` block of
+  that name, accumulated over the session (``python -m pstats`` or
+  snakeviz read it);
+* ``<action>.mem.txt`` – with ``CDGENPS2_PROFILE_MEMORY=1``, the peak
+  Python heap and top allocation sites of the action's last run
+  (``tracemalloc`` slows everything down, hence the second switch);
+* ``profile.log`` – one line per action run, and every stall of the GUI
+  thread longer than ``CDGENPS2_STALL_MS`` (default 100) with the action
+  that was running and where the thread was stuck.
+
+The stall detector is :class:`StallWatchdog`: the GUI beats it from a
+timer and a daemon thread reports when the beats stop.  Nothing here
+imports Qt.
+"""
+
+from __future__ import annotations
+
+import cProfile
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+import traceback
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, TypeVar
+
+logger = logging.getLogger("profile")
+
+ENV_DIR = "CDGENPS2_PROFILE"
+ENV_MEMORY = "CDGENPS2_PROFILE_MEMORY"
+ENV_STALL_MS = "CDGENPS2_STALL_MS"
+STALL_MS: float = 100.0
+TOP_ALLOCATIONS: int = 25
+
+_session: Optional[Path] = None
+_lock = threading.Lock()
+_profiles: Dict[str, cProfile.Profile] = {}
+_actions: Dict[int, List[str]] = {}          # thread id → running actions, innermost last
+_local = threading.local()                    # .profiling: a cProfile is active on this thread
+
+F = TypeVar("F", bound=Callable)
+
+
+def enabled() -> bool:
+    return bool(os.environ.get(ENV_DIR))
+
+
+def session_dir() -> Optional[Path]:
+    """This run's output folder, created (and logged to) on first use."""
+    global _session
+    if not enabled():
+        return None
+    with _lock:
+        if _session is None:
+            value = os.environ[ENV_DIR]
+            base = Path(tempfile.gettempdir(), "cdgenps2-profiles") if value == "1" else Path(value)
+            _session = base / f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+            _session.mkdir(parents=True, exist_ok=True)
+            handler = logging.FileHandler(_session / "profile.log", encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+            logger.addHandler(handler)
+            logger.setLevel(logging.INFO)
+            logger.info("Profiling %s into %s", " ".join(sys.argv), _session)
+    return _session
+
+
+def current_action(thread_id: Optional[int] = None) -> Optional[str]:
+    """Innermost :func:`profiled` block running on the thread (default: this one)."""
+    stack = _actions.get(threading.get_ident() if thread_id is None else thread_id)
+    return stack[-1] if stack else None
+
+
+def _file_name(name: str) -> str:
+    return "".join(c if c.isalnum() or c in "-_." else "_" for c in name)
+
+# --------------------------------------------------------------------------- #
+# Actions
+# --------------------------------------------------------------------------- #
+
+@contextmanager
+def profiled(name: str) -> Iterator[None]:
+    """Profile the block as action *name*; a no‑op unless profiling is on.
+
+    Nested blocks are attributed to the stall log but only the outermost
+    one runs ``cProfile`` (one profiler per thread).
+    """
+    directory = session_dir()
+    if directory is None:
+        yield
+        return
+
+    stack = _actions.setdefault(threading.get_ident(), [])
+    stack.append(name)
+    outer = not getattr(_local, "profiling", False)
+    profile = None
+    memory = outer and os.environ.get(ENV_MEMORY) == "1"
+    if outer:
+        _local.profiling = True
+        with _lock:
+            profile = _profiles.setdefault(name, cProfile.Profile())
+        if memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(10)
+            tracemalloc.reset_peak()
+    start = time.perf_counter()
+    if profile is not None:
+        profile.enable()
+    try:
+        yield
+    finally:
+        if profile is not None:
+            profile.disable()
+        elapsed = time.perf_counter() - start
+        stack.pop()
+        if outer:
+            _local.profiling = False
+            notes = ""
+            if memory:
+                peak = tracemalloc.get_traced_memory()[1]
+                _write_memory(directory / f"{_file_name(name)}.mem.txt", name, peak)
+                tracemalloc.stop()
+                notes = f", peak {peak / 2**20:.1f} MB"
+            profile.dump_stats(str(directory / f"{_file_name(name)}.prof"))
+            logger.info("%s: %.3f s%s", name, elapsed, notes)
+
+
+def _write_memory(path: Path, name: str, peak: int) -> None:
+    stats = tracemalloc.take_snapshot().statistics("lineno")[:TOP_ALLOCATIONS]
+    with open(path, "w", encoding="utf-8") as fh:
+        fh.write(f"{name}: peak {peak} bytes; still allocated at the end:\n")
+        for stat in stats:
+            fh.write(f"{stat}\n")
+
+
+def instrument(name: str) -> Callable[[F], F]:
+    """Decorator form of :func:`profiled`."""
+    def wrap(func: F) -> F:
+        def inner(*args, **kwargs):
+            with profiled(name):
+                return func(*args, **kwargs)
+        inner.__name__, inner.__doc__, inner.__wrapped__ = func.__name__, func.__doc__, func
+        return inner  # type: ignore[return-value]
+    return wrap
+
+# --------------------------------------------------------------------------- #
+# Stall detector
+# --------------------------------------------------------------------------- #
+
+class StallWatchdog:
+    """Reports stalls of the thread that calls :meth:`beat`.
+
+    The watched thread beats every few tens of milliseconds (a GUI timer);
+    when no beat arrived for *threshold_ms*, the watchdog logs the action
+    running on that thread and the top of its stack, once per stall, and
+    how long the stall lasted when the beats resume.
+    """
+
+    def __init__(self, threshold_ms: Optional[float] = None) -> None:
+        if threshold_ms is None:
+            threshold_ms = float(os.environ.get(ENV_STALL_MS) or STALL_MS)
+        self.threshold = threshold_ms / 1000
+        self.thread_id = threading.get_ident()
+        self.stalls = 0
+        self._last = time.monotonic()
+        self._stalled_since: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stall-watchdog", daemon=True)
+
+    def start(self) -> "StallWatchdog":
+        session_dir()
+        self._thread.start()
+        return self
+
+    def beat(self) -> None:
+        now = time.monotonic()
+        since = self._stalled_since
+        if since is not None:
+            self._stalled_since = None
+            logger.warning("GUI stall ended after %.0f ms", (now - since) * 1000)
+        self._last = now
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.threshold / 4):
+            last = self._last
+            if self._stalled_since is None and time.monotonic() - last > self.threshold:
+                self._stalled_since = last
+                self.stalls += 1
+                frame = sys._current_frames().get(self.thread_id)
+                where = "".join(traceback.format_stack(frame, limit=8)) if frame is not None else ""
+                logger.warning("GUI stalled > %.0f ms during %s\n%s", self.threshold * 1000,
+                               current_action(self.thread_id) or "no action", where.rstrip())
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
@@ -0,0 +1,163 @@
+"""Build progress, throughput telemetry and cancellation.
+
+A :class:`BuildProgress` travels through the build pipeline.  The writer
+reports every byte it produces against the current *phase* (validation,
+dedup, layout, diff, directories, data, padding) and every file copy
+against the device it was read from, so a build report shows both where
+the time went and which source disks were slow.  Callers get a throttled callback for
+live progress and can stop the build by setting :attr:`cancel`; the
+pipeline then raises :class:`BuildCancelled` at the next check.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+REPORT_VERSION = 1
+REPORT_SUFFIX = ".build.json"
+CALLBACK_INTERVAL = 0.1                # seconds between progress callbacks
+
+# (phase, bytes done, bytes total, bytes/sec, eta seconds or -1)
+ProgressCallback = Callable[[str, int, int, float, float], None]
+
+
+class BuildCancelled(RuntimeError):
+    """Raised inside the pipeline once the build has been cancelled."""
+
+
+@dataclass
+class _Counter:
+    seconds: float = 0.0
+    bytes: int = 0
+    files: int = 0
+    example: str = ""
+
+    def as_dict(self) -> Dict[str, Any]:
+        rate = self.bytes / self.seconds if self.seconds > 0 else 0.0
+        return {"seconds": round(self.seconds, 6), "bytes": self.bytes,
+                "bytes_per_sec": round(rate, 1)}
+
+
+@dataclass
+class BuildProgress:
+    callback: Optional[ProgressCallback] = None
+    cancel: threading.Event = field(default_factory=threading.Event)
+
+    total: int = 0                     # bytes the output step will write
+    done: int = 0
+    phase_name: str = ""
+    phases: Dict[str, _Counter] = field(default_factory=dict)
+    sources: Dict[str, _Counter] = field(default_factory=dict)
+
+    def __post_init__(self) -> None:
+        self._started = time.monotonic()
+        self._output_started = 0.0
+        self._last_callback = 0.0
+
+    # ------------------------------------------------------------------ #
+    def check(self) -> None:
+        if self.cancel.is_set():
+            raise BuildCancelled("Build cancelled")
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Account the time spent in the block to phase *name*.
+
+        Phases may be entered many times (directories and file data are
+        interleaved in LBA order); their totals accumulate.
+        """
+        self.check()
+        outer, self.phase_name = self.phase_name, name
+        counter = self.phases.setdefault(name, _Counter())
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            counter.seconds += time.perf_counter() - start
+            self.phase_name = outer
+
+    def start_output(self, total: int) -> None:
+        """Called by the writer before it starts emitting *total* bytes."""
+        self.total, self.done = total, 0
+        self._output_started = time.monotonic()
+        self._notify(force=True)
+
+    def advance(self, nbytes: int) -> None:
+        """Record *nbytes* written in the current phase."""
+        self.done += nbytes
+        if self.phase_name:
+            self.phases[self.phase_name].bytes += nbytes
+        self._notify()
+
+    def count(self, nbytes: int) -> None:
+        """Record *nbytes* processed in the current phase without writing them."""
+        if self.phase_name:
+            self.phases[self.phase_name].bytes += nbytes
+
+    def source_read(self, path: str, device: int, nbytes: int, seconds: float) -> None:
+        """Record one file copy from *device* (``st_dev`` of the source)."""
+        key = f"{os.major(device)}:{os.minor(device)}"
+        counter = self.sources.get(key)
+        if counter is None:
+            counter = self.sources[key] = _Counter(example=path)
+        counter.files += 1
+        counter.bytes += nbytes
+        counter.seconds += seconds
+
+    # ------------------------------------------------------------------ #
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self._started
+
+    def rate(self) -> float:
+        spent = time.monotonic() - self._output_started if self._output_started else 0.0
+        return self.done / spent if spent > 0 else 0.0
+
+    def eta(self) -> float:
+        rate = self.rate()
+        return (self.total - self.done) / rate if rate > 0 and self.total else -1.0
+
+    def _notify(self, force: bool = False) -> None:
+        if self.callback is None:
+            return
+        now = time.monotonic()
+        if force or now - self._last_callback >= CALLBACK_INTERVAL:
+            self._last_callback = now
+            self.callback(self.phase_name, self.done, self.total, self.rate(), self.eta())
+
+    # ------------------------------------------------------------------ #
+    def report(self, **extra: Any) -> Dict[str, Any]:
+        """Machine‑readable summary; *extra* keys (status, output…) are merged in."""
+        phases: List[Dict[str, Any]] = [dict(name=n, **c.as_dict()) for n, c in self.phases.items()]
+        sources = [
+            dict(device=dev, example=c.example, files=c.files, **c.as_dict())
+            for dev, c in sorted(self.sources.items(), key=lambda kv: -kv[1].seconds)
+        ]
+        report: Dict[str, Any] = {"version": REPORT_VERSION}
+        report.update(extra)
+        report.update({
+            "duration": round(self.elapsed, 6),
+            "bytes_written": self.done,
+            "bytes_per_sec": round(self.rate(), 1),
+            "phases": phases,
+            "sources": sources,
+        })
+        return report
+
+
+def report_path(output_path: str) -> str:
+    return output_path + REPORT_SUFFIX
+
+
+def write_report(path: str, report: Dict[str, Any]) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2)
+        fh.write("\n")
+    os.replace(tmp, path)
@@ -0,0 +1,244 @@
+"""Read‑ahead for file data: sources are read while the image is written.
+
+Kernel‑side copies (see :class:`core.writer._Output`) read and write in
+one synchronous call, so every millisecond of source latency – an NFS
+round trip, a disk seek – stalls the output.  :class:`ReadAhead` instead
+reads the data of the files coming up, in layout order, on a small thread
+pool while the writer is still busy with the previous ones:
+
+* the reads are cut into :data:`CHUNK_SIZE` chunks and at most
+  :data:`RING_SLOTS` of them are in flight or waiting for the writer – a
+  fixed ring, so peak memory is ``RING_SLOTS × CHUNK_SIZE`` whatever the
+  file sizes (chunks are immutable ``bytes``, so hashing threads may keep
+  one past its slot);
+* each file is opened with ``POSIX_FADV_SEQUENTIAL`` and every read asks
+  the kernel (``POSIX_FADV_WILLNEED``) for the range a ring further on;
+* a spinning disk gets one read at a time, still in layout order, so
+  parallel reads never turn into seeks; network and solid‑state sources
+  get :data:`READ_WORKERS` at once to hide their latency.
+
+:func:`wanted` decides per build: read‑ahead pays off when the data has to
+pass through user space anyway (compression, checksums) or when a source
+lives on a network file system or a rotational disk.  ``CDGENPS2_READAHEAD``
+set to ``0`` or ``1`` forces it off or on.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from collections import deque
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from typing import Deque, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from core.sources import Source, is_virtual, open_source
+
+logger = logging.getLogger("buildiso")
+
+ENV_READAHEAD = "CDGENPS2_READAHEAD"
+READ_WORKERS: int = 4
+CHUNK_SIZE: int = 4 * 1024 * 1024
+RING_SLOTS: int = 16                   # 64 MiB in flight at most
+
+NETWORK_FS = frozenset({
+    "nfs", "nfs4", "cifs", "smb3", "smbfs", "9p", "afs", "ceph", "glusterfs",
+    "fuse.sshfs", "fuse.rclone", "fuse.s3fs", "fuse.glusterfs", "lustre",
+})
+
+_HAS_FADVISE = hasattr(os, "posix_fadvise")
+
+# --------------------------------------------------------------------------- #
+# Source devices
+# --------------------------------------------------------------------------- #
+
+_fstypes: Optional[Dict[int, str]] = None
+
+
+def fs_type(device: int) -> Optional[str]:
+    """File system type of the mount with ``st_dev`` *device* (Linux)."""
+    global _fstypes
+    if _fstypes is None:
+        _fstypes = {}
+        try:
+            with open("/proc/self/mountinfo", encoding="utf-8", errors="replace") as fh:
+                for line in fh:
+                    fields = line.split()
+                    sep = fields.index("-")
+                    major, minor = fields[2].split(":")
+                    _fstypes[os.makedev(int(major), int(minor))] = fields[sep + 1]
+        except (OSError, ValueError, IndexError):
+            pass
+    return _fstypes.get(device)
+
+
+def is_network(device: int) -> bool:
+    return (fs_type(device) or "") in NETWORK_FS
+
+
+def is_rotational(device: int) -> bool:
+    """``True`` for partitions and disks the kernel reports as spinning."""
+    base = f"/sys/dev/block/{os.major(device)}:{os.minor(device)}"
+    for path in (f"{base}/queue/rotational", f"{base}/../queue/rotational"):
+        try:
+            with open(path) as fh:
+                return fh.read().strip() == "1"
+        except OSError:
+            continue
+    return False
+
+
+def wanted(devices: Iterable[int], user_space: bool = False) -> bool:
+    """Whether a build reading from *devices* should use :class:`ReadAhead`
+    (see the module doc); *user_space*: the data is read in anyway."""
+    forced = os.environ.get(ENV_READAHEAD)
+    if forced in ("0", "1"):
+        return forced == "1"
+    return user_space or any(is_network(d) or is_rotational(d) for d in set(devices) if d)
+
+# --------------------------------------------------------------------------- #
+# Engine
+# --------------------------------------------------------------------------- #
+
+class _File:
+    __slots__ = ("source", "size", "device", "opened")
+
+    def __init__(self, source: Source, size: int, device: int) -> None:
+        self.source = source
+        self.size = size
+        self.device = device
+        self.opened: Optional[Future] = None         # → (fd, base)
+
+
+class ReadAhead:
+    """Reads *files* (``(source, size, st_dev)`` in the order the writer
+    will ask for them) ahead of the writer; see the module doc.
+
+    The writer calls :meth:`read` for each file in turn.  :meth:`close`
+    stops the reads and releases every descriptor – also after an error
+    or a cancelled build.
+    """
+
+    def __init__(self, files: Sequence[Tuple[Source, int, int]], workers: int = READ_WORKERS,
+                 slots: int = RING_SLOTS, chunk_size: int = CHUNK_SIZE) -> None:
+        self._files = [_File(s, n, d) for s, n, d in files if n > 0]
+        self._chunk = chunk_size
+        self._slots = max(1, slots)
+        self._pool = ThreadPoolExecutor(max(1, workers), thread_name_prefix="readahead")
+        self._ring: Deque[Tuple[int, Future]] = deque()      # (bytes asked, read)
+        self._next = (0, 0)                           # next chunk to schedule: file, offset
+        self._current = 0                             # file the writer is on
+        self._locks: Dict[int, threading.Lock] = {    # one read at a time per spinning disk
+            d: threading.Lock() for d in {f.device for f in self._files}
+            if d and is_rotational(d) and not is_network(d)
+        }
+        self._closed = False
+        self._fill()
+
+    # ------------------------------------------------------------------ #
+    def _fill(self) -> None:
+        """Schedule chunks in order until the ring is full."""
+        index, offset = self._next
+        while len(self._ring) < self._slots and index < len(self._files):
+            f = self._files[index]
+            if f.opened is None:
+                f.opened = self._pool.submit(self._open, f)
+            count = min(self._chunk, f.size - offset)
+            self._ring.append((count, self._pool.submit(self._read, f, offset, count)))
+            offset += count
+            if offset >= f.size:
+                index, offset = index + 1, 0
+        self._next = (index, offset)
+
+    def _open(self, f: _File) -> Tuple[int, int]:
+        fd, base = open_source(f.source)
+        if _HAS_FADVISE:
+            try:
+                os.posix_fadvise(fd, base, f.size, os.POSIX_FADV_SEQUENTIAL)
+            except OSError:
+                pass
+        return fd, base
+
+    def _read(self, f: _File, offset: int, count: int) -> bytes:
+        fd, base = f.opened.result()
+        if _HAS_FADVISE:
+            ahead = offset + self._slots * self._chunk
+            if ahead < f.size:
+                try:
+                    os.posix_fadvise(fd, base + ahead, min(self._chunk, f.size - ahead),
+                                     os.POSIX_FADV_WILLNEED)
+                except OSError:
+                    pass
+        lock = self._locks.get(f.device)
+        if lock is None:
+            return self._pread(fd, base + offset, count)
+        with lock:
+            return self._pread(fd, base + offset, count)
+
+    @staticmethod
+    def _pread(fd: int, offset: int, count: int) -> bytes:
+        data = os.pread(fd, count, offset)
+        while 0 < len(data) < count:                  # short reads happen on network mounts
+            more = os.pread(fd, count - len(data), offset + len(data))
+            if not more:
+                break
+            data += more
+        return data
+
+    # ------------------------------------------------------------------ #
+    def read(self, source: Source, size: int) -> Iterator[bytes]:
+        """The data of *source*, chunk by chunk; must be the next file."""
+        if self._closed:
+            raise RuntimeError("Read-ahead is closed")
+        if size <= 0:
+            return
+        f = self._files[self._current] if self._current < len(self._files) else None
+        if f is None or f.source != source or f.size != size:
+            raise RuntimeError(f"Read-ahead out of order: {source} is not the next file")
+        done = 0
+        while done < size:
+            count, future = self._ring.popleft()
+            data = future.result()
+            self._fill()                              # the slot is free again
+            if len(data) != count:
+                raise RuntimeError(f"{source} shrank while the image was being written")
+            done += len(data)
+            yield data
+        self._current += 1
+        self._release(f)
+
+    def _release(self, f: _File) -> None:
+        if f.opened is not None:
+            try:
+                fd, _base = f.opened.result()
+            except (OSError, CancelledError):
+                return
+            os.close(fd)
+            f.opened = None
+
+    def close(self) -> None:
+        """Stop reading ahead; safe to call more than once."""
+        if self._closed:
+            return
+        self._closed = True
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        self._ring.clear()
+        for f in self._files[self._current:]:
+            self._release(f)
+
+    def __enter__(self) -> "ReadAhead":
+        return self
+
+    def __exit__(self, *_exc) -> None:
+        self.close()
+
+
+def data_files(regions: Iterable[Tuple[int, int, object]]) -> List[Tuple[Source, int, int]]:
+    """``(source, size, device)`` of the file data among writer *regions*,
+    in order – what :class:`ReadAhead` is built from."""
+    out = []
+    for _lba, _sectors, payload in regions:
+        source = getattr(payload, "source", None)
+        if source is not None and not is_virtual(source):
+            out.append((source, payload.size, payload.device))
+    return out
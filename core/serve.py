@@ -0,0 +1,523 @@
+"""Serve a layout as an image that is never written: HTTP ranges and NBD.
+
+:class:`VirtualImage` keeps the plan of :func:`core.writer.plan_image` in
+memory and answers reads of any byte range of the image: metadata sectors
+are generated from the directory tree (the last few are cached), file
+sectors are ``pread`` from the sources, everything else is zeros.
+Nothing of the image touches the disk, so a changed source is served as
+soon as it is saved:
+
+* a source whose size still fits its sectors is served as is – only the
+  directory records and UDF entries carrying its size and date change;
+* any other change (or a new list of files, :meth:`VirtualImage.update`)
+  plans the image again, keeping every file that still fits at its LBA.
+
+Sources are ``stat``'ed whenever their data is read, so edits show up on
+the next read without a watcher; a watcher (:mod:`core.watch`) is only
+needed to notice new or removed files.
+
+Two front ends share one image, both bound to the loopback interface by
+default – they are meant for testing on the local machine:
+
+* :func:`http_server` – ``GET``/``HEAD`` with single ``Range``
+  requests, enough for ``iPXE sanboot``, emulators and ``curl -r``;
+* :func:`nbd_server` – a read‑only Network Block Device export
+  (fixed newstyle handshake) on a TCP port or a Unix socket, for
+  ``nbd-client`` (``/dev/nbdX``), ``qemu -drive file=nbd:…`` or ``nbdfuse``.
+  The export size is fixed per connection: when a change grows the image,
+  clients must reconnect to see the new end.
+"""
+
+from __future__ import annotations
+
+import bisect
+import errno
+import logging
+import os
+import socket
+import socketserver
+import struct
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Mapping, Optional, Sequence, Tuple, Union
+
+from core.iso9660 import SECTOR_SIZE, sectors_for
+from core.layout import LayoutHints
+from core.sources import Source, VirtualSource, is_virtual, open_source, source_stat
+from core.writer import VOLUME_ID, FileNode, ImagePlan, Region, plan_image, regions
+
+logger = logging.getLogger("buildiso")
+
+DEFAULT_HOST = "127.0.0.1"
+HTTP_PORT: int = 8080
+NBD_PORT: int = 10809                  # IANA port of the NBD protocol
+SEND_CHUNK: int = 1 << 20
+MAX_REQUEST: int = 32 << 20            # largest NBD read served at once
+METADATA_CACHE: int = 1024             # generated regions kept per layout
+
+Address = Union[Tuple[str, int], str]  # (host, port) or a Unix socket path
+
+# --------------------------------------------------------------------------- #
+# Image
+# --------------------------------------------------------------------------- #
+
+class _Layout:
+    """One plan and its regions, swapped as a whole when the plan changes."""
+
+    def __init__(self, plan: ImagePlan, generation: int) -> None:
+        self.plan = plan
+        self.generation = generation
+        self.regions: List[Region] = regions(plan)
+        self.starts = [lba for lba, _sectors, _payload in self.regions]
+        self._cache: "OrderedDict[int, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def size(self) -> int:
+        return self.plan.size
+
+    def generated(self, index: int) -> bytes:
+        """Bytes of the metadata region *index*, cached."""
+        with self._lock:
+            data = self._cache.get(index)
+            if data is not None:
+                self._cache.move_to_end(index)
+                return data
+        lba, sectors, producer = self.regions[index]
+        data = producer()
+        if len(data) != sectors * SECTOR_SIZE:
+            raise RuntimeError(f"Region at LBA {lba} has the wrong size")
+        with self._lock:
+            self._cache[index] = data
+            if len(self._cache) > METADATA_CACHE:
+                self._cache.popitem(last=False)
+        return data
+
+
+class _Stale(Exception):
+    def __init__(self, node: FileNode, st: os.stat_result) -> None:
+        super().__init__(node.iso_path)
+        self.node = node
+        self.st = st
+
+
+def _read_virtual(source: VirtualSource, offset: int, count: int) -> bytes:
+    out = bytearray()
+    pos = 0
+    for chunk in source.chunks():
+        end = pos + len(chunk)
+        if end > offset:
+            out += chunk[max(0, offset - pos):offset + count - pos]
+            if len(out) >= count:
+                break
+        pos = end
+    return bytes(out)
+
+
+class VirtualImage:
+    """The image of *files* (``(iso_rel, source, lba)``), readable at any
+    offset; see the module doc.  Thread safe: reads run concurrently, a
+    change swaps in a new layout."""
+
+    def __init__(self, files: Sequence[Tuple[str, Source, Optional[int]]], volume_id: str = VOLUME_ID,
+                 hints: Optional[LayoutHints] = None,
+                 stats: Optional[Mapping[Source, Optional[os.stat_result]]] = None) -> None:
+        self._volume_id = volume_id
+        self._hints = hints
+        self._files = list(files)
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._layout = _Layout(plan_image(self._files, volume_id, hints, stats=stats), 0)
+
+    @property
+    def size(self) -> int:
+        return self._layout.size
+
+    @property
+    def plan(self) -> ImagePlan:
+        return self._layout.plan
+
+    @property
+    def generation(self) -> int:
+        """Bumped whenever the bytes of the image may have changed."""
+        return self._layout.generation
+
+    # ------------------------------------------------------------------ #
+    def update(self, files: Optional[Sequence[Tuple[str, Source, Optional[int]]]] = None,
+               stats: Optional[Mapping[Source, Optional[os.stat_result]]] = None) -> None:
+        """Plan again for *files* (default: the same files, re‑``stat``'ed);
+        files that still fit keep their LBA."""
+        with self._lock:
+            if files is not None:
+                self._files = list(files)
+            self._replan(stats)
+
+    def _replan(self, stats) -> None:
+        old = self._layout.plan
+        previous = {f.iso_path: (f.lba, f.sectors) for f in old.files if f.size}
+        plan = plan_image(self._files, self._volume_id, self._hints, timestamp=old.timestamp,
+                          previous=previous, stats=stats)
+        self._generation += 1
+        self._layout = _Layout(plan, self._generation)
+        logger.info("Virtual image planned again: %d sectors", plan.total_sectors)
+
+    def refresh(self, sources: Optional[Sequence[Source]] = None) -> None:
+        """Pick up changes of *sources* (default: all) now rather than on
+        their next read."""
+        wanted = None if sources is None else set(sources)
+        layout = self._layout
+        for node in layout.plan.files:
+            if node.shares is None and (wanted is None or node.source in wanted):
+                st = source_stat(node.source)
+                if (st.st_size, st.st_mtime) != (node.size, node.mtime):
+                    self._changed(layout, node, st)
+                    if self._layout.plan is not layout.plan:
+                        return                    # planned again: every source stat'ed afresh
+                    layout = self._layout
+
+    def _changed(self, layout: _Layout, node: FileNode, st: os.stat_result) -> None:
+        with self._lock:
+            if layout is not self._layout:
+                return                            # another reader got here first
+            if sectors_for(st.st_size) == node.sectors:
+                node.size, node.mtime = st.st_size, st.st_mtime
+                self._generation += 1
+                self._layout = _Layout(layout.plan, self._generation)
+                logger.info("%s changed in place", node.iso_path)
+            else:
+                self._replan(None)
+
+    # ------------------------------------------------------------------ #
+    def read(self, offset: int, length: int) -> bytes:
+        """Up to *length* bytes at *offset*; short only at the end of the image."""
+        for _attempt in range(8):
+            layout = self._layout
+            try:
+                return self._read(layout, offset, length)
+            except _Stale as stale:
+                self._changed(layout, stale.node, stale.st)
+        raise RuntimeError("The sources keep changing while being read")
+
+    def _read(self, layout: _Layout, offset: int, length: int) -> bytes:
+        end = min(offset + length, layout.size)
+        out = bytearray()
+        pos = offset
+        starts, items = layout.starts, layout.regions
+        i = bisect.bisect_right(starts, pos // SECTOR_SIZE) - 1
+        while pos < end:
+            if i >= 0 and pos < (items[i][0] + items[i][1]) * SECTOR_SIZE:
+                lba, sectors, payload = items[i]
+                base = lba * SECTOR_SIZE
+                count = min(end, base + sectors * SECTOR_SIZE) - pos
+                if isinstance(payload, FileNode):
+                    out += self._file_data(payload, pos - base, count)
+                else:
+                    out += layout.generated(i)[pos - base:pos - base + count]
+                pos += count
+            else:
+                i += 1
+                stop = min(end, starts[i] * SECTOR_SIZE if i < len(starts) else end)
+                out += bytes(stop - pos)
+                pos = stop
+        return bytes(out)
+
+    @staticmethod
+    def _file_data(node: FileNode, offset: int, count: int) -> bytes:
+        """*count* bytes of *node*'s sectors at *offset*: its data, then zeros."""
+        source = node.source
+        st = source_stat(source)
+        if (st.st_size, st.st_mtime) != (node.size, node.mtime):
+            raise _Stale(node, st)
+        want = max(0, min(count, node.size - offset))
+        data = b""
+        if want and is_virtual(source):
+            data = _read_virtual(source, offset, want)
+        elif want:
+            fd, base = open_source(source)
+            try:
+                data = os.pread(fd, want, base + offset)
+                while len(data) < want:
+                    more = os.pread(fd, want - len(data), base + offset + len(data))
+                    if not more:
+                        break
+                    data += more
+            finally:
+                os.close(fd)
+        if len(data) != want:
+            raise _Stale(node, source_stat(source))
+        return data + bytes(count - want)
+
+# --------------------------------------------------------------------------- #
+# Servers
+# --------------------------------------------------------------------------- #
+
+def parse_address(text: str, default_port: int) -> Address:
+    """``PORT``, ``HOST:PORT``, ``[V6]:PORT`` or a Unix socket path (with a
+    ``/``) – what ``--http``/``--nbd`` accept."""
+    if "/" in text:
+        return text
+    host, sep, port = text.rpartition(":")
+    if not sep:
+        host, port = (DEFAULT_HOST, text) if text.isdigit() else (text, str(default_port))
+    try:
+        number = int(port)
+    except ValueError:
+        raise ValueError(f"Invalid port in {text!r}") from None
+    return host.strip("[]") or DEFAULT_HOST, number
+
+
+class _Serving:
+    """A ``socketserver`` server of one image, run on a daemon thread."""
+
+    scheme = ""
+    handler: type = socketserver.BaseRequestHandler
+    daemon_threads = True
+
+    def __init__(self, image: VirtualImage, address: Address) -> None:
+        self.image = image
+        if not isinstance(address, str) and ":" in address[0]:
+            self.address_family = socket.AF_INET6
+        super().__init__(address, self.handler)
+
+    _thread: Optional[threading.Thread] = None
+
+    def start(self) -> "_Serving":
+        self._thread = threading.Thread(target=self.serve_forever, name=f"serve-{self.scheme}",
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self) -> None:
+        if self._thread is not None:                      # shutdown() waits for serve_forever
+            self.shutdown()
+            self._thread = None
+        self.server_close()
+
+    @property
+    def url(self) -> str:
+        address = self.server_address
+        if isinstance(address, (str, bytes)):
+            return f"{self.scheme}+unix://{os.fsdecode(address)}"
+        host, port = address[:2]
+        return f"{self.scheme}://{f'[{host}]' if ':' in host else host}:{port}/"
+
+
+# ---- HTTP ---------------------------------------------------------------- #
+
+def _parse_range(header: Optional[str], size: int) -> Union[None, bool, Tuple[int, int]]:
+    """``(start, end)`` of a single ``bytes=`` range, ``None`` to send the
+    whole image, ``False`` when unsatisfiable."""
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    first, sep, last = header[6:].strip().partition("-")
+    try:
+        if not sep:
+            return None
+        if not first:                                     # the last N bytes
+            n = int(last)
+            return (max(0, size - n), size) if n > 0 and size else False
+        start = int(first)
+        end = min(size, int(last) + 1) if last else size
+    except ValueError:
+        return None
+    return (start, end) if start < end else False
+
+
+class _HTTPHandler(BaseHTTPRequestHandler):
+    server_version = "cdgenps2"
+    protocol_version = "HTTP/1.1"                         # keep‑alive between ranges
+
+    def do_HEAD(self) -> None:
+        self._serve(body=False)
+
+    def do_GET(self) -> None:
+        self._serve(body=True)
+
+    def _serve(self, body: bool) -> None:
+        image: VirtualImage = self.server.image
+        size, etag = image.size, f'"{image.generation}-{image.size}"'
+        header = self.headers.get("Range")
+        if_range = self.headers.get("If-Range")
+        wanted = _parse_range(header, size) if if_range in (None, etag) else None
+        if wanted is False:
+            self.send_response(416)
+            self.send_header("Content-Range", f"bytes */{size}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        start, end = wanted or (0, size)
+        try:
+            first = image.read(start, min(SEND_CHUNK, end - start)) if body else b""
+        except (OSError, RuntimeError, ValueError) as exc:
+            logger.warning("Serving bytes %d-%d: %s", start, end, exc)
+            self.send_error(500, str(exc))
+            return
+        self.send_response(206 if wanted else 200)
+        if wanted:
+            self.send_header("Content-Range", f"bytes {start}-{end - 1}/{size}")
+        self.send_header("Content-Type", "application/x-iso9660-image")
+        self.send_header("Content-Length", str(end - start))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        if not body:
+            return
+        try:
+            self.wfile.write(first)
+            pos = start + len(first)
+            while pos < end:
+                data = image.read(pos, min(SEND_CHUNK, end - pos))
+                if not data:
+                    raise RuntimeError("the image shrank while being sent")
+                self.wfile.write(data)
+                pos += len(data)
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+        except (OSError, RuntimeError, ValueError) as exc:   # headers are out: drop the connection
+            logger.warning("Serving bytes %d-%d: %s", start, end, exc)
+            self.close_connection = True
+
+    def log_message(self, fmt: str, *args) -> None:
+        logger.debug("http: %s " + fmt, self.address_string(), *args)
+
+
+class _HTTPServer(_Serving, ThreadingHTTPServer):
+    scheme = "http"
+    handler = _HTTPHandler
+
+
+def http_server(image: VirtualImage, address: Tuple[str, int] = (DEFAULT_HOST, HTTP_PORT)) -> _Serving:
+    """*image* over HTTP at *address* (port 0 picks a free one); call
+    ``start()`` to serve and ``close()`` to stop."""
+    return _HTTPServer(image, address)
+
+
+# ---- NBD ----------------------------------------------------------------- #
+
+NBD_MAGIC = b"NBDMAGIC"
+NBD_IHAVEOPT = 0x49484156454F5054
+NBD_REPLY_MAGIC = 0x3E889045565A9
+NBD_REQUEST_MAGIC = 0x25609513
+NBD_SIMPLE_REPLY_MAGIC = 0x67446698
+
+NBD_FLAG_FIXED_NEWSTYLE, NBD_FLAG_NO_ZEROES = 1, 2
+NBD_FLAG_HAS_FLAGS, NBD_FLAG_READ_ONLY, NBD_FLAG_SEND_FLUSH, NBD_FLAG_CAN_MULTI_CONN = 1, 2, 4, 1 << 8
+NBD_OPT_EXPORT_NAME, NBD_OPT_ABORT, NBD_OPT_LIST, NBD_OPT_INFO, NBD_OPT_GO = 1, 2, 3, 6, 7
+NBD_REP_ACK, NBD_REP_SERVER, NBD_REP_INFO = 1, 2, 3
+NBD_REP_ERR_UNSUP = (1 << 31) | 1
+NBD_INFO_EXPORT, NBD_INFO_BLOCK_SIZE = 0, 3
+NBD_CMD_READ, NBD_CMD_WRITE, NBD_CMD_DISC, NBD_CMD_FLUSH = 0, 1, 2, 3
+
+_TRANSMISSION_FLAGS = NBD_FLAG_HAS_FLAGS | NBD_FLAG_READ_ONLY | NBD_FLAG_SEND_FLUSH | NBD_FLAG_CAN_MULTI_CONN
+
+
+class _NBDHandler(socketserver.BaseRequestHandler):
+    """One client: option haggling, then read requests until it disconnects."""
+
+    def handle(self) -> None:
+        sock: socket.socket = self.request
+        try:
+            if self._handshake(sock):
+                self._transmission(sock)
+        except (EOFError, ConnectionError):
+            pass
+        except ValueError as exc:
+            logger.warning("nbd: %s", exc)
+
+    def _recv(self, n: int) -> bytes:
+        data = bytearray()
+        while len(data) < n:
+            chunk = self.request.recv(n - len(data))
+            if not chunk:
+                raise EOFError
+            data += chunk
+        return bytes(data)
+
+    def _reply(self, option: int, kind: int, data: bytes = b"") -> None:
+        self.request.sendall(struct.pack(">QIII", NBD_REPLY_MAGIC, option, kind, len(data)) + data)
+
+    def _handshake(self, sock: socket.socket) -> bool:
+        sock.sendall(NBD_MAGIC + struct.pack(">QH", NBD_IHAVEOPT,
+                                             NBD_FLAG_FIXED_NEWSTYLE | NBD_FLAG_NO_ZEROES))
+        (client_flags,) = struct.unpack(">I", self._recv(4))
+        image: VirtualImage = self.server.image
+        while True:
+            magic, option, length = struct.unpack(">QII", self._recv(16))
+            if magic != NBD_IHAVEOPT or length > 65536:
+                raise ValueError("bad option request")
+            self._recv(length)                                # export name, info requests: one image
+            self.size = image.size                            # fixed for this connection
+            if option == NBD_OPT_EXPORT_NAME:
+                reply = struct.pack(">QH", self.size, _TRANSMISSION_FLAGS)
+                sock.sendall(reply if client_flags & NBD_FLAG_NO_ZEROES else reply + bytes(124))
+                return True
+            if option == NBD_OPT_ABORT:
+                self._reply(option, NBD_REP_ACK)
+                return False
+            if option == NBD_OPT_LIST:
+                name = image.plan.volume_id.encode()
+                self._reply(option, NBD_REP_SERVER, struct.pack(">I", len(name)) + name)
+                self._reply(option, NBD_REP_ACK)
+            elif option in (NBD_OPT_INFO, NBD_OPT_GO):
+                self._reply(option, NBD_REP_INFO, struct.pack(">HQH", NBD_INFO_EXPORT, self.size,
+                                                              _TRANSMISSION_FLAGS))
+                self._reply(option, NBD_REP_INFO, struct.pack(">HIII", NBD_INFO_BLOCK_SIZE, 1,
+                                                              SECTOR_SIZE, MAX_REQUEST))
+                self._reply(option, NBD_REP_ACK)
+                if option == NBD_OPT_GO:
+                    return True
+            else:
+                self._reply(option, NBD_REP_ERR_UNSUP)
+
+    def _transmission(self, sock: socket.socket) -> None:
+        image: VirtualImage = self.server.image
+        while True:
+            magic, _flags, kind, handle, offset, length = struct.unpack(">IHHQQI", self._recv(28))
+            if magic != NBD_REQUEST_MAGIC:
+                raise ValueError("bad request")
+            if kind == NBD_CMD_DISC:
+                return
+            error, data = 0, b""
+            if kind == NBD_CMD_WRITE:
+                self._recv(length)
+                error = errno.EPERM
+            elif kind == NBD_CMD_READ:
+                if length > MAX_REQUEST or offset + length > self.size:
+                    error = errno.EINVAL
+                else:
+                    try:
+                        data = image.read(offset, length).ljust(length, b"\0")
+                    except (OSError, RuntimeError, ValueError) as exc:
+                        logger.warning("nbd: reading %d bytes at %d: %s", length, offset, exc)
+                        error = errno.EIO
+            elif kind != NBD_CMD_FLUSH:
+                error = errno.EINVAL
+            sock.sendall(struct.pack(">IIQ", NBD_SIMPLE_REPLY_MAGIC, error, handle) + data)
+
+
+class _NBDServer(_Serving, socketserver.ThreadingTCPServer):
+    scheme = "nbd"
+    handler = _NBDHandler
+    allow_reuse_address = True
+
+
+class _NBDUnixServer(_Serving, socketserver.ThreadingUnixStreamServer):
+    scheme = "nbd"
+    handler = _NBDHandler
+
+    def server_close(self) -> None:
+        super().server_close()
+        try:
+            os.unlink(self.server_address)
+        except OSError:
+            pass
+
+
+def nbd_server(image: VirtualImage, address: Address = (DEFAULT_HOST, NBD_PORT)) -> _Serving:
+    """*image* as a read‑only NBD export at *address*: ``(host, port)`` or
+    the path of a Unix socket; see :func:`http_server`."""
+    if isinstance(address, str):
+        return _NBDUnixServer(image, address)
+    return _NBDServer(image, address)
@@ -0,0 +1,123 @@
+"""Where an image goes: a regular file or a stream.
+
+A **file** is written sparse: the data extents are preallocated up front
+with ``fallocate`` (one call per run of adjacent regions, so the file
+system can hand out contiguous space) and the zero padding between them
+– the empty sectors below ``SYSTEM.CNF``, the tail pad – is skipped with
+``lseek`` and left as holes.  Nothing reads differently; the image just
+costs fewer writes and less disk.
+
+A **stream** – ``-`` for stdout, or a pipe, FIFO or character device –
+is written strictly sequentially, zeros included, so the image can feed
+a compressor or a transfer tool without landing on disk.  Streams cannot
+be patched, verified or compressed to CSO/ZSO (those seek back).
+
+A **block device** (a USB stick at ``/dev/sdX``) is written like a
+stream: it cannot be truncated, so skipped zeros would leave its old
+bytes behind, and it is never removed after a failed build.  It must be
+at least as large as the image.
+"""
+
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import stat
+import sys
+from dataclasses import dataclass
+from typing import Iterable, Optional, Tuple
+
+logger = logging.getLogger("buildiso")
+
+STDOUT: str = "-"
+
+_libc: Optional[ctypes.CDLL] = None
+_fallocate = None
+
+
+def is_stream(output_path: str) -> bool:
+    """``True`` for stdout and for existing pipes, FIFOs, character and
+    block devices: everything written in full, in order."""
+    if output_path == STDOUT:
+        return True
+    try:
+        mode = os.stat(output_path).st_mode
+    except OSError:
+        return False
+    return stat.S_ISFIFO(mode) or stat.S_ISCHR(mode) or stat.S_ISBLK(mode)
+
+
+@dataclass
+class Sink:
+    fd: int
+    path: str
+    stream: bool
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+    def discard(self) -> None:
+        """Remove what a failed or cancelled build left behind."""
+        if not self.stream:
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+
+
+def open_sink(output_path: str, size: Optional[int] = None) -> Sink:
+    """Open *output_path* for a full image of *size* bytes; files are
+    truncated, a block device smaller than *size* raises ``ValueError``."""
+    if output_path == STDOUT:
+        sys.stdout.flush()
+        return Sink(os.dup(sys.stdout.fileno()), output_path, True)
+    if is_stream(output_path):
+        fd = os.open(output_path, os.O_WRONLY)
+        if size is not None and stat.S_ISBLK(os.fstat(fd).st_mode):
+            capacity = os.lseek(fd, 0, os.SEEK_END)
+            os.lseek(fd, 0, os.SEEK_SET)
+            if capacity < size:
+                os.close(fd)
+                raise ValueError(f"{output_path} holds {capacity} bytes, the image needs {size}")
+        return Sink(fd, output_path, True)
+    return Sink(os.open(output_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644), output_path, False)
+
+# --------------------------------------------------------------------------- #
+# Preallocation
+# --------------------------------------------------------------------------- #
+
+def _fallocate_fn():
+    """libc ``fallocate`` – unlike ``posix_fallocate`` it never falls back
+    to writing zeros on file systems without support."""
+    global _libc, _fallocate
+    if _libc is None and sys.platform.startswith("linux"):
+        try:
+            _libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+            fn = getattr(_libc, "fallocate64", None) or _libc.fallocate
+            fn.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_int64, ctypes.c_int64]
+            fn.restype = ctypes.c_int
+            _fallocate = fn
+        except (OSError, AttributeError):
+            _fallocate = None
+    return _fallocate
+
+
+def preallocate(fd: int, runs: Iterable[Tuple[int, int]]) -> int:
+    """Reserve the byte ranges ``(offset, length)`` of *runs* in the file
+    *fd*; returns the bytes reserved (``0`` where unsupported)."""
+    fn = _fallocate_fn()
+    if fn is None:
+        return 0
+    reserved = 0
+    for offset, length in runs:
+        if fn(fd, 0, offset, length) != 0:
+            err = ctypes.get_errno()
+            if err in (errno.EOPNOTSUPP, errno.ENOSYS, errno.EINVAL):
+                logger.debug("fallocate not supported here: %s", os.strerror(err))
+                return reserved
+            raise OSError(err, os.strerror(err))
+        reserved += length
+    return reserved
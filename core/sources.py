@@ -0,0 +1,215 @@
+"""File sources that are not simply a file on disk.
+
+A layout entry's source is normally the path of a whole file.  Two other
+kinds exist:
+
+* **byte ranges** of another file – ``offset``/``size`` entries of a
+  layout, and the files of an imported image (see :mod:`core.isoread`,
+  :class:`ImageFileSource`) – as :class:`ExtentSource`.  It is a string, so
+  layouts, stat snapshots and reports carry it unchanged, but the range
+  travels as attributes: the text ``<path>#<offset>+<size>`` is only
+  shown, never parsed, so a real file with such a name stays a file;
+* **virtual sources** (:class:`MemorySource`, :class:`GeneratedSource`):
+  content produced by the builder itself – ``SYSTEM.CNF``, padding files –
+  streamed into the image without ever touching the disk.
+
+The few places that open, read or ``stat`` a source resolve them here.
+"""
+
+from __future__ import annotations
+
+import errno
+import hashlib
+import os
+import stat
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Callable, Iterable, Iterator, NamedTuple, Optional, Tuple, Union
+
+_STAT_EXTRA = ("st_atime", "st_mtime", "st_ctime", "st_atime_ns", "st_mtime_ns", "st_ctime_ns",
+               "st_blksize", "st_blocks")
+
+
+class Extent(NamedTuple):
+    path: str
+    offset: int
+    size: int
+
+
+class ExtentSource(str):
+    """*size* bytes of the file *path* starting at *offset*.
+
+    Equal only to the same range of the same file, never to a plain path.
+    """
+
+    extent: Extent
+
+    def __new__(cls, path: str, offset: int, size: int) -> "ExtentSource":
+        self = super().__new__(cls, f"{path}#{offset}+{size}")
+        self.extent = Extent(path, offset, size)
+        return self
+
+    def __reduce__(self):
+        return type(self), tuple(self.extent)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, ExtentSource) and self.extent == other.extent
+
+    def __ne__(self, other: object) -> bool:
+        return not self == other
+
+    def __hash__(self) -> int:
+        return hash(self.extent)
+
+
+class ImageFileSource(ExtentSource):
+    """A file of an imported image (see :mod:`core.isoread`): its offset is
+    where the file sat in that image, which the planner tries to keep."""
+
+
+@dataclass(frozen=True, eq=False)
+class VirtualSource(ABC):
+    """Content that exists only inside the builder.
+
+    The name identifies the content: two sources with the same name and
+    size are the same source, also after a trip through ``pickle``.
+    Subclasses say how the content is produced (:meth:`chunks`).
+    """
+
+    name: str                      # shown in reports and recorded in manifests
+    size: int
+    mtime: float
+    shareable: bool                # may be stored once with identical files
+
+    @abstractmethod
+    def chunks(self) -> Iterator[bytes]:
+        """The content, in order; called afresh for every read."""
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, VirtualSource) and (self.name, self.size) == (other.name, other.size)
+
+    def __hash__(self) -> int:
+        return hash((self.name, self.size))
+
+    def __str__(self) -> str:
+        return self.name
+
+
+@dataclass(frozen=True, eq=False)
+class MemorySource(VirtualSource):
+    data: bytes = field(default=b"", repr=False)
+
+    def chunks(self) -> Iterator[bytes]:
+        yield self.data
+
+
+@dataclass(frozen=True, eq=False)
+class GeneratedSource(VirtualSource):
+    """*factory* yields the content afresh on every read; it must be a
+    module‑level callable (or a ``functools.partial`` of one) for the
+    source to reach the variant farm's worker processes."""
+
+    factory: Callable[[], Iterable[bytes]] = field(default=tuple, repr=False)
+
+    def chunks(self) -> Iterator[bytes]:
+        return iter(self.factory())
+
+
+Source = Union[str, VirtualSource]
+_ZEROS = bytes(1 << 20)
+
+
+def memory_source(name: str, data: bytes, mtime: Optional[float] = None) -> MemorySource:
+    """*data* as a source dated *mtime* (default: now).  Its digest is part
+    of the name, so a manifest tells a changed content from an unchanged
+    one without reading it."""
+    digest = hashlib.sha1(data).hexdigest()[:16]
+    return MemorySource(f"<memory:{name}:{digest}>", len(data),
+                        time.time() if mtime is None else mtime, True, data)
+
+
+def _zeros(size: int) -> Iterator[bytes]:
+    while size > 0:
+        yield _ZEROS[:min(size, len(_ZEROS))]
+        size -= len(_ZEROS)
+
+
+def padding_source(size: int, mtime: float = 0.0) -> GeneratedSource:
+    """*size* zero bytes, e.g. a dummy file pushing data outwards on the
+    disc; never shared with another file, which would defeat its purpose."""
+    return GeneratedSource(f"<zeros:{size}>", size, mtime, False, partial(_zeros, size))
+
+
+def is_virtual(source: Source) -> bool:
+    return isinstance(source, VirtualSource)
+
+
+def source_name(source: Source) -> str:
+    """*source* as text, for manifests and reports."""
+    return str(source)
+
+
+def extent_source(path: str, offset: int, size: int) -> ExtentSource:
+    """Source for *size* bytes of *path* starting at *offset*."""
+    return ExtentSource(path, offset, size)
+
+
+def image_file_source(image: str, offset: int, size: int) -> ImageFileSource:
+    """Source for the file at *offset* of the image *image*."""
+    return ImageFileSource(image, offset, size)
+
+
+def source_extent(source: Source) -> Optional[Extent]:
+    """The :class:`Extent` of an :class:`ExtentSource`, ``None`` for anything else."""
+    return source.extent if isinstance(source, ExtentSource) else None
+
+
+def backing_path(source: Source) -> Source:
+    """The file *source* is read from (a virtual source is its own)."""
+    extent = source_extent(source)
+    return source if extent is None else extent.path
+
+
+def extent_stat(source: Source, st: Optional[os.stat_result]) -> Optional[os.stat_result]:
+    """``stat`` of *source* given the ``stat`` *st* of its backing file.
+
+    Sizes become the extent's; an extent past the end of its file is
+    reported missing (``None``).
+    """
+    extent = source_extent(source)
+    if extent is None or st is None:
+        return st
+    if extent.offset + extent.size > st.st_size:
+        return None
+    fields = list(st[:10])
+    fields[6] = extent.size
+    return os.stat_result(fields, {k: getattr(st, k) for k in _STAT_EXTRA if hasattr(st, k)})
+
+
+def source_stat(source: Source) -> os.stat_result:
+    """``os.stat`` for any source; raises ``FileNotFoundError``."""
+    if isinstance(source, VirtualSource):
+        mtime_ns = int(source.mtime * 1e9)
+        return os.stat_result(
+            (stat.S_IFREG | 0o444, 0, 0, 1, 0, 0, source.size,
+             int(source.mtime), int(source.mtime), int(source.mtime)),
+            {"st_atime": source.mtime, "st_mtime": source.mtime, "st_ctime": source.mtime,
+             "st_atime_ns": mtime_ns, "st_mtime_ns": mtime_ns, "st_ctime_ns": mtime_ns},
+        )
+    st = extent_stat(source, os.stat(backing_path(source)))
+    if st is None:
+        raise FileNotFoundError(errno.ENOENT, "extent past the end of its file", source)
+    return st
+
+
+def open_source(source: str) -> Tuple[int, int]:
+    """``(fd, offset)``: a read‑only descriptor and where the data starts.
+
+    Not for virtual sources, which are read through their ``chunks()``.
+    """
+    extent = source_extent(source)
+    if extent is None:
+        return os.open(source, os.O_RDONLY), 0
+    return os.open(extent.path, os.O_RDONLY), extent.offset
@@ -0,0 +1,209 @@
+"""Shared ``stat`` cache for the info panel and pre‑build validation.
+
+On network storage every ``stat`` is a round trip, so results are kept
+per path and missing ones are fetched on a thread pool, many at a time.
+An entry stays valid
+
+* until inotify reports a change in its directory, when the directory
+  lives on a local file system and a watch could be added;
+* for at most *max_age* seconds otherwise (NFS, SMB… where inotify only
+  sees local changes, or when inotify is unavailable).
+
+Missing files are cached too, so validation failures are cheap to repeat.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import stat as stat_mod
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from core import inotify
+from core.sources import backing_path, extent_stat, is_virtual, source_stat
+
+logger = logging.getLogger("statcache")
+
+STAT_WORKERS: int = 32                 # round trips overlap; the CPU is idle
+STAT_CHUNK: int = 256                  # paths per task: keeps pool overhead off local disks
+MAX_AGE: float = 2.0
+NETWORK_FS = frozenset({
+    "nfs", "nfs4", "cifs", "smb3", "smbfs", "ncpfs", "afs", "9p", "ceph",
+    "glusterfs", "fuse.sshfs", "fuse.rclone", "davfs", "fuse.davfs2",
+})
+
+StatResult = Optional[os.stat_result]          # None: the path does not exist
+_Entry = Tuple[StatResult, float, bool]        # result, fetched at, trusted (watched)
+
+
+def _stat(path: str) -> StatResult:
+    try:
+        return os.stat(path)
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+
+
+def _stat_many(paths: List[str]) -> List[StatResult]:
+    return [_stat(p) for p in paths]
+
+
+def _network_mounts() -> List[Tuple[str, bool]]:
+    """``(mount point, is_network)``, longest mount point first."""
+    mounts: List[Tuple[str, bool]] = []
+    try:
+        with open("/proc/self/mounts", encoding="utf-8", errors="replace") as fh:
+            for line in fh:
+                fields = line.split()
+                if len(fields) >= 3:
+                    point = fields[1].replace("\\040", " ")
+                    mounts.append((point, fields[2] in NETWORK_FS))
+    except OSError:
+        pass
+    mounts.sort(key=lambda m: -len(m[0]))
+    return mounts
+
+
+class StatCache:
+    def __init__(self, watch: bool = True, max_age: float = MAX_AGE,
+                 workers: int = STAT_WORKERS) -> None:
+        self.max_age = max_age
+        self._workers = workers
+        self._lock = threading.Lock()
+        self._entries: Dict[str, _Entry] = {}
+        self._watched: Dict[str, bool] = {}            # dir → watch added?
+        self._mounts = _network_mounts()
+        self._inotify: Optional[inotify.Inotify] = None
+        if watch and inotify.available():
+            try:
+                self._inotify = inotify.Inotify()
+            except OSError as exc:
+                logger.info("inotify unavailable (%s); using a %.1f s expiry", exc, max_age)
+
+    # ------------------------------------------------------------------ #
+    # Queries
+    # ------------------------------------------------------------------ #
+    def stat(self, path: str, max_age: Optional[float] = None) -> os.stat_result:
+        """``os.stat`` through the cache; raises ``FileNotFoundError``."""
+        result = self.snapshot([path], max_age)[path]
+        if result is None:
+            raise FileNotFoundError(path)
+        return result
+
+    def is_file(self, path: str) -> bool:
+        result = self.snapshot([path])[path]
+        return result is not None and stat_mod.S_ISREG(result.st_mode)
+
+    def snapshot(self, paths: Iterable[str], max_age: Optional[float] = None) -> Dict[str, StatResult]:
+        """Results for *paths*, refreshing stale ones in parallel.
+
+        ``max_age=0`` forces a fresh ``stat`` of everything not covered by
+        an inotify watch – what a build wants before trusting sizes.
+        Extents of an image (see :mod:`core.sources`) share the entry of
+        the image; virtual sources are answered without touching the cache.
+        """
+        max_age = self.max_age if max_age is None else max_age
+        out: Dict[str, StatResult] = {}
+        stale: List[str] = []
+        extents: List[str] = []
+        # One refresh at a time: watches must exist before the stat they vouch
+        # for, and events raised while it runs must reach its results.
+        with self._lock:
+            self._drain()
+            now = time.monotonic()
+            for path in paths:
+                if is_virtual(path):
+                    out[path] = source_stat(path)
+                    continue
+                real = backing_path(path)
+                entry = self._entries.get(real)
+                if entry is not None and (entry[2] or now - entry[1] <= max_age):
+                    out[path] = entry[0] if real is path else extent_stat(path, entry[0])
+                elif real is path:
+                    stale.append(path)
+                else:
+                    extents.append(path)
+            if extents:
+                stale = list(dict.fromkeys(stale + [backing_path(p) for p in extents]))
+            if not stale:
+                return out
+
+            watched = {d: self._watch_dir(d) for d in {os.path.dirname(p) for p in stale}}
+            if len(stale) <= STAT_CHUNK:
+                results = _stat_many(stale)
+            else:
+                chunks = [stale[i:i + STAT_CHUNK] for i in range(0, len(stale), STAT_CHUNK)]
+                with ThreadPoolExecutor(self._workers, thread_name_prefix="stat") as pool:
+                    results = [r for chunk in pool.map(_stat_many, chunks) for r in chunk]
+
+            changed = self._drain()
+            now = time.monotonic()
+            for path, result in zip(stale, results):
+                trusted = watched[os.path.dirname(path)] and changed is not None and path not in changed
+                self._entries[path] = (result, now, trusted)
+                out[path] = result
+            for path in extents:
+                out[path] = extent_stat(path, self._entries[backing_path(path)][0])
+        return out
+
+    # ------------------------------------------------------------------ #
+    # Invalidation
+    # ------------------------------------------------------------------ #
+    def invalidate(self, path: Optional[str] = None) -> None:
+        """Forget *path*, or everything."""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(path, None)
+
+    def _watch_dir(self, directory: str) -> bool:
+        watched = self._watched.get(directory)
+        if watched is None:
+            watched = False
+            if self._inotify is not None and not self._is_network(directory):
+                try:
+                    self._inotify.add_watch(directory)
+                    watched = True
+                except OSError as exc:             # ENOSPC: out of watches, ENOENT…
+                    logger.debug("No watch on %s: %s", directory, exc)
+            self._watched[directory] = watched
+        return watched
+
+    def _is_network(self, directory: str) -> bool:
+        for point, network in self._mounts:
+            if directory == point or directory.startswith(point.rstrip("/") + "/"):
+                return network
+        return False
+
+    def _drain(self) -> Optional[Set[str]]:
+        """Apply pending events; returns the paths touched (``None``: all)."""
+        changed: Optional[Set[str]] = set()
+        if self._inotify is None:
+            return changed
+        for event in self._inotify.read():
+            if event.mask & inotify.IN_Q_OVERFLOW:
+                self._entries.clear()
+                changed = None
+            elif event.mask & (inotify.IN_IGNORED | inotify.IN_DELETE_SELF | inotify.IN_MOVE_SELF):
+                # the directory itself went away: drop its entries and watch state
+                prefix = event.path + "/"
+                for path in [p for p in self._entries if p.startswith(prefix)]:
+                    del self._entries[path]
+                self._watched.pop(event.path, None)
+            elif event.name:
+                path = os.path.join(event.path, event.name)
+                self._entries.pop(path, None)
+                if changed is not None:
+                    changed.add(path)
+        return changed
+
+    def close(self) -> None:
+        with self._lock:
+            if self._inotify is not None:
+                self._inotify.close()
+                self._inotify = None
+            self._entries.clear()
+            self._watched.clear()
@@ -0,0 +1,298 @@
+"""UDF 1.02 bridge structures (ECMA‑167 / OSTA UDF).
+
+The PS2 only reads the ISO‑9660 side of the disc, but the previous
+``genisoimage -udf`` builds always carried a UDF bridge so DVD players and
+loaders that prefer UDF keep working.  As in :mod:`core.iso9660`, every
+helper returns finished ``bytes`` and knows nothing about allocation.
+"""
+
+from __future__ import annotations
+
+import binascii
+import struct
+import time
+from typing import List, Tuple
+
+from core.iso9660 import SECTOR_SIZE
+
+# --------------------------------------------------------------------------- #
+# Constants
+# --------------------------------------------------------------------------- #
+
+VRS_LBAS: Tuple[int, int, int] = (18, 19, 20)   # BEA01, NSR02, TEA01
+MAIN_VDS_LBA: int = 32
+RESERVE_VDS_LBA: int = 48
+VDS_SECTORS: int = 16
+LVID_LBA: int = 64
+ANCHOR_LBA: int = 256
+PARTITION_START: int = ANCHOR_LBA + 1
+
+# An extent length must stay below 2^30; keep it sector aligned.
+MAX_EXTENT: int = 0x40000000 - SECTOR_SIZE
+
+FIRST_UNIQUE_ID: int = 16        # 0 is the root, 1‑15 are reserved
+
+FILE_TYPE_DIRECTORY: int = 4
+FILE_TYPE_REGULAR: int = 5
+
+FID_DIRECTORY: int = 0x02
+FID_PARENT: int = 0x08
+
+_TAG_FMT = "<HHBBHHHI"
+_UDF_REVISION = 0x0102
+_IMPL_ID = "*CDGenPS2"
+_PERMISSIONS = 0x14A5            # r‑x for owner, group and others
+
+_FE_FMT = "<16s20sIIIHBBIQQ12s12s12sI16s32sQII"
+FILE_ENTRY_SIZE = struct.calcsize(_FE_FMT)        # 176
+_FID_FMT = "<16sHBB16sH"
+_FID_BASE = struct.calcsize(_FID_FMT)             # 38
+
+# --------------------------------------------------------------------------- #
+# Primitive fields
+# --------------------------------------------------------------------------- #
+
+def _tag(ident: int, location: int, body: bytes) -> bytes:
+    """Prefix *body* with a descriptor tag carrying its checksum and CRC."""
+    crc = binascii.crc_hqx(body, 0)
+    head = bytearray(struct.pack(_TAG_FMT, ident, 2, 0, 0, 0, crc, len(body), location))
+    head[4] = (sum(head) - head[4]) & 0xFF
+    return bytes(head) + body
+
+
+def _sector(data: bytes) -> bytes:
+    return data.ljust(SECTOR_SIZE, b"\x00")
+
+
+def timestamp(ts: float) -> bytes:
+    """ECMA‑167 1/7.3 timestamp, recorded in UTC."""
+    t = time.gmtime(ts)
+    return struct.pack(
+        "<HHBBBBBBBB",
+        0x1000,                 # type 1 (local time), offset 0 minutes
+        t.tm_year, t.tm_mon, t.tm_mday, t.tm_hour, t.tm_min, t.tm_sec,
+        0, 0, 0,
+    )
+
+
+def _entity_id(ident: str, suffix: bytes = b"") -> bytes:
+    return b"\x00" + ident.encode("ascii").ljust(23, b"\x00") + suffix.ljust(8, b"\x00")
+
+
+def _udf_suffix() -> bytes:
+    return struct.pack("<H", _UDF_REVISION)
+
+
+def _charspec() -> bytes:
+    return b"\x00" + b"OSTA Compressed Unicode".ljust(63, b"\x00")
+
+
+def _dstring(text: str, length: int) -> bytes:
+    """Fixed‑length d‑string: compression id, characters, used length."""
+    if not text:
+        return b"\x00" * length
+    raw = b"\x08" + text.encode("latin-1")[: length - 2]
+    return raw.ljust(length - 1, b"\x00") + bytes((len(raw),))
+
+
+def _extent_ad(length: int, location: int) -> bytes:
+    return struct.pack("<II", length, location)
+
+
+def long_ad(length: int, lbn: int, unique_id: int = 0) -> bytes:
+    """Long allocation descriptor into partition 0 (UDF 2.3.10.1 impl use)."""
+    return struct.pack("<IIH", length, lbn, 0) + struct.pack("<HI", 0, unique_id & 0xFFFFFFFF)
+
+
+def short_ads(extents: List[Tuple[int, int]]) -> bytes:
+    """Short allocation descriptors for ``(lbn, length)`` extents."""
+    return b"".join(struct.pack("<II", length, lbn) for lbn, length in extents)
+
+
+def split_extent(lbn: int, size: int) -> List[Tuple[int, int]]:
+    """Split a contiguous run into extents below the UDF 1 GiB limit."""
+    out = []
+    while size > MAX_EXTENT:
+        out.append((lbn, MAX_EXTENT))
+        lbn += MAX_EXTENT // SECTOR_SIZE
+        size -= MAX_EXTENT
+    out.append((lbn, size))
+    return out
+
+# --------------------------------------------------------------------------- #
+# Volume recognition and volume descriptor sequence
+# --------------------------------------------------------------------------- #
+
+def volume_recognition(ident: bytes) -> bytes:
+    """``BEA01`` / ``NSR02`` / ``TEA01`` structure (ECMA‑167 2/9.1)."""
+    return _sector(b"\x00" + ident + b"\x01")
+
+
+def anchor(location: int) -> bytes:
+    body = (
+        _extent_ad(VDS_SECTORS * SECTOR_SIZE, MAIN_VDS_LBA)
+        + _extent_ad(VDS_SECTORS * SECTOR_SIZE, RESERVE_VDS_LBA)
+    ).ljust(496, b"\x00")
+    return _sector(_tag(2, location, body))
+
+
+def volume_descriptor_sequence(
+    start: int, volume_id: str, partition_sectors: int, ts: float
+) -> List[bytes]:
+    """Return the six sectors of a (main or reserve) volume descriptor set."""
+    pvd = b"".join((
+        struct.pack("<II", 0, 0),                    # VDS number, PVD number
+        _dstring(volume_id, 32),
+        struct.pack("<HHHHII", 1, 1, 2, 2, 1, 1),   # seq, max seq, levels, charsets
+        _dstring(volume_id, 128),                    # volume set identifier
+        _charspec(),
+        _charspec(),
+        _extent_ad(0, 0),
+        _extent_ad(0, 0),
+        _entity_id(""),                              # application identifier
+        timestamp(ts),
+        _entity_id(_IMPL_ID),
+        b"\x00" * 64,
+        struct.pack("<IH", 0, 0),                    # predecessor, flags
+        b"\x00" * 22,
+    ))
+    iuvd = b"".join((
+        struct.pack("<I", 1),
+        _entity_id("*UDF LV Info", _udf_suffix()),
+        _charspec(),
+        _dstring(volume_id, 128),
+        b"\x00" * 36 * 3,
+        _entity_id(_IMPL_ID),
+        b"\x00" * 128,
+    ))
+    pd = b"".join((
+        struct.pack("<IHH", 2, 1, 0),                # VDS number, allocated, number 0
+        _entity_id("+NSR02"),
+        b"\x00" * 128,
+        struct.pack("<III", 1, PARTITION_START, partition_sectors),  # read‑only
+        _entity_id(_IMPL_ID),
+        b"\x00" * 128,
+        b"\x00" * 156,
+    ))
+    lvd = b"".join((
+        struct.pack("<I", 3),
+        _charspec(),
+        _dstring(volume_id, 128),
+        struct.pack("<I", SECTOR_SIZE),
+        _entity_id("*OSTA UDF Compliant", _udf_suffix()),
+        long_ad(SECTOR_SIZE, 0),                     # file set descriptor at lbn 0
+        struct.pack("<II", 6, 1),                    # map table length, one map
+        _entity_id(_IMPL_ID),
+        b"\x00" * 128,
+        _extent_ad(2 * SECTOR_SIZE, LVID_LBA),
+        struct.pack("<BBHH", 1, 6, 1, 0),            # type 1 partition map
+    ))
+    usd = struct.pack("<II", 4, 0)
+    return [
+        _sector(_tag(1, start, pvd)),
+        _sector(_tag(4, start + 1, iuvd)),
+        _sector(_tag(5, start + 2, pd)),
+        _sector(_tag(6, start + 3, lvd)),
+        _sector(_tag(7, start + 4, usd)),
+        terminating(start + 5),
+    ]
+
+
+def terminating(location: int) -> bytes:
+    return _sector(_tag(8, location, b"\x00" * 496))
+
+
+def integrity(
+    next_unique_id: int, files: int, dirs: int, partition_sectors: int, ts: float
+) -> bytes:
+    """Closed Logical Volume Integrity Descriptor."""
+    impl_use = _entity_id(_IMPL_ID) + struct.pack(
+        "<IIHHH", files, dirs, _UDF_REVISION, _UDF_REVISION, _UDF_REVISION
+    )
+    body = b"".join((
+        timestamp(ts),
+        struct.pack("<I", 1),                        # close integrity
+        _extent_ad(0, 0),
+        struct.pack("<Q", next_unique_id).ljust(32, b"\x00"),
+        struct.pack("<II", 1, len(impl_use)),
+        struct.pack("<II", 0, partition_sectors),    # free space, size
+        impl_use,
+    ))
+    return _sector(_tag(9, LVID_LBA, body))
+
+# --------------------------------------------------------------------------- #
+# File structure (partition relative)
+# --------------------------------------------------------------------------- #
+
+def file_set(root_lbn: int, volume_id: str, ts: float) -> bytes:
+    body = b"".join((
+        timestamp(ts),
+        struct.pack("<HHIIII", 3, 3, 1, 1, 0, 0),
+        _charspec(),
+        _dstring(volume_id, 128),
+        _charspec(),
+        _dstring(volume_id, 32),
+        b"\x00" * 64,                                # copyright + abstract file ids
+        long_ad(SECTOR_SIZE, root_lbn),
+        _entity_id("*OSTA UDF Compliant", _udf_suffix()),
+        long_ad(0, 0),                               # next extent
+        b"\x00" * 48,
+    ))
+    return _sector(_tag(256, 0, body))
+
+
+def file_entry(
+    lbn: int,
+    *,
+    file_type: int,
+    size: int,
+    extents: List[Tuple[int, int]],
+    links: int,
+    unique_id: int,
+    ts: float,
+) -> bytes:
+    """File Entry (ECMA‑167 4/14.9) with short allocation descriptors."""
+    ads = short_ads(extents)
+    if FILE_ENTRY_SIZE + len(ads) > SECTOR_SIZE:
+        raise ValueError("Too many UDF extents for a single file entry")
+
+    stamp = timestamp(ts)
+    icb_tag = struct.pack("<IHHHBBIHH", 0, 4, 0, 1, 0, file_type, 0, 0, 0)
+    recorded = sum((length + SECTOR_SIZE - 1) // SECTOR_SIZE for _lbn, length in extents)
+    body = struct.pack(
+        _FE_FMT[:1] + _FE_FMT[4:],
+        icb_tag,
+        0xFFFFFFFF, 0xFFFFFFFF, _PERMISSIONS,
+        links, 0, 0, 0,
+        size, recorded,
+        stamp, stamp, stamp,
+        1,                                           # checkpoint
+        long_ad(0, 0),                               # extended attribute ICB
+        _entity_id(_IMPL_ID),
+        unique_id,
+        0, len(ads),
+    ) + ads
+    return _sector(_tag(261, lbn, body))
+
+
+def fid_length(name: str) -> int:
+    """Bytes used by a File Identifier Descriptor for *name* (4‑byte aligned)."""
+    length = _FID_BASE + (1 + len(name) if name else 0)
+    return (length + 3) & ~3
+
+
+def file_identifier(
+    location: int, name: str, characteristics: int, icb_lbn: int, unique_id: int
+) -> bytes:
+    """File Identifier Descriptor; *name* ``""`` marks the parent entry."""
+    ident = (b"\x08" + name.encode("latin-1")) if name else b""
+    body = struct.pack(
+        _FID_FMT[:1] + _FID_FMT[4:],
+        1,
+        characteristics,
+        len(ident),
+        long_ad(SECTOR_SIZE, icb_lbn, unique_id),
+        0,
+    ) + ident
+    body = body.ljust(fid_length(name) - 16, b"\x00")
+    return _tag(257, location, body)
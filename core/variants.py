@@ -0,0 +1,226 @@
+"""Variant build farm: several images from one scan.
+
+The same content often ships in several boot configurations – NTSC and
+PAL ``SYSTEM.CNF``, a debug ELF, an alternate loader, a few overlay
+files.  :func:`build_variants` scans, stats and hashes the union of all
+their sources once, then builds every variant on a process pool, each
+worker only planning and writing its own image.  N variants cost about
+one validation and dedup pass plus N times the output I/O.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import signal
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from core import compress
+from core.build import run_build
+from core.cnf import with_boot_cnf
+from core.compress import format_for, pool_context
+from core.dedup import content_digests
+from core.layout import LayoutHints
+from core.layoutfile import Layout, Variant
+from core.progress import BuildCancelled, BuildProgress, report_path, write_report
+from core.sinks import is_stream
+from core.statcache import StatCache
+
+logger = logging.getLogger("buildiso")
+
+FARM_WORKERS: int = os.cpu_count() or 1
+
+Files = List[Tuple[str, str, Optional[int]]]
+
+
+@dataclass
+class VariantResult:
+    name: str
+    output: str
+    status: str                    # ok / failed / cancelled
+    error: Optional[str] = None
+    seconds: float = 0.0
+    sectors: int = 0
+    written: int = 0
+    shared_bytes: int = 0
+
+# --------------------------------------------------------------------------- #
+# Variant layouts
+# --------------------------------------------------------------------------- #
+
+def variant_output(output_path: str, variant: Variant) -> str:
+    """Image path of *variant*: its own ``output`` next to *output_path*,
+    else ``<stem>_<name><ext>``."""
+    if variant.output:
+        return os.path.join(os.path.dirname(os.path.abspath(output_path)), variant.output)
+    stem, ext = os.path.splitext(output_path)
+    return f"{stem}_{variant.name}{ext or '.iso'}"
+
+
+def variant_files(layout: Layout, variant: Variant) -> Files:
+    """The base layout with *variant*'s removals, overlays and SYSTEM.CNF."""
+    overlay = {f[0] for f in variant.files}
+    removed = tuple(variant.remove)
+    prefixes = tuple(r + "/" for r in removed)
+    files = [f for f in layout.files
+             if f[0] not in overlay and f[0] not in removed and not f[0].startswith(prefixes)]
+    files += variant.files
+
+    boot_elf = variant.boot_elf or layout.boot_elf
+    if boot_elf:
+        files = with_boot_cnf(files, boot_elf, variant.cnf)
+    elif variant.cnf:
+        raise ValueError(f"Variant {variant.name} sets SYSTEM.CNF fields without a boot_elf")
+    return files
+
+
+def _union(file_lists: Sequence[Files]) -> Files:
+    """One entry per source – two when a variant lists it twice, so that
+    :func:`content_digests` still sees it as a duplicate of itself."""
+    listed: Dict[str, int] = {}
+    for files in file_lists:
+        for source, n in Counter(f[1] for f in files).items():
+            listed[source] = max(listed.get(source, 0), min(n, 2))
+    return [("", source, None) for source, n in listed.items() for _ in range(n)]
+
+# --------------------------------------------------------------------------- #
+# Pool side
+# --------------------------------------------------------------------------- #
+
+_shared: Dict[str, Any] = {}
+
+
+def _init_worker(cancel, stats: Mapping[str, Any], content: Optional[Mapping[str, str]],
+                 hints: Optional[LayoutHints], jobs: int) -> None:
+    signal.signal(signal.SIGINT, signal.SIG_IGN)         # the parent cancels through *cancel*
+    # CSO/ZSO variants share the cores instead of each starting a full pool
+    compress.COMPRESS_WORKERS = max(1, compress.COMPRESS_WORKERS // jobs)
+    _shared.update(cancel=cancel, stats=stats, content=content, hints=hints)
+
+
+def _build_one(name: str, output: str, files: Files, volume_id: str, incremental: bool,
+               dedup: bool, compression: Optional[str], report: bool, verify: bool,
+               checksums: bool, max_sectors: Optional[int]) -> VariantResult:
+    progress = BuildProgress(cancel=_shared["cancel"])
+    start = time.perf_counter()
+    result = VariantResult(name, output, "failed")
+    try:
+        plan, written = run_build(
+            output, files, volume_id, _shared["hints"], incremental, progress,
+            report_path(output) if report else None, dedup=dedup, compression=compression,
+            stats=_shared["stats"], content=_shared["content"], verify=verify,
+            checksums=checksums, max_sectors=max_sectors,
+        )
+        result.status, result.sectors, result.written = "ok", plan.total_sectors, written
+        result.shared_bytes = plan.shared_bytes
+    except BuildCancelled:
+        result.status = "cancelled"
+    except Exception as exc:
+        result.error = str(exc)
+    result.seconds = round(time.perf_counter() - start, 6)
+    return result
+
+# --------------------------------------------------------------------------- #
+# Public entry‑point
+# --------------------------------------------------------------------------- #
+
+def build_variants(
+    layout: Layout,
+    output_path: str,
+    names: Optional[Sequence[str]] = None,
+    workers: int = FARM_WORKERS,
+    incremental: bool = False,
+    dedup: bool = True,
+    compression: Optional[str] = None,
+    progress: Optional[BuildProgress] = None,
+    report: Optional[str] = None,
+    on_result: Optional[Callable[[VariantResult], None]] = None,
+    verify: bool = False,
+    checksums: bool = False,
+    max_sectors: Optional[int] = None,
+) -> List[VariantResult]:
+    """Build the variants of *layout* (all, or those in *names*).
+
+    Outputs follow :func:`variant_output`; each image is CSO/ZSO by its
+    extension unless *compression* is given.  A failed variant does not
+    stop the others.  With *report*, every image gets its own build report
+    and *report* receives a summary with the shared phases.  *on_result*
+    is called as each variant finishes.  *verify* checks every raw image
+    once it is written (see :mod:`core.verify`); *checksums* gives every
+    image its checksum sidecar (see :mod:`core.checksums`); a variant
+    larger than *max_sectors* fails before it is written.
+    """
+    variants = layout.variants
+    if names:
+        unknown = set(names) - {v.name for v in variants}
+        if unknown:
+            raise ValueError(f"Unknown variant(s): {', '.join(sorted(unknown))}")
+        variants = [v for v in variants if v.name in names]
+    if not variants:
+        raise ValueError("The layout defines no variants")
+    if is_stream(output_path):
+        raise ValueError("Variants are written next to the output image – it cannot be a stream")
+
+    progress = progress or BuildProgress()
+    started = time.time()
+    results: List[VariantResult] = []
+    status = "failed"
+    try:
+        file_lists = [variant_files(layout, v) for v in variants]
+        shared = _union(file_lists)
+        with progress.phase("validation"):
+            cache = StatCache(watch=False)
+            try:
+                stats = cache.snapshot([f[1] for f in shared], max_age=0.0)
+            finally:
+                cache.close()
+        content = None
+        if dedup:
+            with progress.phase("dedup"):
+                content = content_digests(shared, stats, progress=progress)
+
+        ctx = pool_context()
+        cancel = ctx.Event()
+        jobs = max(1, min(workers, len(variants)))
+        with progress.phase("variants"), ProcessPoolExecutor(
+            jobs, mp_context=ctx, initializer=_init_worker,
+            initargs=(cancel, stats, content, layout.hints, jobs),
+        ) as pool:
+            pending: Dict[Future, Variant] = {}
+            for variant, files in zip(variants, file_lists):
+                output = variant_output(output_path, variant)
+                future = pool.submit(
+                    _build_one, variant.name, output, files,
+                    variant.volume_id or layout.volume_id, incremental, dedup,
+                    compression or format_for(output), report is not None, verify, checksums,
+                    max_sectors,
+                )
+                pending[future] = variant
+            while pending:
+                done, _ = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+                if progress.cancel.is_set():
+                    cancel.set()
+                for future in done:
+                    del pending[future]
+                    result = future.result()
+                    logger.info("Variant %s: %s in %.2f s", result.name, result.status, result.seconds)
+                    results.append(result)
+                    if on_result is not None:
+                        on_result(result)
+        progress.check()
+        status = "ok" if all(r.status == "ok" for r in results) else "failed"
+    except BuildCancelled:
+        status = "cancelled"
+        raise
+    finally:
+        if report:
+            write_report(report, progress.report(
+                status=status,
+                started=time.strftime("%Y-%m-%dT%H:%M:%S%z", time.localtime(started)),
+                variants=[asdict(r) for r in results],
+            ))
+    return results
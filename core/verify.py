@@ -0,0 +1,217 @@
+"""Post‑build verification of a raw image, straight from a memory map.
+
+:func:`verify_image` maps the image read‑only and walks it the way the
+PS2 ROM and loaders do, without copying sectors into Python objects:
+
+* the primary volume descriptor, the UDF anchor and every ISO‑9660
+  directory record (both‑endian fields must agree, extents must lie
+  inside the volume, directory loops are refused);
+* ``SYSTEM.CNF`` at its pinned LBA, with a ``BOOT2=`` line naming an ELF that
+  exists on the disc and starts with the ELF magic;
+* with the layout at hand, every file's size, pinned LBA and contents –
+  the extent and the source are SHA‑1 hashed side by side on a thread
+  pool (hashlib releases the GIL, so this scales with the cores).
+
+Problems are collected rather than raised: one run lists everything that
+would make the disc fail on hardware.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import mmap
+import os
+import re
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from core import udf
+from core.cnf import CNF_NAME
+from core.dedup import HASH_CHUNK, HASH_WORKERS, sha1_file
+from core.iso9660 import PVD_LBA, SECTOR_SIZE
+from core.isoread import Entry, iso_name, read_tree, volume_root
+from core.progress import BuildProgress
+from core.sources import source_stat
+
+logger = logging.getLogger("verify")
+
+MAX_ISSUES: int = 50                    # shown in error messages
+_BOOT2 = re.compile(r"^\s*BOOT2\s*=\s*cdrom0?:\\?(.+?)\s*$", re.IGNORECASE | re.MULTILINE)
+
+
+@dataclass
+class VerifyResult:
+    image: str
+    errors: List[str] = field(default_factory=list)
+    warnings: List[str] = field(default_factory=list)
+    entries: int = 0
+    files_compared: int = 0
+    bytes_hashed: int = 0
+    seconds: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def summary(self) -> str:
+        if self.ok:
+            return f"{self.image}: OK ({self.entries} entries, {self.files_compared} files compared)"
+        lines = self.errors[:MAX_ISSUES]
+        more = len(self.errors) - len(lines)
+        return "\n".join([f"{self.image}: {len(self.errors)} problem(s)"] + lines
+                         + ([f"… and {more} more"] if more > 0 else []))
+
+# --------------------------------------------------------------------------- #
+# Boot chain
+# --------------------------------------------------------------------------- #
+
+def _check_boot(view: memoryview, entries: Dict[str, Entry], cnf_lba: Optional[int],
+                result: VerifyResult) -> None:
+    entry = entries.get(CNF_NAME) or entries.get(CNF_NAME.lower())
+    if entry is None:
+        result.warnings.append(f"No {CNF_NAME}: the disc will not boot")
+        return
+    lba, size, is_dir = entry
+    if is_dir:
+        result.errors.append(f"{CNF_NAME} is a directory")
+        return
+    if cnf_lba is not None and lba != cnf_lba:
+        result.errors.append(f"{CNF_NAME} is at LBA {lba}, expected {cnf_lba}")
+    text = bytes(view[lba * SECTOR_SIZE:lba * SECTOR_SIZE + size]).decode("ascii", "replace")
+    match = _BOOT2.search(text)
+    if match is None:
+        result.errors.append(f"{CNF_NAME} has no BOOT2= line")
+        return
+    target = iso_name(match.group(1).replace("\\", "/").lstrip("/").encode("ascii", "replace"))
+    elf = entries.get(target)
+    if elf is None:                                  # the ROM is case‑insensitive
+        elf = next((e for p, e in entries.items() if p.upper() == target.upper()), None)
+    if elf is None or elf[2]:
+        result.errors.append(f"BOOT2 points at {match.group(1)}, which is not a file on the disc")
+    elif elf[1] < 4 or bytes(view[elf[0] * SECTOR_SIZE:elf[0] * SECTOR_SIZE + 4]) != b"\x7fELF":
+        result.errors.append(f"BOOT2 target {target} is not an ELF executable")
+
+# --------------------------------------------------------------------------- #
+# Contents
+# --------------------------------------------------------------------------- #
+
+def _extent_sha1(view: memoryview, lba: int, size: int) -> str:
+    digest = hashlib.sha1()
+    start = lba * SECTOR_SIZE
+    for offset in range(start, start + size, HASH_CHUNK):
+        digest.update(view[offset:min(offset + HASH_CHUNK, start + size)])
+    return digest.hexdigest()
+
+
+def _compare(view: memoryview, files: Sequence[Tuple[str, str, Optional[int]]],
+             entries: Dict[str, Entry], workers: int, progress: Optional[BuildProgress],
+             result: VerifyResult) -> None:
+    extents: Dict[Tuple[int, int], List[Tuple[str, str]]] = {}
+    for iso_path, source, lba in files:
+        entry = entries.get(iso_path)
+        if entry is None or entry[2]:
+            result.errors.append(f"{iso_path} is missing from the image")
+            continue
+        try:
+            size = source_stat(source).st_size
+        except OSError as exc:
+            result.errors.append(f"{iso_path}: cannot read source ({exc})")
+            continue
+        if entry[1] != size:
+            result.errors.append(f"{iso_path}: {entry[1]} bytes on disc, source has {size}")
+            continue
+        if lba is not None and entry[0] != lba:
+            result.errors.append(f"{iso_path} is at LBA {entry[0]}, pinned at {lba}")
+        if size:
+            extents.setdefault((entry[0], size), []).append((iso_path, source))
+
+    cancel = progress.cancel if progress is not None else None
+    with ThreadPoolExecutor(workers, thread_name_prefix="verify") as pool:
+        jobs = {}
+        for (lba, size), owners in extents.items():
+            jobs[pool.submit(_extent_sha1, view, lba, size)] = (lba, size, None)
+            for iso_path, source in owners:
+                jobs[pool.submit(sha1_file, source, cancel)] = (lba, size, iso_path)
+        extent_digests: Dict[Tuple[int, int], str] = {}
+        source_digests: List[Tuple[Tuple[int, int], str, str]] = []
+        for future in as_completed(jobs):
+            lba, size, iso_path = jobs[future]
+            if iso_path is None:
+                extent_digests[(lba, size)] = future.result()
+            else:
+                try:
+                    source_digests.append(((lba, size), iso_path, future.result()))
+                except OSError as exc:
+                    result.errors.append(f"{iso_path}: cannot read source ({exc})")
+            result.bytes_hashed += size
+            if progress is not None:
+                progress.check()
+                progress.count(size)
+
+    for extent, iso_path, digest in source_digests:
+        result.files_compared += 1
+        if extent_digests[extent] != digest:
+            result.errors.append(f"{iso_path}: contents differ from the source")
+
+# --------------------------------------------------------------------------- #
+# Public entry‑point
+# --------------------------------------------------------------------------- #
+
+def verify_image(
+    image_path: str,
+    files: Optional[Sequence[Tuple[str, str, Optional[int]]]] = None,
+    workers: int = HASH_WORKERS,
+    progress: Optional[BuildProgress] = None,
+) -> VerifyResult:
+    """Check the raw image at *image_path*; see the module docstring.
+
+    *files* is the layout the image was built from (``(iso_rel,
+    abs_path, lba)``); without it only the disc structure and the boot
+    chain are checked, and ``SYSTEM.CNF`` may sit anywhere – images made
+    by other tools do not use :data:`~core.cnf.CNF_LBA`.
+    """
+    result = VerifyResult(image_path)
+    cnf_lba = next((lba for iso_path, _src, lba in files or () if iso_path.upper() == CNF_NAME), None)
+    start = time.perf_counter()
+    with open(image_path, "rb") as fh:
+        image_size = os.fstat(fh.fileno()).st_size
+        if image_size < (PVD_LBA + 2) * SECTOR_SIZE:
+            result.errors.append("Too small to hold an ISO‑9660 volume")
+            return result
+        with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            view = memoryview(mm)
+            try:
+                _verify(view, image_size, files, cnf_lba, workers, progress, result)
+            finally:
+                view.release()
+    result.seconds = round(time.perf_counter() - start, 6)
+    logger.info("Verified %s in %.2f s: %d error(s), %d warning(s)",
+                image_path, result.seconds, len(result.errors), len(result.warnings))
+    return result
+
+
+def _verify(view: memoryview, image_size: int, files, cnf_lba: Optional[int], workers: int,
+            progress: Optional[BuildProgress], result: VerifyResult) -> None:
+    try:
+        volume_sectors, root_lba, root_size = volume_root(view)
+    except ValueError as exc:
+        result.errors.append(str(exc))
+        return
+    if volume_sectors * SECTOR_SIZE > image_size:
+        result.errors.append(f"Image is truncated: {image_size} bytes, volume needs "
+                             f"{volume_sectors * SECTOR_SIZE}")
+        volume_sectors = image_size // SECTOR_SIZE
+
+    anchor = udf.ANCHOR_LBA * SECTOR_SIZE
+    if image_size < anchor + SECTOR_SIZE or struct.unpack_from("<H", view, anchor)[0] != 2:
+        result.warnings.append(f"No UDF anchor at LBA {udf.ANCHOR_LBA}")
+
+    entries = read_tree(view, volume_sectors, (root_lba, root_size), result.errors)
+    result.entries = len(entries) - 1
+    _check_boot(view, entries, cnf_lba, result)
+    if files is not None:
+        _compare(view, files, entries, workers, progress, result)
@@ -0,0 +1,252 @@
+"""Watch mode: notice when the sources of a layout change, and what changed.
+
+:class:`SourceWatcher` subscribes through inotify to the directories that
+hold the sources of a layout – and, for its folders, to every directory
+below the folder, empty ones included, so new files are noticed too.  A
+folder is walked once, when it first appears; directories created later
+are subscribed to as their event arrives.  A burst of events (a compiler
+rewriting an ELF, ``cp -r`` into a data folder) is debounced:
+:meth:`SourceWatcher.wait` returns once nothing happened for *settle*
+seconds.  The result is a :class:`Changes` diff
+that :func:`apply_changes` folds into the file list, so a rebuild never
+rescans the folders.
+
+Without inotify (other platforms, network mounts the kernel cannot watch)
+the watcher polls the ``stat`` of the known sources instead; new files in
+folders then go unnoticed until the layout is loaded again.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import select
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from core import inotify
+from core.paths import iso_rel_path
+from core.sources import Source, backing_path, is_virtual
+
+logger = logging.getLogger("watch")
+
+DEBOUNCE_SECONDS: float = 0.3
+MAX_DELAY_SECONDS: float = 5.0        # a steady trickle of events still gets its build
+POLL_SECONDS: float = 1.0
+
+Entry = Tuple[str, Source, Optional[int]]
+
+
+@dataclass
+class Changes:
+    modified: Set[str] = field(default_factory=set)
+    created: Set[str] = field(default_factory=set)
+    deleted: Set[str] = field(default_factory=set)
+    rescan: bool = False              # events were lost: reload the layout
+
+    def __bool__(self) -> bool:
+        return bool(self.modified or self.created or self.deleted or self.rescan)
+
+    def summary(self) -> str:
+        parts = [f"{len(s)} {name}" for name, s in
+                 (("modified", self.modified), ("new", self.created), ("deleted", self.deleted)) if s]
+        return ", ".join(parts) or ("events lost" if self.rescan else "no change")
+
+
+def _under(path: str, roots: Sequence[str]) -> bool:
+    return any(path.startswith(root) for root in roots)
+
+
+class SourceWatcher:
+    """Collects changes to the sources of one layout (see the module doc).
+
+    *ignore* lists path prefixes never reported – the image being built
+    and its side files, when they live inside a watched folder.
+    """
+
+    def __init__(self, ignore: Iterable[str] = ()) -> None:
+        self._inotify: Optional[inotify.Inotify] = None
+        if inotify.available():
+            try:
+                self._inotify = inotify.Inotify()
+            except OSError as exc:
+                logger.info("inotify unavailable (%s); polling every %.1f s", exc, POLL_SECONDS)
+        self._ignore = tuple(ignore)
+        self._wds: Dict[str, int] = {}                        # directory → watch descriptor
+        self._known: Set[str] = set()
+        self._extra: Set[str] = set()
+        self._roots: Tuple[str, ...] = ()                     # folder roots, with a trailing "/"
+        self._touched: Set[str] = set()
+        self._lost = False
+        self._mtimes: Dict[str, Optional[int]] = {}           # polling only
+
+    @property
+    def polling(self) -> bool:
+        return self._inotify is None
+
+    def fileno(self) -> Optional[int]:
+        """Descriptor that turns readable on events, ``None`` when polling."""
+        return None if self._inotify is None else self._inotify.fileno()
+
+    # ------------------------------------------------------------------ #
+    # Subscriptions
+    # ------------------------------------------------------------------ #
+    def watch(self, sources: Iterable[Source], folders: Iterable[str] = (),
+              extra: Iterable[str] = ()) -> None:
+        """Follow *sources* (layout sources; virtual ones are skipped), new
+        files below the *folders* and the plain files *extra* (the layout
+        file itself).  Calling it again replaces the previous set."""
+        self._known = {backing_path(s) for s in sources if not is_virtual(s)}
+        self._extra = set(extra)
+        walked, self._roots = self._roots, tuple(os.path.join(root, "") for root in folders)
+
+        dirs = {os.path.dirname(p) for p in self._known | self._extra}
+        if self._inotify is None:
+            self._mtimes = {p: self._mtimes.get(p, _mtime(p)) for p in self._known | self._extra}
+            return
+        # Directories below a folder seen before stay watched: later ones came
+        # in through _new_directory, deleted ones left through IN_IGNORED
+        kept = tuple(set(walked) & set(self._roots))
+        dirs.update(d for d in self._wds if _under(os.path.join(d, ""), kept))
+        for root in set(self._roots) - set(walked):   # every directory of a new folder, empty ones too
+            for directory, subdirs, _names in os.walk(root):
+                directory = directory.rstrip(os.sep) or os.sep
+                if self._ignore and os.path.join(directory, "").startswith(self._ignore):
+                    subdirs.clear()
+                    continue
+                dirs.add(directory)
+        for directory in set(self._wds) - dirs:
+            self._inotify.rm_watch(self._wds.pop(directory))
+        for directory in dirs - set(self._wds):
+            self._add_watch(directory)
+        logger.debug("Watching %d directories for %d sources", len(self._wds), len(self._known))
+
+    def _add_watch(self, directory: str) -> None:
+        try:
+            self._wds[directory] = self._inotify.add_watch(directory)
+        except OSError as exc:                     # ENOSPC: out of watches, ENOENT…
+            logger.warning("Cannot watch %s: %s", directory, exc)
+
+    def _interesting(self, path: str) -> bool:
+        if self._ignore and path.startswith(self._ignore):
+            return False
+        return path in self._known or path in self._extra or _under(path, self._roots)
+
+    # ------------------------------------------------------------------ #
+    # Events
+    # ------------------------------------------------------------------ #
+    def drain(self) -> bool:
+        """Collect pending events; ``True`` when one concerned the layout."""
+        found = False
+        if self._inotify is None:
+            for path, old in self._mtimes.items():
+                now = _mtime(path)
+                if now != old:
+                    self._mtimes[path] = now
+                    self._touched.add(path)
+                    found = True
+            return found
+
+        for event in self._inotify.read():
+            if event.mask & inotify.IN_Q_OVERFLOW:
+                self._lost = found = True
+                continue
+            if event.mask & inotify.IN_IGNORED:
+                if self._wds.get(event.path) == event.wd:
+                    del self._wds[event.path]
+                continue
+            if not event.name:
+                continue
+            path = os.path.join(event.path, event.name)
+            if not self._interesting(path):
+                continue
+            found = True
+            self._touched.add(path)
+            if event.mask & inotify.IN_ISDIR and event.mask & (inotify.IN_CREATE | inotify.IN_MOVED_TO):
+                self._new_directory(path)
+        return found
+
+    def _new_directory(self, path: str) -> None:
+        """Watch a directory created in a folder, and report what it already
+        holds – files written before the watch existed raise no event."""
+        for directory, _subdirs, names in os.walk(path):
+            if directory not in self._wds:
+                self._add_watch(directory)
+            self._touched.update(os.path.join(directory, n) for n in names)
+
+    def collect(self) -> Changes:
+        """The changes collected so far, as a diff against the known sources."""
+        changes = Changes(rescan=self._lost)
+        for path in self._touched:
+            if os.path.isfile(path):
+                (changes.modified if path in self._known or path in self._extra
+                 else changes.created).add(path)
+            elif not os.path.isdir(path):
+                if path in self._known:
+                    changes.deleted.add(path)
+                else:                              # a whole directory went away
+                    prefix = os.path.join(path, "")
+                    changes.deleted.update(p for p in self._known if p.startswith(prefix))
+        self._touched.clear()
+        self._lost = False
+        return changes
+
+    def wait(self, cancel: threading.Event, settle: float = DEBOUNCE_SECONDS) -> Changes:
+        """Block until a burst of changes has settled; an empty
+        :class:`Changes` once *cancel* is set."""
+        first = last = None
+        fd = self.fileno()
+        while not cancel.is_set():
+            timeout = POLL_SECONDS if last is None else max(0.0, min(POLL_SECONDS, settle - (time.monotonic() - last)))
+            if fd is None:
+                cancel.wait(timeout)
+            else:
+                select.select([fd], [], [], timeout)
+            now = time.monotonic()
+            if self.drain():
+                first = now if first is None else first
+                last = now
+            if last is not None and (now - last >= settle or now - first >= MAX_DELAY_SECONDS):
+                changes = self.collect()
+                if changes:
+                    return changes
+                first = last = None                # e.g. an editor's temp file came and went
+        return Changes()
+
+    def close(self) -> None:
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+        self._wds.clear()
+
+
+def _mtime(path: str) -> Optional[int]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns ^ st.st_size
+
+
+def apply_changes(files: List[Entry], changes: Changes, folders: Iterable[Tuple[str, str]]) -> List[Entry]:
+    """*files* without the deleted sources and with the files created in
+    *folders* (``(root, ISO prefix)``) added under their ISO paths."""
+    if changes.deleted:
+        files = [f for f in files if is_virtual(f[1]) or backing_path(f[1]) not in changes.deleted]
+    else:
+        files = list(files)
+    if changes.created:
+        taken = {f[0] for f in files}
+        roots = [(os.path.join(root, ""), root, prefix) for root, prefix in folders]
+        for path in sorted(changes.created):
+            for slashed, root, prefix in roots:
+                if path.startswith(slashed):
+                    iso_rel = iso_rel_path(path, root)
+                    iso_rel = f"{prefix}/{iso_rel}" if prefix else iso_rel
+                    if iso_rel not in taken:
+                        files.append((iso_rel, path, None))
+                        taken.add(iso_rel)
+                    break
+    return files
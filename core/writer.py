@@ -0,0 +1,877 @@
+"""In‑process ISO‑9660 + UDF bridge image writer.
+
+Building happens in two steps:
+
+1. :func:`plan_image` turns the ``(iso_rel, abs_path, lba)`` list into a
+   directory tree and assigns every descriptor, directory and file extent
+   its sector, honouring pinned LBAs (see :mod:`core.layout`).  Nothing is
+   read or written besides one ``stat`` per file; files with identical
+   contents (digests from :mod:`core.dedup`) share a single extent.  A
+   file of 4 GiB or more still gets one contiguous extent, recorded as
+   ISO‑9660 level 3 file sections and several UDF allocation descriptors.
+2. :func:`write_image` walks the planned regions in LBA order and streams
+   them into the output.  Metadata sectors are generated on the fly; file
+   contents are moved kernel side with ``os.copy_file_range`` (falling back
+   to ``os.sendfile`` and finally to plain reads) so multi‑GB payloads
+   never pass through Python buffers.  CSO/ZSO output streams the same
+   sectors through :class:`core.compress.BlockCompressor` instead.  Asked
+   for release checksums (:mod:`core.checksums`), it reads the files once
+   and hashes the image and every file as the bytes go by.  Slow sources
+   (network mounts, spinning disks) and builds that need the bytes in user
+   space anyway are read ahead of the writer by :mod:`core.readahead`.
+"""
+
+from __future__ import annotations
+
+import bisect
+import errno
+import hashlib
+import logging
+import os
+import time
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterator, List, Mapping, Optional, Tuple, Union
+
+from core import iso9660, udf
+from core.checksums import Checksums
+from core.compress import BlockCompressor, check_codec
+from core.dedup import content_digests
+from core.iso9660 import SECTOR_SIZE, sectors_for
+from core.layout import LayoutHints, allocate, order_units
+from core.progress import BuildCancelled, BuildProgress
+from core.readahead import ReadAhead, data_files, wanted as readahead_wanted
+from core.sinks import is_stream, open_sink, preallocate
+from core.sources import ImageFileSource, Source, is_virtual, open_source, source_stat
+
+logger = logging.getLogger("buildiso")
+
+# --------------------------------------------------------------------------- #
+# Constants
+# --------------------------------------------------------------------------- #
+
+VOLUME_ID: str = "PS2DISC"
+SYSTEM_ID: str = "PLAYSTATION"
+APPLICATION_ID: str = "CDGENPS2"
+PAD_SECTORS: int = 150                 # same trailer as ``genisoimage -pad``
+COPY_CHUNK: int = 64 * 1024 * 1024
+
+_ZEROS = bytes(SECTOR_SIZE * 64)
+
+# --------------------------------------------------------------------------- #
+# Plan data
+# --------------------------------------------------------------------------- #
+
+@dataclass(eq=False)
+class FileNode:
+    name: str
+    iso_path: str
+    source: Source
+    size: int
+    mtime: float
+    device: int = 0          # st_dev of the source, for per‑disk telemetry
+    lba: int = 0
+    pinned: bool = False
+    udf_fe: int = 0          # partition relative
+    unique_id: int = 0
+    shares: Optional["FileNode"] = None   # identical file whose extent this one points at
+
+    @property
+    def sectors(self) -> int:
+        return sectors_for(self.size)
+
+
+@dataclass(eq=False)
+class DirNode:
+    name: str
+    parent: Optional["DirNode"]
+    dirs: Dict[str, "DirNode"] = field(default_factory=dict)
+    files: Dict[str, FileNode] = field(default_factory=dict)
+    number: int = 0          # 1‑based path table index
+    lba: int = 0
+    size: int = 0
+    udf_fe: int = 0
+    fid_lbn: int = 0
+    fid_size: int = 0
+    unique_id: int = 0
+
+    def children(self) -> List[Tuple[bytes, Union["DirNode", FileNode]]]:
+        """Children in ISO‑9660 record order, paired with their identifier."""
+        items: List[Tuple[bytes, Union[DirNode, FileNode]]] = [
+            (iso9660.dir_identifier(n), d) for n, d in self.dirs.items()
+        ]
+        items += [(iso9660.file_identifier(n), f) for n, f in self.files.items()]
+        items.sort(key=lambda kv: iso9660.record_sort_key(kv[0]))
+        return items
+
+
+@dataclass(eq=False)
+class ImagePlan:
+    volume_id: str
+    timestamp: float
+    root: DirNode
+    directories: List[DirNode]       # path table order, root first
+    files: List[FileNode]            # LBA order
+    path_table_size: int
+    l_path_table: int
+    m_path_table: int
+    total_sectors: int
+    next_unique_id: int
+    shared_bytes: int = 0            # data sectors saved by deduplication, in bytes
+
+    @property
+    def partition_sectors(self) -> int:
+        return self.total_sectors - 1 - udf.PARTITION_START
+
+    @property
+    def size(self) -> int:
+        return self.total_sectors * SECTOR_SIZE
+
+
+Producer = Callable[[], bytes]
+Region = Tuple[int, int, Union[FileNode, Producer]]   # (lba, sectors, payload)
+
+# --------------------------------------------------------------------------- #
+# Planning
+# --------------------------------------------------------------------------- #
+
+def _stat(path: Source, stats: Optional[Mapping[Source, Optional[os.stat_result]]]) -> os.stat_result:
+    if stats is None or path not in stats:
+        return source_stat(path)
+    st = stats[path]
+    if st is None:
+        raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), path)
+    return st
+
+
+def _build_tree(
+    files: List[Tuple[str, str, Optional[int]]],
+    stats: Optional[Mapping[str, Optional[os.stat_result]]] = None,
+) -> Tuple[DirNode, List[FileNode]]:
+    root = DirNode("", None)
+    nodes: List[FileNode] = []
+    for iso_rel, abs_path, lba in files:
+        parts = iso_rel.upper().split("/")
+        parent = root
+        for part in parts[:-1]:
+            if part in parent.files:
+                raise ValueError(f"ISO path clashes with a file: {iso_rel}")
+            if part not in parent.dirs:
+                iso9660.check_name(part, directory=True)
+                parent.dirs[part] = DirNode(part, parent)
+            parent = parent.dirs[part]
+
+        name = parts[-1]
+        iso9660.check_name(name)
+        if name in parent.files or name in parent.dirs:
+            raise ValueError(f"Duplicate ISO path: {iso_rel}")
+
+        st = _stat(abs_path, stats)
+        node = FileNode(name, "/".join(parts), abs_path, st.st_size, st.st_mtime, st.st_dev)
+        if lba is not None:
+            node.lba, node.pinned = lba, True
+        parent.files[name] = node
+        nodes.append(node)
+    return root, nodes
+
+
+def _path_table_order(root: DirNode) -> List[DirNode]:
+    """Breadth first, children sorted by name: ISO‑9660 6.9.1 ordering."""
+    order = [root]
+    for node in order:                       # *order* grows while iterating
+        for name in sorted(node.dirs, key=lambda n: iso9660.record_sort_key(n.encode())):
+            order.append(node.dirs[name])
+    for number, node in enumerate(order, 1):
+        node.number = number
+    return order
+
+
+def _dir_sizes(node: DirNode) -> None:
+    lengths = [iso9660.dir_record_length(b"\x00")] * 2
+    for ident, child in node.children():
+        count = 1 if isinstance(child, DirNode) else len(iso9660.file_sections(child.size))
+        lengths += [iso9660.dir_record_length(ident)] * count
+    node.size = iso9660.directory_extent_size(lengths)
+    node.fid_size = udf.fid_length("") + sum(
+        udf.fid_length(child.name) for _, child in node.children()
+    )
+
+
+def _check_pins(nodes: List[FileNode], first_free: int) -> None:
+    pinned = sorted((f for f in nodes if f.pinned and f.size), key=lambda f: f.lba)
+    prev: Optional[FileNode] = None
+    for fnode in pinned:
+        if fnode.lba < first_free:
+            raise ValueError(
+                f"{fnode.iso_path} is pinned at LBA {fnode.lba}, inside the "
+                f"filesystem metadata (first free sector is {first_free})"
+            )
+        if prev is not None and fnode.lba < prev.lba + prev.sectors:
+            raise ValueError(f"{fnode.iso_path} (LBA {fnode.lba}) overlaps {prev.iso_path}")
+        prev = fnode
+
+
+def _share_extents(
+    nodes: List[FileNode], content: Mapping[str, str], hints: Optional[LayoutHints]
+) -> int:
+    """Point every copy of the same contents at one owner; returns bytes saved.
+
+    Pinned files always own their extent, and so do members of a hint
+    group, which must stay contiguous.  Otherwise the copy placed first
+    (the hottest, see :func:`order_units`) becomes the owner.
+    """
+    grouped = {p.upper() for group in hints.groups for p in group} if hints else set()
+    candidates = [f for f in nodes if f.pinned]
+    candidates += [f for unit in order_units([f for f in nodes if not f.pinned], hints) for f in unit]
+
+    owners: Dict[Tuple[int, str], FileNode] = {}
+    saved = 0
+    for fnode in candidates:
+        digest = content.get(fnode.source)
+        if not fnode.size or digest is None:
+            continue
+        owner = owners.setdefault((fnode.size, digest), fnode)
+        if owner is not fnode and not fnode.pinned and fnode.iso_path not in grouped:
+            fnode.shares = owner
+            saved += fnode.sectors * SECTOR_SIZE
+    return saved
+
+
+def _keep_previous(nodes: List[FileNode], previous: Dict[str, Tuple[int, int]], first_free: int) -> None:
+    # Taken extents by start, kept sorted: user pins, then every extent handed
+    # back (a shared one only once, and never two that overlap)
+    starts = sorted(f.lba for f in nodes if f.pinned and f.size)
+    ends = {f.lba: f.lba + f.sectors for f in nodes if f.pinned and f.size}
+    for fnode in nodes:
+        if fnode.pinned or fnode.iso_path not in previous:
+            continue
+        lba, sectors = previous[fnode.iso_path]
+        end = lba + fnode.sectors
+        if fnode.sectors > sectors or lba < first_free:
+            continue
+        i = bisect.bisect_right(starts, lba)
+        if fnode.size and ((i and ends[starts[i - 1]] > lba) or (i < len(starts) and starts[i] < end)):
+            continue
+        fnode.lba, fnode.pinned = lba, True
+        if fnode.size:
+            starts.insert(i, lba)
+            ends[lba] = end
+
+
+def plan_image(
+    files: List[Tuple[str, str, Optional[int]]],
+    volume_id: str,
+    hints: Optional[LayoutHints] = None,
+    timestamp: Optional[float] = None,
+    previous: Optional[Dict[str, Tuple[int, int]]] = None,
+    stats: Optional[Mapping[str, Optional[os.stat_result]]] = None,
+    content: Optional[Mapping[str, str]] = None,
+) -> ImagePlan:
+    """Lay out *files* (``(iso_rel, abs_path, lba)``) and return the plan.
+
+    Files whose *lba* is not ``None`` are pinned there; everything else is
+    packed around them following *hints*.  *previous* maps ISO paths to the
+    ``(lba, sectors)`` extent of an earlier build: files that still fit stay
+    where they were, so an incremental rebuild moves as little as possible.
+    Files read from another image's extent likewise keep their LBA in that
+    image when it is free, so a remastered disc keeps its original layout.
+    *stats* maps source paths to ``stat`` results already fetched (e.g. by
+    the pre‑build validation); sources it does not cover are stat'ed here.
+    *content* maps source paths to content digests (see
+    :func:`core.dedup.content_digests`): files with equal size and digest
+    get one shared data extent.
+    """
+    root, nodes = _build_tree(files, stats)
+    directories = _path_table_order(root)
+
+    pt_size = 0
+    for node in directories:
+        ident = iso9660.dir_identifier(node.name) if node.parent else b"\x00"
+        pt_size += iso9660.path_table_entry_length(ident)
+        _dir_sizes(node)
+
+    # ---- ISO metadata: file set, path tables, directories -------------------
+    cur = udf.PARTITION_START + 2            # file set descriptor + terminator
+    l_path = cur; cur += sectors_for(pt_size)
+    m_path = cur; cur += sectors_for(pt_size)
+
+    for node in directories:
+        node.lba = cur
+        cur += node.size // SECTOR_SIZE
+
+    _check_pins(nodes, cur)
+    shared = _share_extents(nodes, content, hints) if content else 0
+    owners = [f for f in nodes if f.shares is None]
+    # Files imported from an image (see core.isoread) prefer their old place
+    imported = {f.iso_path: (f.source.extent.offset // SECTOR_SIZE, f.sectors) for f in owners
+                if isinstance(f.source, ImageFileSource) and not f.source.extent.offset % SECTOR_SIZE}
+    if previous or imported:
+        _keep_previous(owners, {**imported, **(previous or {})}, cur)
+
+    # ---- UDF entries and file data, packed around pinned extents ------------
+    unique_id = udf.FIRST_UNIQUE_ID
+    for node in directories[1:]:
+        node.unique_id = unique_id; unique_id += 1
+    for fnode in nodes:
+        fnode.unique_id = unique_id; unique_id += 1
+
+    units = order_units([f for f in owners if not f.pinned], hints)
+    sizes = [1 + sectors_for(n.fid_size) for n in directories]
+    sizes += [1] * len(nodes)
+    sizes += [sum(f.sectors for f in unit) for unit in units]
+    lbas, cur = allocate(cur, [(f.lba, f.sectors) for f in owners if f.pinned], sizes)
+
+    slots = iter(lbas)
+    for node in directories:
+        node.udf_fe = next(slots) - udf.PARTITION_START
+        node.fid_lbn = node.udf_fe + 1
+    for fnode in nodes:
+        fnode.udf_fe = next(slots) - udf.PARTITION_START
+    ordered: List[FileNode] = []
+    for unit in units:
+        lba = next(slots)
+        for fnode in unit:
+            fnode.lba = lba
+            lba += fnode.sectors
+        ordered += unit
+    ordered += [f for f in owners if f.pinned]
+    for fnode in nodes:
+        if fnode.shares is not None:
+            fnode.lba = fnode.shares.lba
+            ordered.append(fnode)
+    ordered.sort(key=lambda f: f.lba)        # stable: an owner precedes its copies
+
+    total = cur + PAD_SECTORS + 1            # trailing anchor
+    return ImagePlan(
+        volume_id=volume_id,
+        timestamp=time.time() if timestamp is None else timestamp,
+        root=root,
+        directories=directories,
+        files=ordered,
+        path_table_size=pt_size,
+        l_path_table=l_path,
+        m_path_table=m_path,
+        total_sectors=total,
+        next_unique_id=unique_id,
+        shared_bytes=shared,
+    )
+
+# --------------------------------------------------------------------------- #
+# Metadata generation
+# --------------------------------------------------------------------------- #
+
+def _iso_directory(plan: ImagePlan, node: DirNode) -> bytes:
+    ts = plan.timestamp
+    parent = node.parent or node
+    records = [
+        iso9660.dir_record(b"\x00", node.lba, node.size, iso9660.FLAG_DIRECTORY, ts),
+        iso9660.dir_record(b"\x01", parent.lba, parent.size, iso9660.FLAG_DIRECTORY, ts),
+    ]
+    for ident, child in node.children():
+        if isinstance(child, DirNode):
+            records.append(iso9660.dir_record(ident, child.lba, child.size, iso9660.FLAG_DIRECTORY, ts))
+        else:
+            lba, sections = child.lba, iso9660.file_sections(child.size)
+            for i, size in enumerate(sections, 1):
+                flags = iso9660.FLAG_MULTI_EXTENT if i < len(sections) else 0
+                records.append(iso9660.dir_record(ident, lba, size, flags, child.mtime))
+                lba += size // SECTOR_SIZE
+    return iso9660.pack_directory(records)
+
+
+def _path_tables(plan: ImagePlan) -> Tuple[bytes, bytes]:
+    entries = [
+        (iso9660.dir_identifier(n.name) if n.parent else b"\x00", n.lba,
+         n.parent.number if n.parent else 1)
+        for n in plan.directories
+    ]
+    pad = lambda b: b.ljust(sectors_for(len(b)) * SECTOR_SIZE, b"\x00")  # noqa: E731
+    return pad(iso9660.path_table(entries, False)), pad(iso9660.path_table(entries, True))
+
+
+def _udf_directory(plan: ImagePlan, node: DirNode) -> bytes:
+    parent = node.parent or node
+    fe = udf.file_entry(
+        node.udf_fe,
+        file_type=udf.FILE_TYPE_DIRECTORY,
+        size=node.fid_size,
+        extents=[(node.fid_lbn, node.fid_size)],
+        links=1 + len(node.dirs),
+        unique_id=node.unique_id,
+        ts=plan.timestamp,
+    )
+    fids = bytearray()
+
+    def add(name: str, flags: int, icb: int, uid: int) -> None:
+        location = node.fid_lbn + len(fids) // SECTOR_SIZE
+        fids.extend(udf.file_identifier(location, name, flags, icb, uid))
+
+    add("", udf.FID_DIRECTORY | udf.FID_PARENT, parent.udf_fe, parent.unique_id)
+    for _ident, child in node.children():
+        if isinstance(child, DirNode):
+            add(child.name, udf.FID_DIRECTORY, child.udf_fe, child.unique_id)
+        else:
+            add(child.name, 0, child.udf_fe, child.unique_id)
+    return fe + bytes(fids).ljust(sectors_for(len(fids)) * SECTOR_SIZE, b"\x00")
+
+
+def _udf_file(plan: ImagePlan, fnode: FileNode) -> bytes:
+    lbn = fnode.lba - udf.PARTITION_START
+    return udf.file_entry(
+        fnode.udf_fe,
+        file_type=udf.FILE_TYPE_REGULAR,
+        size=fnode.size,
+        extents=udf.split_extent(lbn, fnode.size) if fnode.size else [],
+        links=1,
+        unique_id=fnode.unique_id,
+        ts=fnode.mtime,
+    )
+
+
+def _volume_descriptors(plan: ImagePlan) -> Iterator[Region]:
+    ts = plan.timestamp
+    root = plan.root
+    root_record = iso9660.dir_record(b"\x00", root.lba, root.size, iso9660.FLAG_DIRECTORY, ts)
+    yield iso9660.PVD_LBA, 1, lambda: iso9660.primary_volume_descriptor(
+        system_id=SYSTEM_ID,
+        volume_id=plan.volume_id,
+        application_id=APPLICATION_ID,
+        volume_sectors=plan.total_sectors,
+        path_table_size=plan.path_table_size,
+        l_path_table_lba=plan.l_path_table,
+        m_path_table_lba=plan.m_path_table,
+        root_record=root_record,
+        ts=ts,
+    )
+    yield iso9660.TERMINATOR_LBA, 1, iso9660.volume_descriptor_terminator
+    for lba, ident in zip(udf.VRS_LBAS, (b"BEA01", b"NSR02", b"TEA01")):
+        yield lba, 1, (lambda ident=ident: udf.volume_recognition(ident))
+    for start in (udf.MAIN_VDS_LBA, udf.RESERVE_VDS_LBA):
+        yield start, 6, (lambda start=start: b"".join(
+            udf.volume_descriptor_sequence(start, plan.volume_id, plan.partition_sectors, ts)
+        ))
+    files = len(plan.files)
+    dirs = len(plan.directories)
+    yield udf.LVID_LBA, 2, lambda: (
+        udf.integrity(plan.next_unique_id, files, dirs, plan.partition_sectors, ts)
+        + udf.terminating(udf.LVID_LBA + 1)
+    )
+    yield udf.ANCHOR_LBA, 1, lambda: udf.anchor(udf.ANCHOR_LBA)
+    yield udf.PARTITION_START, 2, lambda: (
+        udf.file_set(plan.root.udf_fe, plan.volume_id, ts) + udf.terminating(1)
+    )
+
+
+def descriptor_regions(plan: ImagePlan) -> List[Region]:
+    """Volume descriptors, path tables, anchors: everything not per entry."""
+    out: List[Region] = list(_volume_descriptors(plan))
+
+    pt_sectors = sectors_for(plan.path_table_size)
+    tables: Dict[str, bytes] = {}
+
+    def table(which: int) -> bytes:
+        if not tables:
+            tables["l"], tables["m"] = _path_tables(plan)
+        return tables["lm"[which]]
+
+    out.append((plan.l_path_table, pt_sectors, lambda: table(0)))
+    out.append((plan.m_path_table, pt_sectors, lambda: table(1)))
+
+    last = plan.total_sectors - 1
+    out.append((last, 1, lambda: udf.anchor(last)))
+    return out
+
+
+def directory_regions(plan: ImagePlan, node: DirNode) -> List[Region]:
+    """The ISO‑9660 extent and the UDF entry + identifiers of one directory."""
+    return [
+        (node.lba, node.size // SECTOR_SIZE, lambda: _iso_directory(plan, node)),
+        (udf.PARTITION_START + node.udf_fe, 1 + sectors_for(node.fid_size),
+         lambda: _udf_directory(plan, node)),
+    ]
+
+
+def file_regions(plan: ImagePlan, fnode: FileNode, data: bool = True) -> List[Region]:
+    """The UDF file entry of *fnode* and, if *data*, its contents.
+
+    A deduplicated copy has no contents of its own: its owner writes them.
+    """
+    out: List[Region] = [
+        (udf.PARTITION_START + fnode.udf_fe, 1, lambda: _udf_file(plan, fnode)),
+    ]
+    if data and fnode.size and fnode.shares is None:
+        out.append((fnode.lba, fnode.sectors, fnode))
+    return out
+
+
+def regions(plan: ImagePlan) -> List[Region]:
+    """Every non‑zero region of the image, sorted by LBA."""
+    out = descriptor_regions(plan)
+    for node in plan.directories:
+        out += directory_regions(plan, node)
+    for fnode in plan.files:
+        out += file_regions(plan, fnode)
+    out.sort(key=lambda r: r[0])
+    return out
+
+# --------------------------------------------------------------------------- #
+# Streaming output
+# --------------------------------------------------------------------------- #
+
+class _Output:
+    """Sequential writer over a file descriptor with kernel side copies.
+
+    With a :class:`BuildProgress` every byte is accounted to the current
+    phase, and cancellation is checked between regions and copy chunks.
+    *sparse* skips zeros with ``lseek`` instead of writing them; the file
+    must read as zeros there (freshly truncated) and be extended to its
+    final size by the caller.  With *checksums*, every byte of the image –
+    the skipped zeros too – goes through :attr:`digest`, so file data is
+    read into user space instead of copied kernel side.
+    """
+
+    def __init__(self, fd: int, progress: Optional[BuildProgress] = None, sparse: bool = False,
+                 checksums: Optional[Checksums] = None) -> None:
+        self.fd = fd
+        self.progress = progress
+        self.sparse = sparse
+        self.checksums = checksums
+        self.digest = checksums.new() if checksums is not None else None
+        self.readahead: Optional[ReadAhead] = None
+        self._copy_file_range = hasattr(os, "copy_file_range") and checksums is None
+        self._sendfile = hasattr(os, "sendfile") and checksums is None
+
+    def phase(self, name: str):
+        return nullcontext() if self.progress is None else self.progress.phase(name)
+
+    def write(self, data: bytes) -> None:
+        self._write(data)
+        if self.progress is not None:
+            self.progress.advance(len(data))
+
+    def _write(self, data: bytes) -> None:
+        if self.digest is not None:
+            self.digest.update(data)
+        view = memoryview(data)
+        while view:
+            written = os.write(self.fd, view)
+            view = view[written:]
+
+    def zeros(self, nbytes: int) -> None:
+        if self.sparse and nbytes > 0:
+            os.lseek(self.fd, nbytes, os.SEEK_CUR)
+            if self.digest is not None:
+                for done in range(0, nbytes, len(_ZEROS)):
+                    self.digest.update(_ZEROS[:min(len(_ZEROS), nbytes - done)])
+            if self.progress is not None:
+                self.progress.advance(nbytes)
+            return
+        while nbytes > 0:
+            chunk = min(nbytes, len(_ZEROS))
+            self.write(_ZEROS[:chunk])
+            nbytes -= chunk
+
+    def _copy_chunk(self, src: int, offset: int, count: int) -> int:
+        if self._copy_file_range:
+            try:
+                return os.copy_file_range(src, self.fd, count, offset)
+            except OSError as exc:
+                if exc.errno not in (errno.EXDEV, errno.EINVAL, errno.ENOSYS,
+                                     errno.EOPNOTSUPP, errno.EBADF):
+                    raise
+                self._copy_file_range = False
+        if self._sendfile:
+            try:
+                return os.sendfile(self.fd, src, offset, count)
+            except OSError as exc:
+                if exc.errno not in (errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP):
+                    raise
+                self._sendfile = False
+        data = os.pread(src, count, offset)
+        self._write(data)
+        return len(data)
+
+    def seek(self, lba: int) -> None:
+        os.lseek(self.fd, lba * SECTOR_SIZE, os.SEEK_SET)
+
+    def close(self) -> None:
+        pass
+
+    def copy_file(self, path: Source, size: int, digest=None, device: int = 0) -> None:
+        """Append *size* bytes of the source *path*; with *digest*, hash them
+        on the way.  Extents of another image are copied straight out of it,
+        virtual sources are streamed from memory.
+
+        Hashing needs the bytes in user space, so it trades the kernel copy
+        for a single ``pread`` + ``write`` pass instead of a second read.
+        With :attr:`readahead` set, the bytes come from its ring instead.
+        """
+        progress = self.progress
+        if is_virtual(path):
+            written = 0
+            for chunk in path.chunks():
+                if digest is not None:
+                    digest.update(chunk)
+                self._write(chunk)
+                written += len(chunk)
+                if progress is not None:
+                    progress.advance(len(chunk))
+                    progress.check()
+            if written != size:
+                raise RuntimeError(f"{path} produced {written} bytes, expected {size}")
+            return
+        start = time.perf_counter()
+        if self.readahead is not None:
+            for data in self.readahead.read(path, size):
+                if digest is not None:
+                    digest.update(data)
+                self._write(data)
+                if progress is not None:
+                    progress.advance(len(data))
+                    progress.check()
+            if progress is not None:
+                progress.source_read(path, device, size, time.perf_counter() - start)
+            return
+        src, base = open_source(path)
+        try:
+            offset = 0
+            while offset < size:
+                count = min(COPY_CHUNK, size - offset)
+                if digest is None:
+                    n = self._copy_chunk(src, base + offset, count)
+                else:
+                    data = os.pread(src, count, base + offset)
+                    digest.update(data)
+                    self._write(data)
+                    n = len(data)
+                if n == 0:
+                    raise RuntimeError(f"{path} shrank while the image was being written")
+                offset += n
+                if progress is not None:
+                    progress.advance(n)
+                    progress.check()
+        finally:
+            os.close(src)
+        if progress is not None:
+            progress.source_read(path, device, size, time.perf_counter() - start)
+
+
+class _CompressedOutput(_Output):
+    """Feeds the image to a :class:`BlockCompressor` instead of the file.
+
+    Compression needs the bytes in user space, so file data is read with
+    ``pread`` rather than copied kernel side.
+    """
+
+    def __init__(self, compressor: BlockCompressor, progress: Optional[BuildProgress] = None,
+                 checksums: Optional[Checksums] = None) -> None:
+        super().__init__(compressor.fd, progress, checksums=checksums)
+        self.compressor = compressor
+        self._copy_file_range = self._sendfile = False
+
+    def _write(self, data: bytes) -> None:
+        if self.digest is not None:
+            self.digest.update(data)
+        self.compressor.write(data)
+
+    def seek(self, lba: int) -> None:
+        raise RuntimeError("Compressed images can only be written sequentially")
+
+    def close(self) -> None:
+        self.compressor.close()
+
+
+def _emit(out: _Output, region: Region, digests: Optional[Dict[str, str]]) -> None:
+    lba, sectors, payload = region
+    if isinstance(payload, FileNode):
+        with out.phase("data"):
+            sums = out.checksums
+            digest = (sums.new() if sums is not None
+                      else hashlib.sha1() if digests is not None else None)
+            out.copy_file(payload.source, payload.size, digest, payload.device)
+            if digests is not None:
+                digests[payload.iso_path] = digest.hexdigest()
+            if sums is not None:
+                sums.files[payload.iso_path] = digest.hexdigests()
+            out.zeros(sectors * SECTOR_SIZE - payload.size)
+    else:
+        with out.phase("directories"):
+            data = payload()
+            if len(data) != sectors * SECTOR_SIZE:
+                raise RuntimeError(f"Region at LBA {lba} has the wrong size")
+            out.write(data)
+
+
+def _stream(out: _Output, plan: ImagePlan, start: int, digests: Optional[Dict[str, str]]) -> None:
+    """Write every sector from *start* to the end of the image sequentially."""
+    pos = start
+    for region in regions(plan):
+        lba, sectors, _payload = region
+        if lba + sectors <= start:
+            continue
+        if lba < pos:
+            raise RuntimeError(f"Overlapping extents at LBA {lba}")
+        if lba > pos:
+            with out.phase("padding"):
+                out.zeros((lba - pos) * SECTOR_SIZE)
+        _emit(out, region, digests)
+        pos = lba + sectors
+
+
+def check_size(plan: ImagePlan, max_sectors: Optional[int], output_path: str) -> None:
+    """Refuse a plan larger than *max_sectors* before a byte is written."""
+    if max_sectors is not None and plan.total_sectors > max_sectors:
+        over = (plan.total_sectors - max_sectors) * SECTOR_SIZE
+        raise ValueError(f"{output_path} needs {plan.total_sectors} sectors, {over / 2**20:.1f} MB "
+                         f"more than the {max_sectors} sectors allowed")
+
+
+def _data_runs(plan: ImagePlan) -> List[Tuple[int, int]]:
+    """``(offset, length)`` byte ranges of the image that hold data, with
+    adjacent regions merged."""
+    runs: List[List[int]] = []
+    for lba, sectors, _payload in regions(plan):
+        if runs and runs[-1][1] == lba:
+            runs[-1][1] = lba + sectors
+        else:
+            runs.append([lba, lba + sectors])
+    return [(start * SECTOR_SIZE, (end - start) * SECTOR_SIZE) for start, end in runs]
+
+
+def write_image(
+    plan: ImagePlan,
+    output_path: str,
+    digests: Optional[Dict[str, str]] = None,
+    progress: Optional[BuildProgress] = None,
+    compression: Optional[str] = None,
+    checksums: Optional[Checksums] = None,
+    readahead: Optional[bool] = None,
+) -> None:
+    """Stream the planned image into *output_path* (see :mod:`core.sinks`).
+
+    When *digests* is a dict it receives the SHA‑1 of every file written,
+    keyed by ISO path.  *compression* (``"cso"``/``"zso"``) writes a
+    compressed block image instead of a raw one.  A raw file is written
+    sparse over preallocated data extents; ``-``, pipes and (block) devices get
+    every byte in order.  A cancelled build removes the partial image.
+    *checksums* collects the digests of the image (of the ISO data for
+    CSO/ZSO) and of every file written.  *readahead* reads the sources
+    ahead of the writer (see :mod:`core.readahead`); ``None`` decides by
+    the sources' devices and whether the bytes pass through user space.
+    """
+    if compression is not None:
+        check_codec(compression)
+        if is_stream(output_path):
+            raise ValueError(f"{compression.upper()} images cannot be written to a stream")
+    if progress is not None:
+        progress.start_output(plan.size)
+    files = data_files(regions(plan))
+    if readahead is None:
+        user_space = compression is not None or checksums is not None or digests is not None
+        readahead = readahead_wanted((f[2] for f in files), user_space)
+    sink = open_sink(output_path, plan.size)
+    out: Optional[_Output] = None
+    ahead: Optional[ReadAhead] = None
+    try:
+        if compression is not None:
+            out = _CompressedOutput(BlockCompressor(sink.fd, plan.size, compression), progress, checksums)
+        elif sink.stream:
+            out = _Output(sink.fd, progress, checksums=checksums)
+        else:
+            preallocate(sink.fd, _data_runs(plan))
+            out = _Output(sink.fd, progress, sparse=True, checksums=checksums)
+        if readahead and files:
+            ahead = out.readahead = ReadAhead(files)
+        _stream(out, plan, 0, digests)
+        out.close()
+        if checksums is not None:
+            checksums.image = out.digest
+        if out.sparse:
+            os.ftruncate(sink.fd, plan.size)            # the tail pad is a hole too
+    except BaseException as exc:
+        if isinstance(out, _CompressedOutput):
+            out.compressor.abort()
+        if isinstance(exc, BuildCancelled):
+            sink.discard()
+        raise
+    finally:
+        if ahead is not None:
+            ahead.close()
+        sink.close()
+    logger.debug("Wrote %d sectors to %s", plan.total_sectors, output_path)
+
+
+def patch_image(
+    plan: ImagePlan,
+    output_path: str,
+    patches: List[Region],
+    tail: Optional[int] = None,
+    digests: Optional[Dict[str, str]] = None,
+    progress: Optional[BuildProgress] = None,
+) -> int:
+    """Rewrite *patches* in place inside an existing image.
+
+    With *tail* set, every sector from that LBA to the end of *plan* is
+    rewritten too and the file is cut to the planned size.  Returns the
+    number of bytes written.  A cancelled patch leaves the image
+    inconsistent; the caller must not keep its manifest.
+    """
+    if tail is not None:
+        # never start the tail inside an extent
+        tail = min([tail] + [lba for lba, n, _p in regions(plan) if lba < tail < lba + n])
+    patches = sorted((r for r in patches if tail is None or r[0] < tail), key=lambda r: r[0])
+
+    if progress is not None:
+        total = sum(n for _lba, n, _p in patches) * SECTOR_SIZE
+        progress.start_output(total + (0 if tail is None else plan.size - tail * SECTOR_SIZE))
+
+    written = 0
+    fd = os.open(output_path, os.O_WRONLY)
+    try:
+        out = _Output(fd, progress)
+        for region in patches:
+            out.seek(region[0])
+            _emit(out, region, digests)
+            written += region[1] * SECTOR_SIZE
+        if tail is not None:
+            out.seek(tail)
+            _stream(out, plan, tail, digests)
+            os.ftruncate(fd, plan.size)
+            written += plan.size - tail * SECTOR_SIZE
+    finally:
+        os.close(fd)
+    return written
+
+
+def build_image(
+    output_path: str,
+    files: List[Tuple[str, str, Optional[int]]],
+    volume_id: str,
+    hints: Optional[LayoutHints] = None,
+    progress: Optional[BuildProgress] = None,
+    stats: Optional[Mapping[str, Optional[os.stat_result]]] = None,
+    dedup: bool = True,
+    compression: Optional[str] = None,
+    content: Optional[Mapping[str, str]] = None,
+    checksums: Optional[Checksums] = None,
+    max_sectors: Optional[int] = None,
+    digests: Optional[Dict[str, str]] = None,
+) -> ImagePlan:
+    """Plan and write an image in one call; returns the plan used.
+
+    With *dedup*, identical sources are hashed first (unless *content*
+    already holds their digests) and share one extent.  *compression*,
+    *checksums* and *digests* are handed to :func:`write_image`.  A plan larger than
+    *max_sectors* raises ``ValueError`` before anything is written.
+    """
+    phase = progress.phase if progress is not None else lambda _name: nullcontext()
+    if not dedup:
+        content = None
+    elif content is None:
+        with phase("dedup"):
+            content = content_digests(files, stats, progress=progress)
+    with phase("layout"):
+        plan = plan_image(files, volume_id, hints, stats=stats, content=content)
+    check_size(plan, max_sectors, output_path)
+    write_image(plan, output_path, digests, progress, compression, checksums)
+    return plan
@@ -2,21 +2,29 @@
 """Main GUI for Different Fun CDGenPS2 – RootISO node, boot‑ELF only on ELF selection."""
 
 from __future__ import annotations
-import os
-from typing import Optional, Tuple
+from typing import Callable, Optional
 
-from PySide6.QtCore import Qt
+from PySide6.QtCore import QModelIndex, Qt, QTimer
+from PySide6.QtGui import QBrush, QColor
 from PySide6.QtWidgets import (
-    QHBoxLayout, QMessageBox, QSplitter, QTableWidget, QTableWidgetItem,
-    QTreeWidget, QTreeWidgetItem, QVBoxLayout, QWidget, QPushButton
+    QHBoxLayout, QLabel, QMessageBox, QSplitter, QTableWidget, QTableWidgetItem,
+    QTreeView, QVBoxLayout, QWidget, QPushButton, QCheckBox
 )
 
 # action modules
 from actions.add_folder import add_folder
 from actions.add_file import add_file
+from actions.import_iso import import_iso
 from actions.boot_elf import boot_elf
 from actions.remove_item import remove_item
 from actions.build_iso import build_iso
+from actions.watch import toggle_watch
+from actions.serve_iso import toggle_serve
+from core.capacity import MEDIA, smallest_media
+from core.model import LayoutModel
+from core.profiling import StallWatchdog, enabled as profiling_enabled, instrument, profiled
+from core.statcache import StatCache
+from tree_model import LayoutTreeModel
 
 
 class CDGenPS2(QWidget):
@@ -28,8 +36,13 @@ class CDGenPS2(QWidget):
         self.resize(1120, 650)
 
         # internal data
-        self.files: list[Tuple[str, str, Optional[int]]] = []
-        self.current_item: Optional[QTreeWidgetItem] = None
+        self.files = LayoutModel()
+        self.stat_cache = StatCache()            # info panel + pre‑build validation
+        self.current_path: Optional[str] = None      # ISO path of the selection, "" = RootISO
+        self.folder_import = None            # running Add Folder / Import ISO, if any
+        self.iso_build = None                # running Build ISO, if any
+        self.watch = None                    # watch mode, while on
+        self.serve = None                    # serve mode, while on
 
         # ------------ layout -------------------------------------------------
         main = QVBoxLayout(self)
@@ -37,70 +50,150 @@ class CDGenPS2(QWidget):
 
         self.btn_add_folder = QPushButton("Add Folder")
         self.btn_add_file   = QPushButton("Add Files")
+        self.btn_import_iso = QPushButton("Import ISO")
         self.btn_boot_elf   = QPushButton("Set as main ELF boot")   # will be enabled on ELF node
         self.btn_remove     = QPushButton("Delete")
         self.btn_build_iso  = QPushButton("Build ISO")
-
-        for b in (self.btn_add_folder, self.btn_add_file, self.btn_boot_elf, self.btn_remove, self.btn_build_iso):
+        self.btn_watch      = QPushButton("Watch")              # rebuild whenever a source changes
+        self.btn_watch.setCheckable(True)
+        self.btn_watch.setToolTip("Keep an ISO up to date: rebuild it incrementally whenever a source file changes")
+        self.lbl_watch      = QLabel()
+        self.btn_serve      = QPushButton("Serve")              # the layout as an HTTP image, never written
+        self.btn_serve.setCheckable(True)
+        self.btn_serve.setToolTip("Serve the image over HTTP on this machine, built on the fly from the "
+                                  "layout: saved sources are served at once, no rebuild")
+        self.lbl_serve      = QLabel()
+        self.lbl_serve.setTextInteractionFlags(Qt.TextSelectableByMouse)
+
+        self.chk_incremental = QCheckBox("Incremental")   # patch the previous image in place
+        self.chk_incremental.setToolTip("Rewrite only what changed since the last build of the chosen ISO")
+        self.chk_verify = QCheckBox("Verify")             # re-read the image against the sources
+        self.chk_verify.setToolTip("Check the finished ISO: boot chain, directory records and file contents")
+        self.chk_verify.setChecked(True)
+        self.chk_checksums = QCheckBox("Checksums")       # MD5/SHA-1/CRC32 sidecar, hashed while writing
+        self.chk_checksums.setToolTip("Write <image>.checksums.json with the MD5, SHA-1 and CRC32 "
+                                      "of the image and of every file")
+
+        for b in (self.btn_add_folder, self.btn_add_file, self.btn_import_iso, self.btn_boot_elf,
+                  self.btn_remove, self.btn_build_iso, self.btn_watch, self.btn_serve):
             bar.addWidget(b)
+        bar.addWidget(self.chk_incremental)
+        bar.addWidget(self.chk_verify)
+        bar.addWidget(self.chk_checksums)
+        bar.addWidget(self.lbl_watch)
+        bar.addWidget(self.lbl_serve)
         self.btn_boot_elf.setEnabled(False)  # disabled until an ELF node is selected
 
         split = QSplitter(Qt.Horizontal); main.addWidget(split, 1)
 
-        self.tree = QTreeWidget()
-        self.tree.setHeaderLabels(["ISO Structure"])
-        self.tree.itemClicked.connect(self._on_tree_click)
+        self.tree_model = LayoutTreeModel(self.files, self)
+        self.tree = QTreeView()
+        self.tree.setModel(self.tree_model)
+        self.tree.setUniformRowHeights(True)      # lets the view skip per‑row size hints
+        self.tree.selectionModel().currentChanged.connect(self._on_tree_click)
         split.addWidget(self.tree)
+        self.tree.expand(self.tree_model.index_of(""))
 
-        self.root_node = QTreeWidgetItem(["RootISO"])
-        self.tree.addTopLevelItem(self.root_node); self.tree.expandItem(self.root_node)
-
-        self.info = QTableWidget(4, 2)
+        self.info = QTableWidget(6, 2)
         self.info.setHorizontalHeaderLabels(["Field", "Value"])
         self.info.verticalHeader().setVisible(False)
         self.info.horizontalHeader().setStretchLastSection(True)
         self.info.setEditTriggers(QTableWidget.NoEditTriggers)
-        for i, lbl in enumerate(("Type", "Path", "Size (KB)", "LBA")):
+        for i, lbl in enumerate(("Type", "Path", "Size (KB)", "LBA", "Image size", "Fits on")):
             self.info.setItem(i, 0, QTableWidgetItem(lbl))
         split.addWidget(self.info); split.setSizes([700, 420])
 
         # ------------ connections -------------------------------------------
-        self.btn_add_folder.clicked.connect(lambda: add_folder(self))
-        self.btn_add_file.clicked.connect(lambda: add_file(self))
-        self.btn_boot_elf.clicked.connect(lambda: boot_elf(self))
-        self.btn_remove.clicked.connect(lambda: remove_item(self))
-        self.btn_build_iso.clicked.connect(lambda: build_iso(self))
+        self.btn_add_folder.clicked.connect(self._action("add_folder", add_folder))
+        self.btn_add_file.clicked.connect(self._action("add_file", add_file))
+        self.btn_import_iso.clicked.connect(self._action("import_iso", import_iso))
+        self.btn_boot_elf.clicked.connect(self._action("boot_elf", boot_elf))
+        self.btn_remove.clicked.connect(self._action("remove_item", remove_item))
+        self.btn_build_iso.clicked.connect(self._action("build_iso", build_iso))
+        self.btn_watch.toggled.connect(lambda on: toggle_watch(self, on))
+        self.btn_serve.toggled.connect(lambda on: toggle_serve(self, on))
+
+        # image size: the layout keeps it current, the panel shows it at most 5×/s
+        self._capacity_timer = QTimer(self, singleShot=True, interval=200)
+        self._capacity_timer.timeout.connect(self.refresh_capacity)
+        for signal in (self.tree_model.rowsInserted, self.tree_model.rowsRemoved,
+                       self.tree_model.modelReset):
+            signal.connect(self._schedule_capacity)
+        self.refresh_capacity()
+
+        # ------------ opt‑in instrumentation (CDGENPS2_PROFILE) --------------
+        self.watchdog: Optional[StallWatchdog] = None
+        if profiling_enabled():
+            self.watchdog = StallWatchdog().start()
+            self._heartbeat = QTimer(self, interval=20)
+            self._heartbeat.timeout.connect(self.watchdog.beat)
+            self._heartbeat.start()
+
+    def _action(self, name: str, action: Callable[["CDGenPS2"], None]) -> Callable[[], None]:
+        """*action* bound to this window, profiled as *name* when profiling is on."""
+        def run() -> None:
+            with profiled(name):
+                action(self)
+        return run
 
     # =================================================================== #
-    def collect_iso_path(self, item: QTreeWidgetItem) -> str:
-        parts = []
-        node = item
-        while node and node != self.root_node:
-            parts.insert(0, node.text(0)); node = node.parent()
-        return "RootISO/" + "/".join(parts)
-
-    def refresh_info(self, item: QTreeWidgetItem) -> None:
-        data = item.data(0, Qt.UserRole)
-        if data is None:  # directory
+    def select(self, iso_path: str) -> None:
+        """Make *iso_path* the current tree row (its info follows)."""
+        index = self.tree_model.index_of(iso_path)
+        self.tree.setCurrentIndex(index)
+        self.tree.scrollTo(index)
+
+    @instrument("refresh_info")
+    def refresh_info(self, iso_path: str) -> None:
+        node = self.files.node(iso_path)
+        if self.files.node_is_dir(node):
             for r in range(4):
                 self.info.setItem(r, 1, QTableWidgetItem(""))
             self.info.setItem(0, 1, QTableWidgetItem("Directory"))
-            self.info.setItem(1, 1, QTableWidgetItem(self.collect_iso_path(item)))
+            self.info.setItem(1, 1, QTableWidgetItem(f"RootISO/{iso_path}"))
             return
 
-        iso_rel, abs_path, lba = data
-        size_kb = round(os.path.getsize(abs_path) / 1024, 2)
+        try:
+            size_kb = str(round(self.stat_cache.stat(self.files.source(node)).st_size / 1024, 2))
+        except OSError:
+            size_kb = "missing"
+        lba = self.files.lba(node)
         self.info.setItem(0, 1, QTableWidgetItem("File"))
-        self.info.setItem(1, 1, QTableWidgetItem(f"RootISO/{iso_rel}"))
-        self.info.setItem(2, 1, QTableWidgetItem(str(size_kb)))
+        self.info.setItem(1, 1, QTableWidgetItem(f"RootISO/{iso_path}"))
+        self.info.setItem(2, 1, QTableWidgetItem(size_kb))
         self.info.setItem(3, 1, QTableWidgetItem("" if lba is None else str(lba)))
 
+    def _schedule_capacity(self, *_args) -> None:
+        if not self._capacity_timer.isActive():      # throttle, don't debounce: batches keep coming
+            self._capacity_timer.start()
+
+    @instrument("refresh_capacity")
+    def refresh_capacity(self) -> None:
+        """Size of the image the layout would make, and the smallest disc it fits."""
+        b = self.files.capacity.breakdown()
+        size = f"{b.size / 2**20:,.1f} MB ({b.total:,} sectors)"
+        if b.unknown:
+            size += f", {b.unknown} file(s) of unknown size"
+        media = smallest_media(b.total)
+        fits = QTableWidgetItem(
+            "too large for a DVD‑9" if media is None
+            else f"{MEDIA[media][0]} – {b.total / MEDIA[media][1]:.0%} used"
+        )
+        if media is None or b.issues:
+            fits.setForeground(QBrush(QColor("red")))
+        tip = "\n".join([f"{label}: {n:,} sectors" for label, n in b.rows()] + b.issues)
+        for row, item in ((4, QTableWidgetItem(size)), (5, fits)):
+            item.setToolTip(tip)
+            self.info.setItem(row, 1, item)
+
     # ------------------------------------------------------------------ #
-    def _on_tree_click(self, item: QTreeWidgetItem) -> None:
+    def _on_tree_click(self, index: QModelIndex) -> None:
         """Handle selection: show info and enable boot‑ELF button only on .ELF."""
-        self.current_item = item
-        self.refresh_info(item)
+        self.current_path = self.tree_model.path_of(index)
+        if self.current_path is None:
+            self.btn_boot_elf.setEnabled(False)
+            return
+        self.refresh_info(self.current_path)
 
-        data = item.data(0, Qt.UserRole)
-        is_elf_file = bool(data and data[0].upper().endswith(".ELF"))
+        is_elf_file = self.current_path in self.files and self.current_path.upper().endswith(".ELF")
         self.btn_boot_elf.setEnabled(is_elf_file)
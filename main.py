@@ -1,15 +1,24 @@
 # main.py
 """Bootstrap dell'applicazione Different Fun CDGenPS2.
-Avvia la GUI definita in gui.py.
+Avvia la GUI definita in gui.py, oppure la riga di comando (cli.py) se il
+primo argomento è un comando come ``build`` o ``verify``: in quel caso Qt non viene
+mai importato.
 """
 
 import sys
-from PySide6.QtWidgets import QApplication
-
-from gui import CDGenPS2
 
 
 def main() -> None:
+    from cli import COMMANDS
+
+    if len(sys.argv) > 1 and sys.argv[1] in COMMANDS + ("-h", "--help"):
+        from cli import main as cli_main
+        sys.exit(cli_main(sys.argv[1:]))
+
+    from PySide6.QtWidgets import QApplication
+
+    from gui import CDGenPS2
+
     app = QApplication(sys.argv)
     window = CDGenPS2()
     window.show()
@@ -0,0 +1,193 @@
+# tree_model.py
+"""Virtual tree model over :class:`core.model.LayoutModel`.
+
+No per‑entry Qt or Python objects are kept: a ``QModelIndex`` carries the
+layout node as its internal id and every call reads the columnar store.
+Directory rows are exposed lazily, :data:`FETCH_CHUNK` at a time, when a
+node is expanded or scrolled to the end, so a folder holding 200k files
+costs nothing until it is actually looked at.
+"""
+
+from __future__ import annotations
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from PySide6.QtCore import QAbstractItemModel, QModelIndex, QObject, Qt
+
+from core.model import ROOT, UNKNOWN_SIZE, LayoutModel
+
+ROOT_LABEL = "RootISO"
+FETCH_CHUNK = 1000
+
+
+class LayoutTreeModel(QAbstractItemModel):
+    """Single‑column model: one top‑level *RootISO* row, then the layout."""
+
+    def __init__(self, store: LayoutModel, parent: Optional[QObject] = None) -> None:
+        super().__init__(parent)
+        self._store = store
+        self._fetched: Dict[int, int] = {ROOT: 0}   # dir node → rows exposed to views
+        self._exposing = False                      # no re‑entrant fetchMore from listeners
+
+    # ------------------------------------------------------------------ #
+    # QAbstractItemModel interface
+    # ------------------------------------------------------------------ #
+    def index(self, row: int, column: int, parent: QModelIndex = QModelIndex()) -> QModelIndex:
+        if column != 0:
+            return QModelIndex()
+        if not parent.isValid():
+            return self.createIndex(0, 0, ROOT) if row == 0 else QModelIndex()
+        node = parent.internalId()
+        if not 0 <= row < self._fetched.get(node, 0):
+            return QModelIndex()
+        return self.createIndex(row, 0, self._store.child(node, row))
+
+    def parent(self, index: QModelIndex = QModelIndex()) -> QModelIndex:  # type: ignore[override]
+        if not index.isValid() or index.internalId() == ROOT:
+            return QModelIndex()
+        return self._index(self._store.parent(index.internalId()))
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        if not parent.isValid():
+            return 1
+        return self._fetched.get(parent.internalId(), 0)
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 1
+
+    def hasChildren(self, parent: QModelIndex = QModelIndex()) -> bool:
+        if not parent.isValid():
+            return True
+        return self._store.child_count(parent.internalId()) > 0
+
+    def canFetchMore(self, parent: QModelIndex) -> bool:
+        if not parent.isValid() or self._exposing:
+            return False
+        node = parent.internalId()
+        return self._fetched.get(node, 0) < self._store.child_count(node)
+
+    def fetchMore(self, parent: QModelIndex) -> None:
+        if parent.isValid():
+            self._expose(parent.internalId(), parent)
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+        node = index.internalId()
+        if node == ROOT:
+            return ROOT_LABEL
+        name = self._store.name(node)
+        lba = None if self._store.node_is_dir(node) else self._store.lba(node)
+        return name if lba is None else f"{name} (LBA: {lba})"
+
+    def headerData(self, section: int, orientation: Qt.Orientation, role: int = Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole and section == 0:
+            return "ISO Structure"
+        return None
+
+    # ------------------------------------------------------------------ #
+    # Paths ↔ indexes
+    # ------------------------------------------------------------------ #
+    def path_of(self, index: QModelIndex) -> Optional[str]:
+        """ISO path of *index* (``""`` for RootISO), ``None`` if invalid."""
+        return self._store.path(index.internalId()) if index.isValid() else None
+
+    def index_of(self, iso_path: str) -> QModelIndex:
+        """Index of *iso_path*, exposing the rows leading to it if needed."""
+        node = self._store.node(iso_path)
+        if node is None:
+            return QModelIndex()
+        chain = []
+        while node != ROOT:
+            chain.append(node)
+            node = self._store.parent(node)
+        index = self._index(ROOT)
+        for node in reversed(chain):
+            parent = self._store.parent(node)
+            while self._fetched.get(parent, 0) <= self._store.row(node):
+                self._expose(parent, index)
+            index = self.createIndex(self._store.row(node), 0, node)
+        return index
+
+    def _index(self, node: int) -> QModelIndex:
+        row = 0 if node == ROOT else self._store.row(node)
+        return self.createIndex(row, 0, node)
+
+    def _expose(self, node: int, parent: QModelIndex) -> None:
+        fetched = self._fetched.get(node, 0)
+        total = min(self._store.child_count(node), fetched + FETCH_CHUNK)
+        if total > fetched and not self._exposing:
+            self._exposing = True
+            try:
+                self.beginInsertRows(parent, fetched, total - 1)
+                self._fetched[node] = total
+                self.endInsertRows()
+            finally:
+                self._exposing = False
+
+    # ------------------------------------------------------------------ #
+    # Mutation (keep views in sync with the store)
+    # ------------------------------------------------------------------ #
+    def add(self, iso_path: str, abs_path: str, lba: Optional[int] = None,
+            size: int = UNKNOWN_SIZE, first: bool = False) -> bool:
+        """Add one file; see :meth:`LayoutModel.add`.
+
+        *first* only applies when the file's directory already exists.
+        """
+        parent = self._store.node(iso_path.rpartition("/")[0])
+        if not first or parent is None or not self._store.node_is_dir(parent):
+            return bool(self.add_many([(iso_path, abs_path, lba, size)]))
+        if parent not in self._fetched:
+            return self._store.add(iso_path, abs_path, lba, size, first=True)
+        if self._store.node(iso_path) is not None:
+            return False
+        self.beginInsertRows(self._index(parent), 0, 0)
+        ok = self._store.add(iso_path, abs_path, lba, size, first=True)
+        self._fetched[parent] += 1
+        self.endInsertRows()
+        return ok
+
+    def add_many(self, entries: Iterable[Tuple[str, str, Optional[int], int]]) -> List[str]:
+        """Append ``(iso_path, abs_path, lba, size)`` files; returns the paths added.
+
+        Rows are appended to the store first and announced afterwards with
+        one insertion per directory whose children were fully exposed.
+        """
+        added: List[str] = []
+        before: Dict[int, int] = {}
+        store = self._store
+        for iso_path, abs_path, lba, size in entries:
+            anchor = store.nearest_dir(iso_path)
+            if anchor is not None and anchor not in before:
+                before[anchor] = store.child_count(anchor)
+            if store.add(iso_path, abs_path, lba, size):
+                added.append(iso_path)
+
+        for node, count in before.items():
+            if self._fetched.get(node, 0) == count:
+                self._expose(node, self._index(node))
+        return added
+
+    def remove(self, iso_path: str) -> List[str]:
+        """Drop a file or directory subtree; returns every path removed."""
+        node = self._store.node(iso_path)
+        if node is None:
+            return []
+        if node == ROOT:
+            self.beginResetModel()
+            removed = self._store.remove(iso_path)
+            self._fetched = {ROOT: 0}
+            self.endResetModel()
+            return removed
+
+        parent, row = self._store.parent(node), self._store.row(node)
+        visible = row < self._fetched.get(parent, 0)
+        if visible:
+            self.beginRemoveRows(self._index(parent), row, row)
+        removed = self._store.remove(iso_path)
+        self._fetched = {n: c for n, c in self._fetched.items() if self._store.alive(n)}
+        if visible:
+            self._fetched[parent] -= 1
+            self.endRemoveRows()
+        return removed
+